@@ -27,6 +27,8 @@ CSRF_TRUSTED_ORIGINS = ['https://purple-river-00fd8ef0f.6.azurestaticapps.net']
 DEBUG = False
 
 MIDDLEWARE = [
+    # First, so the end-to-end latency on /metrics includes every other middleware
+    'assistant.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
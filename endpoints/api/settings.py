@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'assistant.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -176,3 +177,100 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 # Remove the old path and add the correct one
+
+# Skin disease classifier (loaded lazily by assistant.model_registry)
+CLASSIFIER_MODEL_PATH = os.getenv(
+    "CLASSIFIER_MODEL_PATH",
+    os.path.join(BASE_DIR, "model", "Skin_Disease_Classification.keras"),
+)
+# Classifier runtime: "keras", or "tflite" for a file written by `manage.py export_classifier`
+CLASSIFIER_BACKEND = os.getenv("CLASSIFIER_BACKEND", "keras")
+CLASSIFIER_TFLITE_PATH = os.getenv(
+    "CLASSIFIER_TFLITE_PATH",
+    os.path.join(BASE_DIR, "model", "Skin_Disease_Classification.tflite"),
+)
+# Interpreter threads per worker (0 uses every core)
+CLASSIFIER_NUM_THREADS = int(os.getenv("CLASSIFIER_NUM_THREADS", "0"))
+# Tag stored with each prediction; empty derives one from the model file's name, size and mtime
+CLASSIFIER_MODEL_VERSION = os.getenv("CLASSIFIER_MODEL_VERSION", "")
+# Versioned models from `python -m training`; serving.json there picks the active and shadow version
+CLASSIFIER_VERSIONS_DIR = os.getenv("CLASSIFIER_VERSIONS_DIR", os.path.join(BASE_DIR, "model", "versions"))
+# How often each worker checks serving.json for a new version (seconds)
+CLASSIFIER_REGISTRY_POLL_SECONDS = float(os.getenv("CLASSIFIER_REGISTRY_POLL_SECONDS", "5"))
+# Shadow batches allowed in flight before further samples are dropped
+CLASSIFIER_SHADOW_MAX_PENDING = int(os.getenv("CLASSIFIER_SHADOW_MAX_PENDING", "4"))
+# Softmax temperature for the unversioned model, written by `manage.py calibrate_classifier`
+CLASSIFIER_CALIBRATION_PATH = os.getenv(
+    "CLASSIFIER_CALIBRATION_PATH",
+    os.path.join(BASE_DIR, "model", "calibration.json"),
+)
+# Test-time augmentation: views averaged with the original image, and whether requests use it by default
+CLASSIFIER_TTA_VIEWS = [v for v in os.getenv("CLASSIFIER_TTA_VIEWS", "flip_lr,flip_ud,crop").split(",") if v]
+CLASSIFIER_TTA_DEFAULT = os.getenv("CLASSIFIER_TTA_DEFAULT", "False") == "True"
+# Build the classifier, LLM and search clients when the WSGI/ASGI app starts
+MODEL_WARMUP_ON_STARTUP = os.getenv("MODEL_WARMUP_ON_STARTUP", "False") == "True"
+
+# classifier micro-batching (concurrent requests share one model call)
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "16"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "5"))
+INFERENCE_TIMEOUT_SECONDS = float(os.getenv("INFERENCE_TIMEOUT_SECONDS", "30"))
+# Unix socket of `manage.py run_inference_server`; when set, Django workers do not load the classifier
+INFERENCE_SERVER_SOCKET = os.getenv("INFERENCE_SERVER_SOCKET", "")
+INFERENCE_SERVER_WORKERS = int(os.getenv("INFERENCE_SERVER_WORKERS", "0"))
+INFERENCE_SERVER_MAX_PENDING = int(os.getenv("INFERENCE_SERVER_MAX_PENDING", "64"))
+# Upper bound on images per /api/medical-assistant/batch/ request
+BATCH_DIAGNOSIS_MAX_IMAGES = int(os.getenv("BATCH_DIAGNOSIS_MAX_IMAGES", "20"))
+
+# Conversation memory (assistant.chat_memory): window loaded per request and per-worker cache bounds
+CHAT_HISTORY_MAX_TURNS = int(os.getenv("CHAT_HISTORY_MAX_TURNS", "10"))
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "2000"))
+CHAT_HISTORY_CACHE_SIZE = int(os.getenv("CHAT_HISTORY_CACHE_SIZE", "1000"))
+CHAT_HISTORY_CACHE_TTL = float(os.getenv("CHAT_HISTORY_CACHE_TTL", "300"))
+# Turns sent verbatim; older turns in the window are folded into a cached running summary
+CHAT_HISTORY_VERBATIM_TURNS = int(os.getenv("CHAT_HISTORY_VERBATIM_TURNS", "4"))
+
+# Response cache for first-turn questions (assistant.response_cache)
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "True") == "True"
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "86400"))
+# Embedding-similarity fallback for near-identical questions
+RESPONSE_CACHE_SEMANTIC = os.getenv("RESPONSE_CACHE_SEMANTIC", "False") == "True"
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.92"))
+AZURE_OPENAI_EMBEDDING_DEPLOYMENT = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "text-embedding-ada-002")
+
+# medical-knowledge search cache (assistant.retrieval); failures are cached for RETRIEVAL_NEGATIVE_TTL
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", "1024"))
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", "3600"))
+RETRIEVAL_NEGATIVE_TTL = float(os.getenv("RETRIEVAL_NEGATIVE_TTL", "30"))
+# "azure" (medical-knowledge index), or a local index built by `manage.py build_retrieval_index`: "bm25" / "dense"
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "azure")
+RETRIEVAL_INDEX_DIR = os.getenv("RETRIEVAL_INDEX_DIR", os.path.join(BASE_DIR, "retrieval_index"))
+
+# Predictions for previously seen images, keyed on (image SHA-256, model version)
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "4096"))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "604800"))
+
+# Background jobs (assistant.tasks) run in `python manage.py run_task_worker`. TASK_WORKER_THREADS > 0 also starts
+# that many worker threads in every web process (not with gunicorn --preload: threads do not survive the fork)
+TASK_WORKER_THREADS = int(os.getenv("TASK_WORKER_THREADS", "0"))
+TASK_POLL_SECONDS = float(os.getenv("TASK_POLL_SECONDS", "1"))
+TASK_LEASE_SECONDS = float(os.getenv("TASK_LEASE_SECONDS", "300"))
+# A job status event stream holds a sync worker under WSGI, so it is cut short there (ASGI streams run 120s)
+JOB_STREAM_WSGI_SECONDS = float(os.getenv("JOB_STREAM_WSGI_SECONDS", "15"))
+TASK_MAX_ATTEMPTS = int(os.getenv("TASK_MAX_ATTEMPTS", "3"))
+TASK_RETRY_BACKOFF_SECONDS = float(os.getenv("TASK_RETRY_BACKOFF_SECONDS", "5"))
+# Answer image diagnoses immediately and deliver the LLM explanation through /api/jobs/<job_id>/
+DIAGNOSIS_DEFERRED_DEFAULT = os.getenv("DIAGNOSIS_DEFERRED_DEFAULT", "False") == "True"
+
+# Keyword rules for routing text messages (assistant.intents)
+INTENT_RULES_PATH = os.getenv("INTENT_RULES_PATH", os.path.join(BASE_DIR, "assistant", "intent_rules.json"))
+
+# Dermatologist search (assistant.dermatologist_search): "auto", "database" or "memory"
+DERMATOLOGIST_SEARCH_BACKEND = os.getenv("DERMATOLOGIST_SEARCH_BACKEND", "auto")
+# "auto" caches the whole directory per process while the table has at most this many rows
+DERMATOLOGIST_DIRECTORY_MAX_ROWS = int(os.getenv("DERMATOLOGIST_DIRECTORY_MAX_ROWS", "5000"))
+DERMATOLOGIST_DIRECTORY_TTL = float(os.getenv("DERMATOLOGIST_DIRECTORY_TTL", "300"))
+DERMATOLOGIST_PAGE_SIZE = int(os.getenv("DERMATOLOGIST_PAGE_SIZE", "5"))
+
+# Thread pool shared by requests for their independent stages (inference, retrieval, lookups)
+REQUEST_FANOUT_WORKERS = int(os.getenv("REQUEST_FANOUT_WORKERS", "16"))
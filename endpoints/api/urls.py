@@ -3,9 +3,12 @@ from django.contrib import admin
 from django.urls import path,include
 from assistant.views import RegisterView
 from django.views.generic.base import RedirectView
+from assistant.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/',include('assistant.urls')),
+    # Prometheus scrape target (assistant.metrics)
+    path('metrics', metrics_view, name='metrics'),
     path('', RedirectView.as_view(url='api/medical-assistant/', permanent=False)),
 ]
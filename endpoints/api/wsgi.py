@@ -5,3 +5,11 @@ settings_module = 'api.deployment' if 'WEBSITE_HOSTNAME' in os.environ else 'api
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
 
 application = get_wsgi_application()
+
+# Optional eager load of the classifier and LLM clients (MODEL_WARMUP_ON_STARTUP)
+from assistant.model_registry import warm_up_if_enabled
+warm_up_if_enabled()
+
+# In-process job worker threads, only when TASK_WORKER_THREADS > 0; jobs normally run in `manage.py run_task_worker`
+from assistant.tasks import get_task_worker
+get_task_worker()
@@ -1,11 +1,13 @@
 from django.contrib import admin
-from .models import User,UserDiseaseHistory,ChatHistory,SkinDiseasePrediction,ConversationSession,Dermatologist
+from .models import User,UserDiseaseHistory,ChatHistory,SkinDiseasePrediction,ConversationSession,Dermatologist,BackgroundJob,PredictionRescore
 admin.site.register(User)
 admin.site.register(UserDiseaseHistory)
 admin.site.register(ChatHistory)
 admin.site.register(SkinDiseasePrediction)
 admin.site.register(ConversationSession)
 admin.site.register(Dermatologist)
+admin.site.register(BackgroundJob)
+admin.site.register(PredictionRescore)
 
 admin.site.site_header = "Dermatology Assistant Admin"
 admin.site.site_title = "Assistant Portal"
@@ -4,3 +4,16 @@ from django.apps import AppConfig
 class AssistantConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'assistant'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from django.db.models.signals import post_delete, post_save
+
+        from .dermatologist_search import invalidate_directory
+        from .metrics import install_db_instrumentation
+
+        # Time every SQL statement (reads and writes) on every connection this process opens
+        connection_created.connect(install_db_instrumentation, dispatch_uid="assistant_db_metrics")
+        # Edits made through this process refresh its cached dermatologist directory immediately
+        post_save.connect(invalidate_directory, sender="assistant.Dermatologist", dispatch_uid="assistant_dermatologist_saved")
+        post_delete.connect(invalidate_directory, sender="assistant.Dermatologist", dispatch_uid="assistant_dermatologist_deleted")
@@ -0,0 +1,197 @@
+"""
+ASGI-native variant of MedicalAssistantAPI.
+
+DRF's APIView dispatch is synchronous, so this is a plain async Django view.
+It reuses MedicalAssistantAPI for routing and prompt building. All network
+and database I/O is awaited: ``ainvoke`` for the LLM, the aio Azure Search
+client, and Django's async ORM. Image decoding and inference run on the
+default executor so they never block the event loop.
+"""
+import asyncio
+import json
+import time
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import JsonResponse
+from django.views import View
+
+from .models import ChatHistory, ConversationSession, SkinDiseasePrediction
+from .response_cache import response_cache
+from .serializers import ChatHistorySerializer, SkinDiseasePredictionSerializer
+from .storage import hash_upload
+from .views import MedicalAssistantAPI, requested_top_k, wants_tta
+
+
+class AsyncMedicalAssistantAPI(View):
+    http_method_names = ["post"]
+
+    def setup(self, request, *args, **kwargs):
+        super().setup(request, *args, **kwargs)
+        # Shared routing/prompt helpers and the history-aware conversation handler
+        self.assistant = MedicalAssistantAPI()
+
+    def parse_request(self, request):
+        if request.content_type == "application/json":
+            data = json.loads(request.body or b"{}")
+            return data, None
+        return request.POST, request.FILES.get("image")
+
+    async def post(self, request, *args, **kwargs):
+        response_data = {
+            "session_id": None,
+            "diagnosis": None,
+            "chat_response": None,
+            "suggested_actions": []
+        }
+        try:
+            data, image = self.parse_request(request)
+            message = data.get('message', '')
+            user_id = data.get('user_id', f"anon_{str(uuid.uuid4())[:8]}")
+            session_id = data.get('session_id', str(uuid.uuid4()))
+            owner_id = user_id if not user_id.startswith('anon_') else None
+
+            try:
+                session_uuid = uuid.UUID(session_id)
+            except ValueError:
+                session_uuid = uuid.uuid4()
+
+            session, created = await ConversationSession.objects.aget_or_create(
+                session_id=session_uuid,
+                defaults={'user_id': owner_id}
+            )
+            session_id = str(session.session_id)
+            response_data["session_id"] = session_id
+
+            if image:
+                try:
+                    loop = asyncio.get_running_loop()
+                    predicted_disease, confidence_score = await loop.run_in_executor(
+                        None, self.predict_disease, image, wants_tta(data), requested_top_k(data)
+                    )
+                    response_data["prediction"] = self.assistant.prediction
+                    if confidence_score < 65:
+                        response_data.update(
+                            self.assistant.low_confidence_payload(predicted_disease, confidence_score)
+                        )
+                        return JsonResponse(response_data)
+
+                    response = await self.assistant.conversation_handler.ainvoke(
+                        {"input": self.assistant.build_diagnosis_prompt(predicted_disease, confidence_score, message)},
+                        config={"configurable": {"session_id": session_id}},
+                    )
+                    prediction = await SkinDiseasePrediction.objects.acreate(
+                        user_id=owner_id,
+                        image=image,
+                        image_sha256=hash_upload(image),
+                        model_version=self.assistant.prediction["model_version"],
+                        ranking=self.assistant.ranking,
+                        symptoms=message,
+                        predicted_disease=predicted_disease,
+                        confidence_score=confidence_score,
+                        chatbot_response=response.content,
+                        session=session
+                    )
+                    response_data.update({
+                        "diagnosis": await self.serialize(SkinDiseasePredictionSerializer, prediction, request),
+                        "suggested_actions": ["explain_diagnosis", "treatment_options"],
+                        "status": "success",
+                        "message": None
+                    })
+                    message = f"I was diagnosed with {predicted_disease}. {message}"
+
+                except Exception as e:
+                    return JsonResponse(
+                        {
+                            "error": str(e),
+                            "suggested_actions": ["retry_upload", "contact_support"]
+                        },
+                        status=400
+                    )
+
+            if message or not image:
+                try:
+                    result = await self.ahandle_text_input(
+                        message=message or "Explain this diagnosis",
+                        session_id=session_id,
+                        is_followup=bool(image),
+                        cacheable=created and not image and settings.RESPONSE_CACHE_ENABLED
+                    )
+                    chat = await ChatHistory.objects.acreate(
+                        user_id=owner_id,
+                        user_message=message,
+                        chatbot_response=result['text'],
+                        session=session,
+                        metadata={
+                            'sources': result.get('sources'),
+                            'suggested_actions': result.get('suggested_actions')
+                        }
+                    )
+                    response_data["chat_response"] = await self.serialize(ChatHistorySerializer, chat, request)
+                    response_data["suggested_actions"] = result.get('suggested_actions', [])
+                    if result.get('dermatologists'):
+                        response_data["dermatologists"] = result['dermatologists']
+
+                except Exception as e:
+                    return JsonResponse({"error": f"Chat processing failed: {str(e)}"}, status=400)
+
+            return JsonResponse(response_data)
+
+        except Exception as e:
+            return JsonResponse({"error": f"Server error: {str(e)}"}, status=500)
+
+    def predict_disease(self, image, tta, top_k):
+        """MedicalAssistantAPI.predict_disease for the default executor, whose threads outlive the request"""
+        try:
+            return self.assistant.predict_disease(image, tta, top_k)
+        finally:
+            # The prediction cache and version lookups may have opened a connection on this thread
+            close_old_connections()
+
+    @sync_to_async
+    def serialize(self, serializer_class, instance, request):
+        return serializer_class(instance, context={'request': request}).data
+
+    async def ahandle_text_input(self, message, session_id, is_followup=False, cacheable=False):
+        """Async counterpart of MedicalAssistantAPI.handle_text_input"""
+        try:
+            if cacheable:
+                # May call the embeddings API when the semantic lookup is enabled
+                cached = await sync_to_async(response_cache.get, thread_sensitive=False)(message)
+                if cached is not None:
+                    return cached
+
+            started = time.perf_counter()
+            processing_mode = self.assistant.route_text_input(message, is_followup)
+            results = dermatologists = None
+            if processing_mode == "medical_search":
+                results = await self.aretrieve_medical_info(message)
+            elif processing_mode == "dermatologist_query":
+                dermatologists = await self.aquery_dermatologists(message)
+
+            result = self.assistant.build_text_result(processing_mode, message, results, dermatologists)
+            prompt = result.pop("prompt")
+            if prompt is not None:
+                response = await self.assistant.conversation_handler.ainvoke(
+                    {"input": prompt},
+                    config={"configurable": {"session_id": session_id}},
+                )
+                result["text"] = response.content
+                if cacheable:
+                    await sync_to_async(response_cache.set, thread_sensitive=False)(
+                        message, None, result, elapsed=time.perf_counter() - started
+                    )
+            return result
+
+        except Exception as e:
+            raise Exception(f"Text processing failed: {str(e)}")
+
+    async def aretrieve_medical_info(self, query):
+        # Shares the cache and in-flight lookups with the sync retriever
+        return await self.assistant.retriever.asearch(query)
+
+    async def aquery_dermatologists(self, query):
+        # The memory directory and the ORM search are both synchronous
+        return await sync_to_async(self.assistant.query_dermatologists)(query)
@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from queue import Empty, Queue
+
+import numpy as np
+
+
+class BatchingScheduler:
+    """
+    Shared in-process micro-batcher for classifier inference.
+
+    Request threads submit one preprocessed image tensor each and block on a
+    Future. A single daemon worker drains the queue, waiting at most
+    ``max_wait_ms`` after the first item for up to ``max_batch_size`` items,
+    and runs them through ``batch_fn`` as one stacked batch. ``batch_fn`` must
+    return one result per row, in order.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=16, max_wait_ms=5.0, name="inference"):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queue = Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+
+        # Metrics
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._batch_sizes = Counter()
+        self._max_queue_depth = 0
+        self._total_wait = 0.0
+        self._total_run = 0.0
+
+    def submit(self, tensor, timeout=None):
+        """Enqueue a single (H, W, C) tensor and block until its result is ready"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((np.asarray(tensor), future, time.perf_counter()))
+        depth = self._queue.qsize()
+        if depth > self._max_queue_depth:
+            self._max_queue_depth = depth
+        return future.result(timeout=timeout)
+
+    def stats(self):
+        """Snapshot of queue depth and batch-size metrics"""
+        with self._lock:
+            batches = self._batches
+            items = self._items
+            return {
+                "name": self.name,
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "batches": batches,
+                "items": items,
+                "errors": self._errors,
+                "avg_batch_size": (items / batches) if batches else 0.0,
+                "batch_size_histogram": dict(sorted(self._batch_sizes.items())),
+                "avg_queue_wait_ms": (self._total_wait / items * 1000) if items else 0.0,
+                "avg_batch_run_ms": (self._total_run / batches * 1000) if batches else 0.0,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+            }
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name=f"{self.name}-batcher", daemon=True
+                )
+                self._worker.start()
+
+    def _collect(self):
+        """Block for the first item, then gather more until the batch is full or the wait expires"""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            groups = {}
+            for item in self._collect():
+                # One forward pass per input shape: TTA requests ((V, H, W, 3) items) run apart from
+                # plain images, and sizes differ briefly when a model swap changes the input size
+                groups.setdefault(item[0].shape, []).append(item)
+            for batch in groups.values():
+                self._run_batch(batch)
+
+    def _run_batch(self, batch):
+        started = time.perf_counter()
+        futures = [future for _, future, _ in batch]
+        try:
+            results = self.batch_fn(np.stack([tensor for tensor, _, _ in batch]))
+            if len(results) != len(batch):
+                raise RuntimeError(
+                    f"Batch function returned {len(results)} results for {len(batch)} inputs"
+                )
+            for future, result in zip(futures, results):
+                future.set_result(result)
+        except Exception as e:
+            with self._lock:
+                self._errors += 1
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+        finished = time.perf_counter()
+
+        with self._lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._batch_sizes[len(batch)] += 1
+            self._total_run += finished - started
+            self._total_wait += sum(started - enqueued for _, _, enqueued in batch)
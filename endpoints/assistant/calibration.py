@@ -0,0 +1,93 @@
+"""
+Temperature scaling for the skin disease classifier.
+
+The network is trained with cross-entropy and tends to be over-confident, so
+``max(softmax)`` is not a probability the 65% threshold can rely on.
+Temperature scaling divides the logits by one scalar T fitted on held-out
+images (``python manage.py calibrate_classifier``); the ranking, and so the
+predicted class, does not change. T is stored in ``calibration.json`` next to
+the model and applied by ``ModelVersion.predict_probabilities``.
+"""
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+CALIBRATION_FILE = "calibration.json"
+
+
+def softmax(logits, temperature=1.0, dtype=np.float32):
+    """Row-wise softmax of ``logits / temperature`` (numerically stable): the classifier outputs raw logits"""
+    logits = np.asarray(logits, dtype=dtype) / dtype(temperature)
+    exp = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+def negative_log_likelihood(logits, labels, temperature=1.0):
+    probabilities = softmax(logits, temperature, dtype=np.float64)
+    return float(-np.mean(np.log(probabilities[np.arange(len(labels)), labels] + 1e-12)))
+
+
+def expected_calibration_error(probabilities, labels, bins=15):
+    """Mean |accuracy - confidence| over equal-width confidence bins, weighted by bin size"""
+    confidence = probabilities.max(axis=1)
+    correct = probabilities.argmax(axis=1) == labels
+    edges = np.linspace(0.0, 1.0, bins + 1)
+    error = 0.0
+    for low, high in zip(edges[:-1], edges[1:]):
+        in_bin = (confidence > low) & (confidence <= high)
+        if in_bin.any():
+            error += in_bin.mean() * abs(correct[in_bin].mean() - confidence[in_bin].mean())
+    return float(error)
+
+
+def fit_temperature(logits, labels, low=0.05, high=20.0, iterations=60):
+    """T minimising the negative log-likelihood; golden-section search over log T (NLL is unimodal in T)"""
+    ratio = (np.sqrt(5) - 1) / 2
+    a, b = np.log(low), np.log(high)
+    c, d = b - ratio * (b - a), a + ratio * (b - a)
+    nll_c = negative_log_likelihood(logits, labels, np.exp(c))
+    nll_d = negative_log_likelihood(logits, labels, np.exp(d))
+    for _ in range(iterations):
+        if nll_c < nll_d:
+            b, d, nll_d = d, c, nll_c
+            c = b - ratio * (b - a)
+            nll_c = negative_log_likelihood(logits, labels, np.exp(c))
+        else:
+            a, c, nll_c = c, d, nll_d
+            d = a + ratio * (b - a)
+            nll_d = negative_log_likelihood(logits, labels, np.exp(d))
+    return float(np.exp((a + b) / 2))
+
+
+def calibration_report(logits, labels, temperature):
+    before, after = softmax(logits, dtype=np.float64), softmax(logits, temperature, dtype=np.float64)
+    return {
+        "temperature": temperature,
+        "samples": int(len(labels)),
+        "accuracy": float((before.argmax(axis=1) == labels).mean()),
+        "nll_before": negative_log_likelihood(logits, labels),
+        "nll_after": negative_log_likelihood(logits, labels, temperature),
+        "ece_before": expected_calibration_error(before, labels),
+        "ece_after": expected_calibration_error(after, labels),
+        "fitted_at": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def read_temperature(path):
+    """(temperature, mtime) from a calibration file; (1.0, None) when there is none"""
+    try:
+        with open(path) as handle:
+            temperature = float(json.load(handle)["temperature"])
+        return temperature, os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return 1.0, None
+    except (KeyError, ValueError) as e:
+        print(f"Ignoring calibration file {path}: {str(e)}")
+        return 1.0, None
+
+
+def write_calibration(path, report):
+    with open(path, "w") as handle:
+        json.dump(report, handle, indent=2)
@@ -0,0 +1,145 @@
+"""
+Database-backed conversation memory for RunnableWithMessageHistory.
+
+The ChatHistory and SkinDiseasePrediction rows written by MedicalAssistantAPI
+are the shared source of truth, so every gunicorn worker sees the same
+history and nothing is lost on restart. A bounded per-process LRU+TTL cache
+sits in front of the tables; each cached entry carries a cheap "watermark"
+(latest row ids for the session) that is re-checked on access, so a turn
+written by another worker invalidates the cached copy.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import OuterRef, Subquery
+from langchain_core.chat_history import BaseChatMessageHistory
+from langchain_core.messages import AIMessage, HumanMessage
+
+from .caching import LRUTTLCache
+from .models import ChatHistory, ConversationSession, SkinDiseasePrediction
+
+
+def approx_tokens(text):
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return max(1, len(text or "") // 4)
+
+
+_history_cache = LRUTTLCache(
+    maxsize=settings.CHAT_HISTORY_CACHE_SIZE,
+    ttl=settings.CHAT_HISTORY_CACHE_TTL,
+)
+
+
+class DatabaseChatMessageHistory(BaseChatMessageHistory):
+    """Bounded window over a session's persisted turns"""
+
+    def __init__(self, session_id, max_turns=None, token_budget=None, cache=_history_cache):
+        self.session_id = str(session_id)
+        self.max_turns = max_turns or settings.CHAT_HISTORY_MAX_TURNS
+        self.token_budget = token_budget or settings.CHAT_HISTORY_TOKEN_BUDGET
+        self.cache = cache
+
+    def _watermark(self):
+        """Latest chat/prediction ids for the session, fetched in one query"""
+        # One correlated subquery per table; joining both in an aggregate would
+        # scan chats x predictions rows
+        latest_chat = ChatHistory.objects.filter(session=OuterRef("pk")).order_by("-id").values("id")[:1]
+        latest_prediction = (
+            SkinDiseasePrediction.objects.filter(session=OuterRef("pk")).order_by("-id").values("id")[:1]
+        )
+        marks = (
+            ConversationSession.objects.filter(session_id=self.session_id)
+            .annotate(chat=Subquery(latest_chat), prediction=Subquery(latest_prediction))
+            .values_list("chat", "prediction")
+            .first()
+        )
+        return marks or (None, None)
+
+    def _load_turns(self):
+        """Return the last ``max_turns`` (human, ai) pairs from both tables, oldest first"""
+        chats = (
+            ChatHistory.objects.filter(session_id=self.session_id)
+            .order_by("-created_at")
+            .values_list("created_at", "user_message", "chatbot_response")[: self.max_turns]
+        )
+        predictions = (
+            SkinDiseasePrediction.objects.filter(session_id=self.session_id)
+            .exclude(chatbot_response__isnull=True)
+            .order_by("-created_at")
+            .values_list("created_at", "predicted_disease", "confidence_score",
+                         "symptoms", "chatbot_response")[: self.max_turns]
+        )
+
+        turns = [(created, user, bot) for created, user, bot in chats]
+        turns.extend(
+            (created, f"Diagnosis: {disease} ({confidence:.1f}% confidence)\nSymptoms: {symptoms}", bot)
+            for created, disease, confidence, symptoms, bot in predictions
+        )
+        turns.sort(key=lambda turn: turn[0])
+        return [(user, bot) for _, user, bot in turns[-self.max_turns:]]
+
+    def _apply_budget(self, messages):
+        """Drop the oldest messages until the window fits the token budget"""
+        total = sum(approx_tokens(message.content) for message in messages)
+        start = 0
+        while start < len(messages) and total > self.token_budget:
+            total -= approx_tokens(messages[start].content)
+            start += 1
+        return messages[start:]
+
+    @property
+    def messages(self):
+        watermark = self._watermark()
+        entry = self.cache.get(self.session_id)
+        if entry is not None and entry["watermark"] == watermark:
+            return self._apply_budget(list(entry["messages"]))
+
+        messages = []
+        for user_message, chatbot_response in self._load_turns():
+            if user_message:
+                messages.append(HumanMessage(content=user_message))
+            if chatbot_response:
+                messages.append(AIMessage(content=chatbot_response))
+        self.cache.set(self.session_id, {"watermark": watermark, "messages": messages})
+        return self._apply_budget(list(messages))
+
+    def add_messages(self, messages):
+        """
+        Keep turns produced in this process visible until the view persists them.
+
+        The view writes the ChatHistory/SkinDiseasePrediction row itself (with
+        the user's original message rather than the expanded prompt), which
+        moves the watermark and replaces this in-memory tail on the next read.
+        """
+        entry = self.cache.get(self.session_id)
+        if entry is None:
+            self.messages  # populates the cache from the database
+            entry = self.cache.get(self.session_id)
+        if entry is None:
+            return
+        window = (entry["messages"] + list(messages))[-2 * self.max_turns:]
+        self.cache.set(self.session_id, {"watermark": entry["watermark"], "messages": window})
+
+    def clear(self):
+        """
+        Delete the session's chat turns. Diagnosis turns are left in place: they
+        are the user's SkinDiseasePrediction records, so they still appear in
+        the history after a clear.
+        """
+        ChatHistory.objects.filter(session_id=self.session_id).delete()
+        self.cache.pop(self.session_id)
+
+    # RunnableWithMessageHistory.ainvoke calls these. The defaults run the sync methods on
+    # LangChain's executor threads, where the database connections they open are never closed.
+
+    async def aget_messages(self):
+        return await sync_to_async(lambda: self.messages)()
+
+    async def aadd_messages(self, messages):
+        await sync_to_async(self.add_messages)(messages)
+
+    async def aclear(self):
+        await sync_to_async(self.clear)()
+
+
+def get_session_history(session_id: str) -> BaseChatMessageHistory:
+    return DatabaseChatMessageHistory(session_id)
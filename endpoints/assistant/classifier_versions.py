@@ -0,0 +1,434 @@
+"""
+Versioned classifiers with hot-swap and shadow evaluation.
+
+A version is a run directory written by ``python -m training`` under
+CLASSIFIER_VERSIONS_DIR; it bundles the weights, the label list and the
+preprocessing parameters:
+
+    model/versions/20250301-101500/
+        Skin_Disease_Classification.keras   (or a .tflite export of it)
+        labels.json                          class names in output order
+        metadata.json                        model_file, classes, image_size
+        calibration.json                     optional softmax temperature
+
+``serving.json`` in the same directory names the version to serve and an
+optional shadow candidate; ``python manage.py classifier_versions`` edits it:
+
+    {"active": "20250301-101500", "shadow": "20250310-090000", "shadow_rate": 0.05}
+
+Each process checks the file's mtime at most every
+CLASSIFIER_REGISTRY_POLL_SECONDS. When it changes, the new model is loaded
+and warmed up on a background thread, then swapped in with one reference
+assignment: requests that already hold the previous version finish on it,
+and no request waits for the cold load.
+
+A sampled fraction of the images the active version classifies is
+re-classified by the shadow version on a single background thread, off the
+request path (samples are dropped rather than queued when it falls behind).
+Agreement with the active version is recorded per version.
+
+Without serving.json the single model at CLASSIFIER_MODEL_PATH (or
+CLASSIFIER_TFLITE_PATH) is served with the built-in labels, as before.
+"""
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from .calibration import CALIBRATION_FILE, read_temperature, softmax
+from .metrics import SHADOW_PREDICTIONS
+
+SERVING_FILE = "serving.json"
+
+
+def resize_batch(batch, size):
+    """``batch`` resized to ``size`` (width, height), for a version whose input size differs"""
+    from PIL import Image
+
+    width, height = size
+    if batch.shape[1:3] == (height, width):
+        return batch
+    out = np.empty((len(batch), height, width, 3), dtype=np.float32)
+    for index, image in enumerate(batch):
+        pixels = Image.fromarray(np.clip(image, 0, 255).astype(np.uint8))
+        out[index] = np.asarray(pixels.resize(size), dtype=np.float32)
+    return out
+
+
+class ModelVersion:
+    """
+    One servable classifier: labels in output order, input size (width, height),
+    softmax temperature and a lazily loaded model.
+    """
+
+    __slots__ = ("name", "labels", "image_size", "path", "calibration_path", "temperature", "_calibration_mtime",
+                 "_loader", "_model", "_lock")
+
+    def __init__(self, name, labels, image_size, loader, path="", calibration_path=""):
+        self.name = name
+        self.labels = list(labels)
+        self.image_size = tuple(image_size)
+        self.path = path
+        self.calibration_path = calibration_path
+        self.temperature, self._calibration_mtime = (
+            read_temperature(calibration_path) if calibration_path else (1.0, None)
+        )
+        self._loader = loader
+        self._model = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_directory(cls, directory, num_threads=0):
+        """Version from a training run directory (metadata.json, labels.json, model file)"""
+        metadata_path = os.path.join(directory, "metadata.json")
+        metadata = {}
+        if os.path.exists(metadata_path):
+            with open(metadata_path) as handle:
+                metadata = json.load(handle)
+        labels = metadata.get("classes")
+        if not labels:
+            with open(os.path.join(directory, "labels.json")) as handle:
+                labels = json.load(handle)
+        # Training records (height, width); preprocessing takes PIL's (width, height)
+        height, width = metadata.get("image_size", (180, 180))
+        model_path = os.path.join(directory, metadata.get("model_file", "Skin_Disease_Classification.keras"))
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"No model file at {model_path}")
+
+        def load():
+            if model_path.endswith(".tflite"):
+                from .inference_backends import TFLiteClassifier
+
+                return TFLiteClassifier(model_path, num_threads=num_threads)
+            import tensorflow as tf
+
+            return tf.keras.models.load_model(model_path)
+
+        return cls(os.path.basename(os.path.normpath(directory)), labels, (width, height), load, path=model_path,
+                   calibration_path=os.path.join(directory, CALIBRATION_FILE))
+
+    @property
+    def tag(self):
+        """Version plus calibration, as stored with predictions: confidences differ between temperatures"""
+        if self.temperature == 1.0:
+            return self.name
+        suffix = f"+T{self.temperature:.3f}"
+        return self.name[:64 - len(suffix)] + suffix
+
+    def calibration_changed(self):
+        if not self.calibration_path:
+            return False
+        try:
+            mtime = os.stat(self.calibration_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        return mtime != self._calibration_mtime
+
+    def recalibrated(self):
+        """Copy that re-reads calibration.json and shares the already loaded model"""
+        version = ModelVersion(self.name, self.labels, self.image_size, self._loader, path=self.path,
+                               calibration_path=self.calibration_path)
+        version._model = self._model
+        return version
+
+    @property
+    def model(self):
+        model = self._model
+        if model is None:
+            with self._lock:
+                if self._model is None:
+                    print(f"Loading classifier version {self.name}")
+                    self._model = self._loader()
+                model = self._model
+        return model
+
+    def is_loaded(self):
+        return self._model is not None
+
+    def predict_logits(self, batch):
+        batch = resize_batch(np.asarray(batch, dtype=np.float32), self.image_size)
+        return np.asarray(self.model(batch, training=False), dtype=np.float32)
+
+    def predict_probabilities(self, batch):
+        """Temperature-scaled softmax probabilities"""
+        return softmax(self.predict_logits(batch), self.temperature)
+
+    def warm_up(self):
+        """Load the model and run one dummy batch so its first real request is not cold"""
+        width, height = self.image_size
+        self.predict_probabilities(np.zeros((1, height, width, 3), dtype=np.float32))
+
+    def describe(self):
+        return {
+            "name": self.name,
+            "path": self.path,
+            "classes": len(self.labels),
+            "image_size": list(self.image_size),
+            "temperature": self.temperature,
+            "loaded": self.is_loaded(),
+        }
+
+
+class VersionStats:
+    """Images served by a version, and its agreement with the active version while in shadow"""
+
+    __slots__ = ("served", "compared", "agreed", "dropped", "errors", "confidence_delta", "shadow_seconds", "against")
+
+    def __init__(self):
+        self.served = 0
+        self.compared = 0
+        self.agreed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.confidence_delta = 0.0
+        self.shadow_seconds = 0.0
+        self.against = {}
+
+    def as_dict(self):
+        stats = {"served": self.served}
+        if self.compared or self.dropped or self.errors:
+            stats["shadow"] = {
+                "compared": self.compared,
+                "agreed": self.agreed,
+                "agreement": (self.agreed / self.compared) if self.compared else None,
+                "avg_confidence_delta": (self.confidence_delta / self.compared) if self.compared else None,
+                "avg_ms_per_image": (self.shadow_seconds / self.compared * 1000) if self.compared else None,
+                "dropped": self.dropped,
+                "errors": self.errors,
+                "against": dict(self.against),
+            }
+        return stats
+
+
+def read_serving_config(versions_dir):
+    path = os.path.join(versions_dir, SERVING_FILE)
+    try:
+        with open(path) as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return {}
+
+
+def write_serving_config(versions_dir, config):
+    """Replace serving.json atomically, so polling workers never read a partial file"""
+    os.makedirs(versions_dir, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=versions_dir, prefix=".serving-", suffix=".json")
+    try:
+        with os.fdopen(descriptor, "w") as handle:
+            json.dump(config, handle, indent=2)
+        os.replace(temporary, os.path.join(versions_dir, SERVING_FILE))
+    except Exception:
+        os.unlink(temporary)
+        raise
+
+
+def available_versions(versions_dir):
+    """Names of the run directories that hold a label list"""
+    if not os.path.isdir(versions_dir):
+        return []
+    return sorted(
+        name for name in os.listdir(versions_dir)
+        if os.path.exists(os.path.join(versions_dir, name, "metadata.json"))
+        or os.path.exists(os.path.join(versions_dir, name, "labels.json"))
+    )
+
+
+class ClassifierRegistry:
+    """
+    The active (and shadow) ModelVersion of this process, following serving.json.
+
+    ``default_version`` builds the version served when serving.json names no
+    active version.
+    """
+
+    def __init__(self, versions_dir, default_version, poll_seconds=5.0, shadow_max_pending=4, num_threads=0,
+                 seed=None):
+        self.versions_dir = versions_dir
+        self.default_version = default_version
+        self.poll_seconds = max(0.0, float(poll_seconds))
+        self.shadow_max_pending = max(1, int(shadow_max_pending))
+        self.num_threads = num_threads
+
+        self._active = None
+        self._shadow = None
+        self._shadow_rate = 0.0
+        self._lock = threading.Lock()
+        # Serialises version loads; requests never take it
+        self._swap_lock = threading.Lock()
+        self._config_mtime = None
+        self._next_poll = 0.0
+        self._loading = 0
+        self._stats = {}
+        self._random = np.random.default_rng(seed)
+        self._shadow_pool = None
+        self._shadow_pending = 0
+
+    @property
+    def serving_path(self):
+        return os.path.join(self.versions_dir, SERVING_FILE)
+
+    def active(self):
+        """The version to serve; loads nothing on the first call, the model loads on first use"""
+        if self._active is None:
+            with self._swap_lock:
+                if self._active is None:
+                    self._config_mtime = self._mtime()
+                    self._next_poll = time.monotonic() + self.poll_seconds
+                    self._apply(read_serving_config(self.versions_dir), warm=False)
+        else:
+            self._poll()
+        return self._active
+
+    def shadow(self):
+        return self._shadow
+
+    def version(self, name):
+        """ModelVersion ``name`` ("default" for CLASSIFIER_MODEL_PATH), reusing the active or shadow one"""
+        return self._resolve(None if name == "default" else name)
+
+    def activate(self, name, warm=True):
+        """Swap in ``name`` now (this process only); serving.json is what every worker follows"""
+        with self._swap_lock:
+            config = {"active": name}
+            if self._shadow is not None:
+                config.update(shadow=self._shadow.name, shadow_rate=self._shadow_rate)
+            self._apply(config, warm=warm)
+        return self._active
+
+    def predict(self, batch, version=None):
+        """Softmax probabilities from ``version`` (default: active), sampled for shadow comparison"""
+        version = version or self.active()
+        probabilities = version.predict_probabilities(batch)
+        with self._lock:
+            self._version_stats(version.name).served += len(probabilities)
+        self._sample_for_shadow(version, batch, probabilities)
+        return probabilities
+
+    def stats(self):
+        active, shadow = self._active, self._shadow
+        with self._lock:
+            versions = {name: stats.as_dict() for name, stats in self._stats.items()}
+            pending = self._shadow_pending
+        return {
+            "versions_dir": self.versions_dir,
+            "active": active.describe() if active else None,
+            "shadow": dict(shadow.describe(), rate=self._shadow_rate, pending=pending) if shadow else None,
+            "loading": self._loading > 0,
+            "versions": versions,
+        }
+
+    # Swapping
+
+    def _mtime(self):
+        try:
+            return os.stat(self.serving_path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _poll(self):
+        now = time.monotonic()
+        if now < self._next_poll:
+            return
+        self._next_poll = now + self.poll_seconds
+        mtime = self._mtime()
+        if mtime == self._config_mtime:
+            return
+        self._config_mtime = mtime
+        with self._lock:
+            self._loading += 1
+        threading.Thread(target=self._reload, name="classifier-swap", daemon=True).start()
+
+    def _reload(self):
+        try:
+            with self._swap_lock:
+                self._apply(read_serving_config(self.versions_dir), warm=True)
+        except Exception as e:
+            print(f"Classifier version swap failed, still serving {self._active.name}: {str(e)}")
+        finally:
+            with self._lock:
+                self._loading -= 1
+
+    def _resolve(self, name):
+        for current in (self._active, self._shadow):
+            if current is not None and current.name == name:
+                return current.recalibrated() if current.calibration_changed() else current
+        if not name:
+            return self.default_version()
+        return ModelVersion.from_directory(os.path.join(self.versions_dir, name), num_threads=self.num_threads)
+
+    def _apply(self, config, warm):
+        active = self._resolve(config.get("active"))
+        shadow_name = config.get("shadow")
+        shadow = self._resolve(shadow_name) if shadow_name and shadow_name != active.name else None
+        if warm:
+            # Load outside any lock the request path takes; in-flight requests keep the old objects
+            active.warm_up()
+            if shadow is not None:
+                shadow.warm_up()
+        previous = self._active
+        with self._lock:
+            self._active = active
+            self._shadow_rate = float(config.get("shadow_rate", 0.0)) if shadow is not None else 0.0
+            self._shadow = shadow
+        if previous is not None and previous is not active:
+            print(f"Serving classifier version {active.tag} (was {previous.tag})")
+        if shadow is not None:
+            print(f"Shadowing classifier version {shadow.name} on {self._shadow_rate:.1%} of images")
+
+    # Shadow evaluation
+
+    def _version_stats(self, name):
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats[name] = VersionStats()
+        return stats
+
+    def _sample_for_shadow(self, version, batch, probabilities):
+        shadow, rate = self._shadow, self._shadow_rate
+        if shadow is None or rate <= 0 or version is not self._active:
+            return
+        with self._lock:
+            sampled = self._random.random(len(probabilities)) < rate
+            count = int(sampled.sum())
+            if not count:
+                return
+            if self._shadow_pending >= self.shadow_max_pending:
+                self._version_stats(shadow.name).dropped += count
+                return
+            self._shadow_pending += 1
+            if self._shadow_pool is None:
+                self._shadow_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="classifier-shadow")
+            pool = self._shadow_pool
+        # Copies: the caller may reuse its buffers once the request finishes
+        pool.submit(self._compare, shadow, version, np.array(batch[sampled]), np.array(probabilities[sampled]))
+
+    def _compare(self, shadow, version, batch, probabilities):
+        started = time.perf_counter()
+        try:
+            candidate = shadow.predict_probabilities(batch)
+        except Exception as e:
+            print(f"Shadow inference with {shadow.name} failed: {str(e)}")
+            with self._lock:
+                self._version_stats(shadow.name).errors += 1
+                self._shadow_pending -= 1
+            return
+        seconds = time.perf_counter() - started
+        # Compare by class name, so versions may order (or extend) their labels differently
+        expected = [version.labels[i] for i in np.argmax(probabilities, axis=1)]
+        predicted = [shadow.labels[i] for i in np.argmax(candidate, axis=1)]
+        agreed = sum(a == b for a, b in zip(expected, predicted))
+        delta = float(np.abs(candidate.max(axis=1) - probabilities.max(axis=1)).sum())
+        with self._lock:
+            stats = self._version_stats(shadow.name)
+            stats.compared += len(batch)
+            stats.agreed += agreed
+            stats.confidence_delta += delta
+            stats.shadow_seconds += seconds
+            stats.against[version.name] = stats.against.get(version.name, 0) + len(batch)
+            self._shadow_pending -= 1
+        SHADOW_PREDICTIONS.inc(agreed, version=shadow.name, active=version.name, outcome="agree")
+        SHADOW_PREDICTIONS.inc(len(batch) - agreed, version=shadow.name, active=version.name, outcome="disagree")
@@ -0,0 +1,353 @@
+"""
+Dermatologist search: query parsing, ranking and pagination.
+
+``parse_query`` turns a chat message into a structured DermatologistQuery
+(condition, location, name). Chat input is mostly lowercase, so a location is
+recognised by matching the words after "in" / "near" / ... against the
+locations in the directory rather than by capitalisation. Condition and name are filters (case-insensitive
+containment on specialization / name), location is a ranking boost, so a
+search for an acne specialist in Nairobi lists the Nairobi ones first and
+still shows the others. Within those groups, closer specialization matches
+("Acne" before "Acne & Rosacea") come first, then by name.
+
+Two backends give the same results:
+- "database": ORM filters. On PostgreSQL they are served by the pg_trgm
+  GIN indexes from migration 0004 instead of sequential ILIKE scans.
+- "memory": the whole directory cached per process, with a substring index
+  per field, for small deployments (DERMATOLOGIST_DIRECTORY_MAX_ROWS). It is
+  reloaded after DERMATOLOGIST_DIRECTORY_TTL seconds, or at once when a
+  Dermatologist is saved or deleted in this process.
+"auto" uses the memory directory while the table is small enough.
+"""
+import heapq
+import re
+import threading
+import time
+from bisect import bisect_right
+from itertools import chain, islice
+
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.functions import Length
+
+from .metrics import timed
+
+FIELDS = ("id", "name", "specialization", "location", "email", "phone_number")
+
+# Words in messages -> term matched against Dermatologist.specialization
+CONDITION_TERMS = {
+    "acne": "acne", "pimple": "acne", "pimples": "acne", "breakouts": "acne",
+    "actinic keratosis": "keratosis", "actinickeratosis": "keratosis", "keratosis": "keratosis",
+    "alopecia": "alopecia", "alopecia areata": "alopecia", "alopeciaareata": "alopecia", "hair loss": "alopecia",
+    "chickenpox": "chickenpox", "cold sores": "cold sores", "cold sore": "cold sores",
+    "eczema": "eczema", "dermatitis": "eczema", "folliculitis": "folliculitis",
+    "hives": "hives", "urticaria": "hives", "uticaria": "hives", "impetigo": "impetigo",
+    "melanoma": "skin cancer", "skin cancer": "skin cancer", "mole": "skin cancer", "moles": "skin cancer",
+    "psoriasis": "psoriasis", "ringworm": "ringworm", "rosacea": "rosacea", "shingles": "shingles",
+    "vitiligo": "vitiligo", "wart": "warts", "warts": "warts",
+}
+
+_CONDITION = re.compile(
+    r"\b(" + "|".join(re.escape(term) for term in sorted(CONDITION_TERMS, key=len, reverse=True)) + r")\b"
+)
+# "specializing in X", "who treats X", ... up to the next location cue or punctuation
+_CONDITION_CUE = re.compile(
+    r"\b(?:speciali[sz]\w*\s+(?:in|on)|specialist\s+(?:in|for)|expert\s+(?:in|on)|experience\s+with"
+    r"|who\s+treats|that\s+treats|treating|deals?\s+with)\s+(?:a\s+|an\s+|the\s+|my\s+)?"
+    r"([a-z][\w' -]*?)(?=\s+(?:in|near|around|from)\b|[.,;!?]|$)"
+)
+_LOCATION_CUE = re.compile(r"\b(?:in|near|around|from)\s+(?:the\s+)?")
+# Longest location name tried after a cue, in words
+_LOCATION_MAX_WORDS = 4
+_NAME = re.compile(r"\b(?:[Dd]r\.?|[Dd]octor|named|called)\s+([A-Z][\w'-]+(?:\s+[A-Z][\w'-]+)?)")
+
+
+class DermatologistQuery:
+    __slots__ = ("condition", "location", "name")
+
+    def __init__(self, condition=None, location=None, name=None):
+        self.condition = condition or None
+        self.location = location or None
+        self.name = name or None
+
+    def as_dict(self):
+        return {"condition": self.condition, "location": self.location, "name": self.name}
+
+    def __repr__(self):
+        return f"DermatologistQuery({self.as_dict()})"
+
+
+def location_lookup(values):
+    """{normalised name: name} for Dermatologist.location values and their comma-separated parts"""
+    lookup = {}
+    for value in values:
+        for name in chain([value], (value or "").split(",")):
+            name = " ".join((name or "").split())
+            if name:
+                lookup.setdefault(name.lower(), name)
+    return lookup
+
+
+def _find_location(lower, locations):
+    """The longest known location right after a location cue, or None"""
+    for cue in _LOCATION_CUE.finditer(lower):
+        words = []
+        for word in lower[cue.end():].split()[:_LOCATION_MAX_WORDS]:
+            stripped = word.rstrip(".,;!?")
+            if stripped:
+                words.append(stripped)
+            if stripped != word:
+                break
+        for count in range(len(words), 0, -1):
+            name = locations.get(" ".join(words[:count]))
+            if name:
+                return name
+    return None
+
+
+def parse_query(text, locations=None):
+    """
+    Structured query from free text; unrecognised parts are ignored.
+
+    ``locations`` is a location_lookup() of the directory; without it no
+    location is extracted.
+    """
+    text = " ".join((text or "").split())
+    lower = text.lower()
+
+    condition = None
+    match = _CONDITION.search(lower)
+    if match:
+        condition = CONDITION_TERMS[match.group(1)]
+    else:
+        match = _CONDITION_CUE.search(lower)
+        if match:
+            condition = match.group(1).strip() or None
+
+    name = None
+    match = _NAME.search(text)
+    if match:
+        name = match.group(1)
+
+    location = _find_location(lower, locations) if locations else None
+    return DermatologistQuery(condition, location, name)
+
+
+class _SubstringIndex:
+    """Case-insensitive substring lookup over one field. The distinct values are joined into one
+    string, so a lookup is a loop of C-level ``str.find`` calls rather than a scan of every row."""
+
+    def __init__(self, values):
+        self._rows = {}
+        for position, value in enumerate(values):
+            self._rows.setdefault(" ".join((value or "").lower().split()), []).append(position)
+        self._values = list(self._rows)
+        self._starts = []
+        offset = 0
+        for value in self._values:
+            self._starts.append(offset)
+            offset += len(value) + 1
+        self._text = "\n".join(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def matches(self, term):
+        """[(value, row positions in ascending order)] for every distinct value containing ``term``"""
+        term = " ".join(term.lower().split())
+        found = []
+        position = self._text.find(term)
+        while position != -1:
+            value_id = bisect_right(self._starts, position) - 1
+            value = self._values[value_id]
+            found.append((value, self._rows[value]))
+            # Continue after this value; one hit per value is enough
+            position = self._text.find(term, self._starts[value_id] + len(value) + 1)
+        return found
+
+    def rows(self, term):
+        return {row for _, rows in self.matches(term) for row in rows}
+
+
+class DermatologistDirectory:
+    """Every Dermatologist row in memory, ordered by name, with a substring index per field"""
+
+    def __init__(self, rows):
+        self.rows = sorted(rows, key=lambda row: (row["name"], row["id"]))
+        self.locations = location_lookup(row["location"] for row in self.rows)
+        self._indexes = {
+            field: _SubstringIndex([row[field] for row in self.rows])
+            for field in ("name", "specialization", "location")
+        }
+
+    def __len__(self):
+        return len(self.rows)
+
+    def search(self, query, offset, limit):
+        local = self._indexes["location"].rows(query.location) if query.location else set()
+
+        if query.name:
+            # Name filters are selective: rank the (small) candidate set directly
+            matched = self._indexes["name"].rows(query.name)
+            if query.condition:
+                matched &= self._indexes["specialization"].rows(query.condition)
+            lengths = {i: len(self.rows[i]["specialization"] or "") for i in matched} if query.condition else {}
+            ordered = sorted(matched, key=lambda i: (i not in local, lengths.get(i, 0), i))
+            return [self.rows[i] for i in ordered[offset:offset + limit]], len(ordered)
+
+        # Otherwise walk groups of rows that share a specialization length, each in name order,
+        # and materialise only the requested page
+        if query.condition:
+            by_length = {}
+            for value, rows in self._indexes["specialization"].matches(query.condition):
+                by_length.setdefault(len(value), []).append(rows)
+            groups = [row_lists for _, row_lists in sorted(by_length.items())]
+            total = sum(len(rows) for row_lists in groups for rows in row_lists)
+        else:
+            groups = [[range(len(self.rows))]]
+            total = len(self.rows)
+
+        def in_order():
+            for row_lists in groups:
+                yield from row_lists[0] if len(row_lists) == 1 else heapq.merge(*row_lists)
+
+        if local:
+            ordered = chain((i for i in in_order() if i in local), (i for i in in_order() if i not in local))
+        else:
+            ordered = in_order()
+        return [self.rows[i] for i in islice(ordered, offset, offset + limit)], total
+
+
+class DermatologistSearch:
+    def __init__(self, backend="auto", directory_max_rows=5000, directory_ttl=300, page_size=5):
+        if backend not in ("auto", "database", "memory"):
+            raise ValueError(f"Unknown DERMATOLOGIST_SEARCH_BACKEND: {backend}")
+        self.backend = backend
+        self.directory_max_rows = directory_max_rows
+        self.directory_ttl = directory_ttl
+        self.page_size = page_size
+        self._directory = None  # DermatologistDirectory, or False when the table is too large
+        self._loaded_at = 0.0
+        self._locations = None  # location_lookup() for the database backend
+        self._locations_loaded_at = 0.0
+        self._lock = threading.Lock()
+        self.directory_loads = 0
+        self.searches = {"database": 0, "memory": 0}
+
+    def invalidate(self):
+        """Drop the cached directory; the next search reloads it"""
+        with self._lock:
+            self._directory = None
+            self._locations = None
+
+    def directory(self):
+        """The cached directory, or None when searches should go to the database"""
+        if self.backend == "database":
+            return None
+        directory = self._directory
+        if directory is None or time.monotonic() - self._loaded_at > self.directory_ttl:
+            with self._lock:
+                directory = self._directory
+                if directory is None or time.monotonic() - self._loaded_at > self.directory_ttl:
+                    directory = self._directory = self._load_directory()
+                    self._loaded_at = time.monotonic()
+        return directory or None
+
+    def locations(self):
+        """location_lookup() of the directory, for parse_query; refreshed like the directory"""
+        directory = self.directory()
+        if directory is not None:
+            return directory.locations
+        locations = self._locations
+        if locations is None or time.monotonic() - self._locations_loaded_at > self.directory_ttl:
+            from .models import Dermatologist
+
+            locations = self._locations = location_lookup(
+                Dermatologist.objects.exclude(location="").values_list("location", flat=True).distinct()
+            )
+            self._locations_loaded_at = time.monotonic()
+        return locations
+
+    def _load_directory(self):
+        from .models import Dermatologist
+
+        if self.backend == "auto" and Dermatologist.objects.count() > self.directory_max_rows:
+            return False
+        self.directory_loads += 1
+        return DermatologistDirectory(list(Dermatologist.objects.values(*FIELDS)))
+
+    def search(self, query, page=1, page_size=None):
+        """One page of ranked results; ``query`` is free text or a DermatologistQuery"""
+        if not isinstance(query, DermatologistQuery):
+            query = parse_query(query, self.locations())
+        page = max(1, int(page))
+        page_size = max(1, int(page_size or self.page_size))
+        offset = (page - 1) * page_size
+
+        with timed("dermatologist_search"):
+            directory = self.directory()
+            if directory is not None:
+                self.searches["memory"] += 1
+                rows, total = directory.search(query, offset, page_size)
+            else:
+                self.searches["database"] += 1
+                rows, total = self._database_search(query, offset, page_size)
+
+        return {
+            "query": query.as_dict(),
+            "results": [dict(row) for row in rows],
+            "page": page,
+            "page_size": page_size,
+            "total": total,
+            "has_next": offset + len(rows) < total,
+        }
+
+    def _database_search(self, query, offset, limit):
+        from .models import Dermatologist
+
+        queryset = Dermatologist.objects.all()
+        if query.condition:
+            queryset = queryset.filter(specialization__icontains=query.condition)
+        if query.name:
+            queryset = queryset.filter(name__icontains=query.name)
+        ordering = []
+        if query.location:
+            queryset = queryset.annotate(in_location=Case(
+                When(location__icontains=query.location, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            ))
+            ordering.append("-in_location")
+        if query.condition:
+            queryset = queryset.annotate(specialization_length=Length("specialization"))
+            ordering.append("specialization_length")
+        queryset = queryset.order_by(*ordering, "name", "id")
+        return list(queryset.values(*FIELDS)[offset:offset + limit]), queryset.count()
+
+    def stats(self):
+        directory = self._directory
+        return {
+            "backend": self.backend,
+            "directory_rows": len(directory) if directory else None,
+            "directory_loads": self.directory_loads,
+            "searches": dict(self.searches),
+        }
+
+
+def format_results(page):
+    """Chat-friendly list of one result page"""
+    lines = []
+    for row in page["results"]:
+        details = ", ".join(value for value in (row["specialization"], row["location"]) if value)
+        contact = " | ".join(value for value in (row["email"], row["phone_number"]) if value)
+        lines.append(f"- {row['name']} ({details})" + (f" - {contact}" if contact else ""))
+    if page["has_next"]:
+        lines.append(f"Showing {len(page['results'])} of {page['total']}; ask for more options to see the next page.")
+    return "\n".join(lines)
+
+
+def invalidate_directory(sender=None, **kwargs):
+    """post_save / post_delete receiver for Dermatologist"""
+    from . import model_registry
+
+    if model_registry.is_loaded("dermatologist_search"):
+        model_registry.get_dermatologist_search().invalidate()
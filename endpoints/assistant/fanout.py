@@ -0,0 +1,134 @@
+"""
+Concurrent execution of the independent stages of one assistant request.
+
+Image inference, text routing plus retrieval or the dermatologist lookup, and
+the ConversationSession lookup do not depend on each other. ``RequestStages``
+submits the first two to a bounded, process-wide thread pool, runs the rest
+inline on the request thread, and joins everything before the LLM call.
+
+Every stage is timed relative to the start of the request. The timings go
+into a ``Server-Timing`` response header (visible in browser dev tools) and
+into per-stage aggregates served by /api/request-stats/. ``wall_ms`` against
+``serial_ms`` shows how much the overlap saves, and ``critical_path`` lists
+the chain of stages that determined the wall time.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .metrics import REQUEST_STAGE_SECONDS
+from .streaming import LatencyStats
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_request_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.REQUEST_FANOUT_WORKERS,
+                    thread_name_prefix="request-stage",
+                )
+    return _executor
+
+
+class StageStats:
+    """Per-stage latency windows across requests"""
+
+    def __init__(self):
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds):
+        with self._lock:
+            stats = self._stages.get(name)
+            if stats is None:
+                stats = self._stages[name] = LatencyStats()
+        stats.observe(seconds)
+
+    def summary(self):
+        with self._lock:
+            stages = dict(self._stages)
+        return {name: stats.summary() for name, stats in sorted(stages.items())}
+
+
+stage_stats = StageStats()
+
+
+class RequestStages:
+    """Run and time the stages of one request; ``submit`` for concurrent ones, ``run`` for inline ones"""
+
+    def __init__(self, executor=None, stats=stage_stats):
+        self.started = time.perf_counter()
+        self.executor = executor or get_request_executor()
+        self.stats = stats
+        self.timings = {}
+        self._futures = {}
+
+    def _timed(self, name, fn, args, kwargs, pooled):
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            end = time.perf_counter()
+            self.timings[name] = (start - self.started, end - self.started)
+            self.stats.observe(name, end - start)
+            REQUEST_STAGE_SECONDS.observe(end - start, stage=name)
+            if pooled:
+                # Pool threads outlive requests: release any DB connection the stage opened
+                close_old_connections()
+
+    def submit(self, name, fn, *args, **kwargs):
+        self._futures[name] = self.executor.submit(self._timed, name, fn, args, kwargs, True)
+        return self._futures[name]
+
+    def run(self, name, fn, *args, **kwargs):
+        return self._timed(name, fn, args, kwargs, False)
+
+    def result(self, name, timeout=None):
+        """Join a submitted stage; re-raises its exception"""
+        return self._futures[name].result(timeout=timeout)
+
+    def __contains__(self, name):
+        return name in self._futures
+
+    def summary(self):
+        wall = time.perf_counter() - self.started
+        stages = {
+            name: {"start_ms": round(start * 1000, 2), "duration_ms": round((end - start) * 1000, 2)}
+            for name, (start, end) in sorted(self.timings.items(), key=lambda item: item[1][0])
+        }
+        return {
+            "stages": stages,
+            "critical_path": self.critical_path(),
+            "wall_ms": round(wall * 1000, 2),
+            "serial_ms": round(sum(end - start for start, end in self.timings.values()) * 1000, 2),
+        }
+
+    def critical_path(self):
+        """Stages the wall time hinged on: walk back from the last stage to finish, each time taking
+        the latest-finishing stage that ended before the current one started"""
+        path = []
+        remaining = dict(self.timings)
+        boundary = float("inf")
+        while True:
+            candidates = [name for name, (_, end) in remaining.items() if end <= boundary]
+            if not candidates:
+                break
+            name = max(candidates, key=lambda candidate: remaining[candidate][1])
+            path.append(name)
+            boundary = remaining.pop(name)[0]
+        return path[::-1]
+
+    def server_timing(self):
+        """``Server-Timing`` header value, e.g. ``inference;dur=41.2, session;dur=3.0``"""
+        return ", ".join(
+            f"{name};dur={(end - start) * 1000:.1f}"
+            for name, (start, end) in sorted(self.timings.items(), key=lambda item: item[1][0])
+        )
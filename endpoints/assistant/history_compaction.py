@@ -0,0 +1,123 @@
+"""
+History compaction in front of MessagesPlaceholder("history").
+
+The last ``CHAT_HISTORY_VERBATIM_TURNS`` turns are passed to the LLM as-is.
+Anything older is folded into a running summary that is cached per session
+and only updated with the messages that have dropped out of the verbatim
+window since the last call, so each summarisation call is small.
+
+What has been folded is tracked by position: the already-summarised messages
+are always a prefix of the older part of the window, found by lining it up
+with the sequence folded so far. A repeated message ("thank you", the same
+question twice) is therefore still folded in, unlike a lookup by content.
+"""
+import hashlib
+from collections import deque
+
+from django.conf import settings
+from langchain_core.messages import SystemMessage
+
+from .caching import LRUTTLCache
+from .chat_memory import approx_tokens
+from .metrics import LLM_PROMPT_TOKENS
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a patient and a dermatology assistant.
+Keep diagnoses, confidence scores, symptoms, treatments discussed and any open questions. Be brief.
+
+Current summary:
+{summary}
+
+New messages to fold in:
+{messages}
+
+Updated summary:"""
+
+_summary_cache = LRUTTLCache(
+    maxsize=settings.CHAT_HISTORY_CACHE_SIZE,
+    ttl=settings.CHAT_HISTORY_CACHE_TTL,
+)
+
+_encoding = None
+
+
+def count_tokens(messages):
+    """Token count of a list of messages, using tiktoken when it is installed"""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        # ~4 tokens of chat framing per message
+        return sum(len(_encoding.encode(message.content)) + 4 for message in messages)
+    return sum(approx_tokens(message.content) + 4 for message in messages)
+
+
+def _fingerprint(message):
+    return hashlib.sha1(f"{message.type}:{message.content}".encode("utf-8")).hexdigest()
+
+
+class HistoryCompactor:
+    """Runnable-compatible callable that rewrites the ``history`` key of the chain input"""
+
+    def __init__(self, summarize_llm, verbatim_turns=None, cache=_summary_cache):
+        self.summarize_llm = summarize_llm
+        self.verbatim_turns = verbatim_turns or settings.CHAT_HISTORY_VERBATIM_TURNS
+        self.cache = cache
+
+    def __call__(self, inputs, config=None):
+        history = list(inputs.get("history") or [])
+        keep = 2 * self.verbatim_turns
+        if len(history) <= keep:
+            return inputs
+
+        session_id = ((config or {}).get("configurable") or {}).get("session_id")
+        older, recent = history[:-keep], history[-keep:]
+        summary = self._update_summary(session_id, older)
+        if not summary:
+            return inputs
+
+        return {
+            **inputs,
+            "history": [SystemMessage(content=f"Summary of the earlier conversation: {summary}")] + recent,
+        }
+
+    def _update_summary(self, session_id, older):
+        state = self.cache.get(session_id) if session_id else None
+        if state is None:
+            state = {"summary": "", "folded": deque(maxlen=4 * settings.CHAT_HISTORY_MAX_TURNS)}
+
+        fingerprints = [_fingerprint(message) for message in older]
+        folded = list(state["folded"])
+        # The window slides as turns are added, so the folded part of ``older`` is its longest
+        # prefix that ends the folded sequence
+        done = next(
+            (k for k in range(min(len(older), len(folded)), 0, -1) if fingerprints[:k] == folded[-k:]),
+            0,
+        )
+        pending = older[done:]
+        if not pending:
+            return state["summary"]
+
+        transcript = "\n".join(f"{message.type}: {message.content}" for message in pending)
+        try:
+            result = self.summarize_llm.invoke(
+                SUMMARY_PROMPT.format(summary=state["summary"] or "(none)", messages=transcript)
+            )
+        except Exception as e:
+            print(f"History summarisation failed: {str(e)}")
+            return state["summary"]
+
+        state["summary"] = result.content.strip()
+        state["folded"].extend(fingerprints[done:])
+        if session_id:
+            self.cache.set(session_id, state)
+        return state["summary"]
+
+
+def record_prompt_tokens(prompt_value, config=None):
+    """Pass-through stage that records the size of the prompt sent to the LLM in assistant_llm_prompt_tokens"""
+    LLM_PROMPT_TOKENS.observe(count_tokens(prompt_value.to_messages()))
+    return prompt_value
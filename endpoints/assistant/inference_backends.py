@@ -0,0 +1,89 @@
+"""
+Lightweight CPU runtimes for the skin disease classifier.
+
+``python manage.py export_classifier`` converts the Keras model to a TFLite
+flatbuffer (optionally float16 / dynamic-range / full int8 quantized).
+``TFLiteClassifier`` runs that file with the standalone LiteRT interpreter
+(``ai-edge-litert``), falling back to ``tflite_runtime`` or ``tf.lite``, so a
+worker configured with CLASSIFIER_BACKEND="tflite" never imports Keras.
+
+Classifiers are called like the Keras model, ``classifier(batch,
+training=False)``, and return (N, len(data_cat)) float32 logits.
+"""
+import os
+import threading
+
+import numpy as np
+
+
+def load_interpreter_class():
+    """The smallest available TFLite interpreter implementation"""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+
+            Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+class TFLiteClassifier:
+    """
+    Thread-safe wrapper around a TFLite interpreter.
+
+    The interpreter is not re-entrant, so calls are serialised with a lock (the
+    batching scheduler already funnels single-image requests through one
+    thread). The input tensor is resized whenever the batch size changes, and
+    quantized inputs/outputs are (de)quantized with the tensor's scale and
+    zero point.
+    """
+
+    def __init__(self, model_path, num_threads=None):
+        Interpreter = load_interpreter_class()
+        self.model_path = model_path
+        self.interpreter = Interpreter(
+            model_path=model_path,
+            num_threads=num_threads or os.cpu_count() or 1,
+        )
+        self.interpreter.allocate_tensors()
+        self._input = self.interpreter.get_input_details()[0]
+        self._output = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self._input["shape"][0])
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _quantize(batch, details):
+        scale, zero_point = details["quantization"]
+        if not scale:
+            return batch.astype(details["dtype"])
+        info = np.iinfo(details["dtype"])
+        return np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(details["dtype"])
+
+    @staticmethod
+    def _dequantize(values, details):
+        scale, zero_point = details["quantization"]
+        if not scale:
+            return values.astype(np.float32)
+        return (values.astype(np.float32) - zero_point) * scale
+
+    def __call__(self, batch, training=False):
+        batch = np.asarray(batch, dtype=np.float32)
+        if self._input["dtype"] != np.float32:
+            batch = self._quantize(batch, self._input)
+
+        with self._lock:
+            if batch.shape[0] != self._batch_size:
+                self.interpreter.resize_tensor_input(self._input["index"], batch.shape)
+                self.interpreter.allocate_tensors()
+                self._output = self.interpreter.get_output_details()[0]
+                self._batch_size = batch.shape[0]
+            self.interpreter.set_tensor(self._input["index"], batch)
+            self.interpreter.invoke()
+            logits = self.interpreter.get_tensor(self._output["index"]).copy()
+
+        if self._output["dtype"] != np.float32:
+            logits = self._dequantize(logits, self._output)
+        return logits
@@ -0,0 +1,304 @@
+"""
+Out-of-process classifier inference over a Unix socket and shared memory.
+
+``python manage.py run_inference_server`` starts a pool of worker processes
+that each load the classifier once. Django workers then send batches to it
+instead of loading TensorFlow themselves. Set INFERENCE_SERVER_SOCKET to
+enable this; model_registry.predict_probabilities then routes through
+``InferenceClient``.
+
+Per request, the client creates one POSIX shared-memory block laid out as
+[input (N, 180, 180, 3) float32 | output (N, len(data_cat)) float32], copies
+the batch in and sends a small length-prefixed JSON message naming the block.
+The pool worker attaches, writes softmax probabilities into the output
+region and replies. No pixel data goes through the socket or pickle, and no
+external broker is involved.
+
+Pool workers follow the model registry's serving.json like Django workers
+(hot-swap, shadow sampling), but the block layout is fixed, so versions
+served this way must keep the 180x180 input and the built-in classes.
+
+The server rejects work with ``busy`` once INFERENCE_SERVER_MAX_PENDING
+batches are queued (backpressure), expires jobs that waited longer than the
+caller's timeout, and answers ``{"op": "health"}`` probes.
+"""
+import json
+import os
+import socket
+import socketserver
+import struct
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context, resource_tracker, shared_memory
+
+import numpy as np
+
+from .model_registry import data_cat
+from .preprocessing import IMG_HEIGHT, IMG_WIDTH
+
+_HEADER = struct.Struct("!I")
+
+
+class InferenceServerError(Exception):
+    pass
+
+
+class InferenceServerBusy(InferenceServerError):
+    pass
+
+
+# Wire protocol: 4-byte big-endian length, then a UTF-8 JSON object
+
+def send_message(sock, message):
+    payload = json.dumps(message).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock, size):
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("inference server connection closed")
+        data.extend(chunk)
+    return bytes(data)
+
+
+def recv_message(sock):
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return json.loads(_recv_exact(sock, size).decode("utf-8"))
+
+
+def _views(shm, count):
+    """(inputs, outputs) arrays over a request's shared-memory block"""
+    inputs = np.ndarray((count, IMG_HEIGHT, IMG_WIDTH, 3), dtype=np.float32, buffer=shm.buf)
+    outputs = np.ndarray((count, len(data_cat)), dtype=np.float32, buffer=shm.buf, offset=inputs.nbytes)
+    return inputs, outputs
+
+
+def _block_size(count):
+    return count * (IMG_HEIGHT * IMG_WIDTH * 3 + len(data_cat)) * 4
+
+
+# Pool worker side (runs in the spawned worker processes)
+
+def _init_worker(settings_module, threads):
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings_module)
+    import django
+
+    django.setup()
+    from django.conf import settings
+
+    from . import model_registry
+
+    settings.CLASSIFIER_NUM_THREADS = threads
+    if settings.CLASSIFIER_BACKEND == "keras":
+        import tensorflow as tf
+
+        tf.config.threading.set_intra_op_parallelism_threads(threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    version = model_registry.active_version()
+    version.warm_up()
+    print(f"Inference worker {os.getpid()} ready ({version.name})")
+
+
+def _predict(shm_name, count, deadline):
+    if time.time() > deadline:
+        raise TimeoutError("expired while queued")
+    from .model_registry import get_classifier_registry
+
+    registry = get_classifier_registry()
+    version = registry.active()
+    if len(version.labels) != len(data_cat):
+        raise ValueError(f"Version {version.name} has {len(version.labels)} classes; the inference server needs {len(data_cat)}")
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    # The client owns (and unlinks) the block; stop this process's tracker from unlinking it too
+    resource_tracker.unregister(shm._name, "shared_memory")
+    inputs = outputs = None
+    try:
+        inputs, outputs = _views(shm, count)
+        outputs[:] = registry.predict(inputs, version)
+    finally:
+        # Views must be released before the mapping can be closed
+        inputs = outputs = None
+        shm.close()
+    return count
+
+
+# Server side
+
+class InferenceServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, settings_module, workers=None, max_pending=64, threads_per_worker=1):
+        self.socket_path = socket_path
+        self.settings_module = settings_module
+        self.workers = workers or os.cpu_count() or 1
+        self.threads_per_worker = threads_per_worker
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.pool = self._start_pool()
+        self.started = time.time()
+        self.pending = 0
+        self.processed = 0
+        self.rejected = 0
+        self.errors = 0
+        self.restarts = 0
+
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        super().__init__(socket_path, InferenceRequestHandler)
+
+    def _start_pool(self):
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.settings_module, self.threads_per_worker),
+        )
+        # Start every worker (and load the model) before accepting requests
+        for future in [pool.submit(time.sleep, 0) for _ in range(self.workers)]:
+            future.result()
+        return pool
+
+    def _restart_pool(self, broken):
+        with self._pool_lock:
+            if self.pool is broken:
+                print("Inference pool broken, restarting workers")
+                broken.shutdown(wait=False, cancel_futures=True)
+                self.pool = self._start_pool()
+                self.restarts += 1
+
+    def predict(self, shm_name, count, timeout):
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected")
+            raise InferenceServerBusy(f"{self.max_pending} batches already pending")
+        self._count("pending")
+
+        def release(_):
+            self._count("pending", -1)
+            self._slots.release()
+
+        pool = self.pool
+        try:
+            future = pool.submit(_predict, shm_name, count, time.time() + timeout)
+        except BrokenProcessPool:
+            release(None)
+            self._restart_pool(pool)
+            raise
+        future.add_done_callback(release)
+        try:
+            future.result(timeout=timeout)
+        except BrokenProcessPool:
+            self._count("errors")
+            self._restart_pool(pool)
+            raise
+        except FutureTimeout:
+            self._count("errors")
+            raise TimeoutError(f"inference did not finish within {timeout}s")
+        except Exception:
+            self._count("errors")
+            raise
+        self._count("processed", count)
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def health(self):
+        return {
+            "status": "ok",
+            "workers": self.workers,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "processed": self.processed,
+            "rejected": self.rejected,
+            "errors": self.errors,
+            "restarts": self.restarts,
+            "uptime_s": round(time.time() - self.started, 1),
+        }
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+class InferenceRequestHandler(socketserver.BaseRequestHandler):
+    """One connection may carry many request/response pairs"""
+
+    def handle(self):
+        while True:
+            try:
+                message = recv_message(self.request)
+            except (ConnectionError, OSError, ValueError):
+                return
+            send_message(self.request, self.dispatch(message))
+
+    def dispatch(self, message):
+        op = message.get("op")
+        if op == "health":
+            return {"ok": True, **self.server.health()}
+        if op != "predict":
+            return {"ok": False, "error": f"unknown op {op!r}"}
+        started = time.perf_counter()
+        try:
+            self.server.predict(message["shm"], int(message["count"]), float(message.get("timeout", 30)))
+        except InferenceServerBusy as e:
+            return {"ok": False, "busy": True, "error": str(e)}
+        except Exception as e:
+            return {"ok": False, "error": f"{type(e).__name__}: {str(e)}"}
+        return {"ok": True, "elapsed_ms": (time.perf_counter() - started) * 1000}
+
+
+# Client side (runs in the Django workers)
+
+class InferenceClient:
+    """Sends batches to a running inference server; see the module docstring"""
+
+    def __init__(self, socket_path, timeout=30.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    def _request(self, message, timeout):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            # Slack over the server-side deadline so its timeout reply can still arrive
+            sock.settimeout(timeout + 1.0)
+            try:
+                sock.connect(self.socket_path)
+                send_message(sock, message)
+                return recv_message(sock)
+            except (OSError, ConnectionError) as e:
+                raise InferenceServerError(f"inference server unavailable at {self.socket_path}: {str(e)}")
+
+    def predict_probabilities(self, batch):
+        batch = np.asarray(batch, dtype=np.float32)
+        count = len(batch)
+        shm = shared_memory.SharedMemory(create=True, size=_block_size(count))
+        inputs = outputs = None
+        try:
+            inputs, outputs = _views(shm, count)
+            inputs[:] = batch
+            reply = self._request(
+                {"op": "predict", "shm": shm.name, "count": count, "timeout": self.timeout},
+                self.timeout,
+            )
+            if not reply.get("ok"):
+                error = InferenceServerBusy if reply.get("busy") else InferenceServerError
+                raise error(reply.get("error", "inference failed"))
+            probabilities = outputs.copy()
+        finally:
+            inputs = outputs = None
+            shm.close()
+            shm.unlink()
+        return probabilities
+
+    def health(self, timeout=2.0):
+        return self._request({"op": "health"}, timeout)
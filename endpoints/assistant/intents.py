@@ -0,0 +1,148 @@
+"""
+Keyword intent engine for text messages.
+
+All keywords from the rules file (assistant/intent_rules.json, or
+INTENT_RULES_PATH) are compiled once into a single regex with word
+boundaries, factored into a prefix trie. One ``findall`` pass over a message
+collects every matched keyword; the tuple of matches is then mapped to an
+Intent (healthcare / off_topic, routing mode, follow-up actions) through a
+memo, so classification cost grows with the message length but not with the
+number of keywords.
+
+Rules format:
+    off_topic        keywords that mark a message as not about skin health
+    healthcare       keywords that mark it as in scope
+    modes            {mode: [keywords]}, checked in order; otherwise "general_chat"
+    actions          {action: [keywords]}, every matching action in order
+    default_actions  actions used when none match
+
+Keywords match whole words, case-insensitively. A trailing ``*`` also matches
+longer words ("itch*" matches itchy and itching), and the spaces in a phrase
+match any run of whitespace. Unlike the old substring scans, "red" no longer
+matches inside "bored".
+"""
+import json
+import re
+from functools import lru_cache
+
+_END = ""
+MAX_CACHED_INTENTS = 4096
+
+
+def _normalize(keyword):
+    return " ".join(keyword.strip().lower().split())
+
+
+def _keyword_pattern(keyword):
+    prefix = keyword.endswith("*")
+    pattern = r"\s+".join(re.escape(word) for word in keyword.rstrip("*").split())
+    return pattern + r"\w*" if prefix else pattern
+
+
+def _units(keyword):
+    for char in keyword:
+        yield r"\w*" if char == "*" else r"\s+" if char == " " else re.escape(char)
+
+
+def _trie_pattern(keywords):
+    """Alternation factored on shared prefixes, so at each position the regex engine
+    rejects every keyword not starting with the current character in one step"""
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for unit in _units(keyword):
+            node = node.setdefault(unit, {})
+        node[_END] = {}
+
+    def render(node):
+        branches = [unit + render(child) for unit, child in sorted(node.items()) if unit != _END]
+        if not branches:
+            return ""
+        group = branches[0] if len(branches) == 1 and _END not in node else "(?:" + "|".join(branches) + ")"
+        return group + "?" if _END in node else group
+
+    return render(trie)
+
+
+class Intent:
+    __slots__ = ("healthcare", "mode", "actions", "keywords")
+
+    def __init__(self, healthcare, mode, actions, keywords):
+        self.healthcare = healthcare
+        self.mode = mode
+        self.actions = actions
+        self.keywords = keywords
+
+    def __repr__(self):
+        return f"Intent(healthcare={self.healthcare}, mode={self.mode!r}, actions={self.actions!r})"
+
+
+class IntentEngine:
+    def __init__(self, rules):
+        self.modes = list(rules.get("modes", {}))
+        self.actions = list(rules.get("actions", {}))
+        self.default_actions = list(rules.get("default_actions", []))
+
+        # tag -> keywords; tags are "off_topic", "healthcare", "mode:<name>" and "action:<name>"
+        tagged = {"off_topic": rules.get("off_topic", []), "healthcare": rules.get("healthcare", [])}
+        for mode, keywords in rules.get("modes", {}).items():
+            tagged[f"mode:{mode}"] = keywords
+        for action, keywords in rules.get("actions", {}).items():
+            tagged[f"action:{action}"] = keywords
+
+        keyword_tags = {}
+        for tag, keywords in tagged.items():
+            for keyword in keywords:
+                keyword_tags.setdefault(_normalize(keyword), set()).add(tag)
+        if not keyword_tags:
+            raise ValueError("Intent rules define no keywords")
+
+        # Per keyword, for mapping a matched word back to every tag it carries
+        self._keywords = [
+            (re.compile(rf"\b{_keyword_pattern(keyword)}\b"), frozenset(tags))
+            for keyword, tags in keyword_tags.items()
+        ]
+        # Messages are lowercased first, which is cheaper than an IGNORECASE scan. The lookahead on
+        # the possible first characters lets most word starts fail before entering the trie.
+        first_chars = re.escape("".join(sorted({keyword[0] for keyword in keyword_tags})))
+        self._pattern = re.compile(rf"\b(?=[{first_chars}]){_trie_pattern(keyword_tags)}\b")
+        self._tags_for = lru_cache(maxsize=4096)(self._match_tags)
+        # Matched keywords -> Intent; messages repeat few keyword combinations
+        self._intents = {}
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding="utf-8") as handle:
+            return cls(json.load(handle))
+
+    def _match_tags(self, text):
+        """Tags of every keyword found in a matched span; a phrase also carries its words' tags"""
+        tags = set()
+        for pattern, keyword_tags in self._keywords:
+            if pattern.search(text):
+                tags |= keyword_tags
+        return frozenset(tags)
+
+    def _intent(self, keywords):
+        tags = set()
+        for keyword in keywords:
+            tags |= self._tags_for(" ".join(keyword.split()))
+        healthcare = "healthcare" in tags and "off_topic" not in tags
+        if healthcare:
+            mode = next((mode for mode in self.modes if f"mode:{mode}" in tags), "general_chat")
+        else:
+            mode = "off_topic"
+        actions = tuple(action for action in self.actions if f"action:{action}" in tags)
+        return Intent(healthcare, mode, actions or tuple(self.default_actions), keywords)
+
+    def classify(self, message, is_followup=False):
+        """Intent of ``message``; follow-ups to an in-scope conversation always route to general_chat"""
+        keywords = tuple(self._pattern.findall(message.lower()))
+        intent = self._intents.get(keywords)
+        if intent is None:
+            if len(self._intents) >= MAX_CACHED_INTENTS:
+                self._intents.clear()
+            intent = self._intents[keywords] = self._intent(keywords)
+        if is_followup and intent.healthcare:
+            return Intent(True, "general_chat", intent.actions, keywords)
+        return intent
@@ -0,0 +1,40 @@
+"""LangChain callback that feeds LLM latency, outcomes and token usage into assistant.metrics"""
+import threading
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from .metrics import LLM_CALLS, LLM_TOKENS, STAGE_SECONDS
+
+
+class LLMMetricsCallback(BaseCallbackHandler):
+    """Attached to the shared chat model, so blocking, streaming and async calls are all recorded"""
+
+    def __init__(self):
+        self._started = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        with self._lock:
+            self._started[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        with self._lock:
+            self._started[run_id] = time.perf_counter()
+
+    def _finish(self, run_id, outcome):
+        with self._lock:
+            started = self._started.pop(run_id, None)
+        if started is not None:
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage="llm")
+        LLM_CALLS.inc(outcome=outcome)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._finish(run_id, "success")
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        for kind in ("prompt_tokens", "completion_tokens"):
+            if usage.get(kind):
+                LLM_TOKENS.inc(usage[kind], kind=kind.split("_")[0])
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._finish(run_id, "error")
@@ -0,0 +1,50 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from assistant.retrieval_backends import BM25Index, DenseVectorIndex, iter_corpus
+
+
+class Command(BaseCommand):
+    help = "Build a local medical-knowledge index (BM25 or dense vectors) from a corpus directory"
+
+    def add_arguments(self, parser):
+        parser.add_argument("corpus", help="Directory of .txt/.md/.jsonl documents")
+        parser.add_argument("--output", default=settings.RETRIEVAL_INDEX_DIR,
+                            help="Index directory (defaults to RETRIEVAL_INDEX_DIR)")
+        parser.add_argument("--backend", choices=["bm25", "dense"], default="bm25")
+        parser.add_argument("--max-words", type=int, default=200,
+                            help="Approximate passage size when splitting text files")
+        parser.add_argument("--query", action="append", default=[],
+                            help="Sample query to run against the fresh index (repeatable)")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        documents = list(iter_corpus(options["corpus"], max_words=options["max_words"]))
+        if not documents:
+            raise CommandError(f"No documents found under {options['corpus']}")
+
+        output = options["output"]
+        if options["backend"] == "bm25":
+            BM25Index.build(documents, output)
+            index = BM25Index(output)
+        else:
+            from assistant.model_registry import get_embeddings
+
+            embeddings = get_embeddings()
+            DenseVectorIndex.build(documents, output, embed_documents=embeddings.embed_documents)
+            index = DenseVectorIndex(output, embed_query=embeddings.embed_query)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {len(documents)} passages into {output} "
+            f"({options['backend']}, {time.perf_counter() - started:.1f}s)"
+        ))
+
+        for query in options["query"]:
+            query_started = time.perf_counter()
+            hits = index.search(query, top=3)
+            elapsed_ms = (time.perf_counter() - query_started) * 1000
+            self.stdout.write(f"{query!r}: {len(hits)} hits in {elapsed_ms:.2f}ms")
+            for hit in hits:
+                self.stdout.write(f"  - {hit['source']}: {hit['content'][:80]!r}")
@@ -0,0 +1,89 @@
+import os
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from assistant.calibration import calibration_report, fit_temperature, write_calibration
+from assistant.classifier_versions import read_serving_config, write_serving_config
+from assistant.model_registry import get_classifier_registry
+from assistant.preprocessing import preprocess_batch
+from training.data import IMAGE_EXTENSIONS
+
+
+def labelled_images(directory, labels, limit=None):
+    """(paths, label indexes) for images in class folders named like the version's labels"""
+    paths, targets = [], []
+    for label, name in enumerate(labels):
+        folder = os.path.join(directory, name)
+        if not os.path.isdir(folder):
+            continue
+        for filename in sorted(os.listdir(folder)):
+            if filename.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(os.path.join(folder, filename))
+                targets.append(label)
+    if limit and len(paths) > limit:
+        # Evenly spaced, so every class keeps its share
+        keep = np.linspace(0, len(paths) - 1, limit).astype(int)
+        paths, targets = [paths[i] for i in keep], [targets[i] for i in keep]
+    return paths, np.asarray(targets)
+
+
+class Command(BaseCommand):
+    help = (
+        "Fit a softmax temperature for a classifier version on held-out labelled images and store it "
+        "in calibration.json; running workers pick it up with the next serving.json poll"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("data_dir", help="Held-out images in one folder per class (not the training set)")
+        parser.add_argument("--model-version", help="Version to calibrate (default: the active one; 'default' "
+                                                    "for CLASSIFIER_MODEL_PATH)")
+        parser.add_argument("--batch-size", type=int, default=64)
+        parser.add_argument("--limit", type=int, help="Use at most this many images")
+        parser.add_argument("--dry-run", action="store_true", help="Report the fit without writing it")
+
+    def handle(self, *args, **options):
+        registry = get_classifier_registry()
+        name = options["model_version"]
+        try:
+            version = registry.version(name) if name else registry.active()
+        except Exception as e:
+            raise CommandError(f"Cannot load version {name}: {str(e)}")
+        if not version.calibration_path:
+            raise CommandError(f"Version {version.name} has no calibration path")
+
+        paths, targets = labelled_images(options["data_dir"], version.labels, options["limit"])
+        if not len(paths):
+            raise CommandError(f"No images in class folders under {options['data_dir']}")
+        self.stdout.write(f"Scoring {len(paths)} images with {version.name}")
+
+        started = time.perf_counter()
+        logits, labels = [], []
+        batch_size = max(1, options["batch_size"])
+        for start in range(0, len(paths), batch_size):
+            batch, errors = preprocess_batch(paths[start:start + batch_size], size=version.image_size)
+            keep = [i for i in range(len(batch)) if i not in errors]
+            if keep:
+                logits.append(version.predict_logits(batch[keep]))
+                labels.append(targets[start:start + batch_size][keep])
+        if not logits:
+            raise CommandError(f"None of the {len(paths)} images under {options['data_dir']} could be decoded")
+        logits, labels = np.concatenate(logits), np.concatenate(labels)
+
+        report = calibration_report(logits, labels, fit_temperature(logits, labels))
+        report["model_version"] = version.name
+        self.stdout.write(
+            f"{report['samples']} images in {time.perf_counter() - started:.1f}s, top-1 accuracy {report['accuracy']:.1%}\n"
+            f"temperature {report['temperature']:.3f}: NLL {report['nll_before']:.4f} -> {report['nll_after']:.4f}, "
+            f"ECE {report['ece_before']:.4f} -> {report['ece_after']:.4f}"
+        )
+        if options["dry_run"]:
+            return
+
+        write_calibration(version.calibration_path, report)
+        # Rewriting serving.json (same content, new mtime) makes every worker re-read its calibration
+        versions_dir = settings.CLASSIFIER_VERSIONS_DIR
+        write_serving_config(versions_dir, read_serving_config(versions_dir))
+        self.stdout.write(self.style.SUCCESS(f"Wrote {version.calibration_path}"))
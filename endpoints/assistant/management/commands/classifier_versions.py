@@ -0,0 +1,72 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from assistant.classifier_versions import (
+    ModelVersion,
+    available_versions,
+    read_serving_config,
+    write_serving_config,
+)
+
+
+class Command(BaseCommand):
+    help = "List classifier versions, or choose the active and shadow version every worker serves (serving.json)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--versions-dir", default=settings.CLASSIFIER_VERSIONS_DIR)
+        subcommands = parser.add_subparsers(dest="action", required=True)
+        subcommands.add_parser("list", help="Versions on disk and the current serving.json")
+        activate = subcommands.add_parser("activate", help="Serve VERSION; workers hot-swap within the poll interval")
+        activate.add_argument("version", help="Run directory name, or 'default' for CLASSIFIER_MODEL_PATH")
+        shadow = subcommands.add_parser("shadow", help="Evaluate VERSION on a sample of live traffic")
+        shadow.add_argument("version", nargs="?", help="Omit with --off to stop shadowing")
+        shadow.add_argument("--rate", type=float, default=0.05, help="Fraction of classified images (0-1)")
+        shadow.add_argument("--off", action="store_true")
+
+    def handle(self, *args, **options):
+        versions_dir = options["versions_dir"]
+        config = read_serving_config(versions_dir)
+        action = options["action"]
+
+        if action == "list":
+            for name in available_versions(versions_dir):
+                marks = [label for label, key in (("active", "active"), ("shadow", "shadow")) if config.get(key) == name]
+                self.stdout.write(f"{name}{'  (' + ', '.join(marks) + ')' if marks else ''}")
+            if not config.get("active"):
+                self.stdout.write("Serving the default model (CLASSIFIER_MODEL_PATH)")
+            return
+
+        if action == "activate":
+            name = options["version"]
+            if name == "default":
+                config.pop("active", None)
+            else:
+                self.check_version(versions_dir, name)
+                config["active"] = name
+            if config.get("shadow") == config.get("active"):
+                config.pop("shadow", None)
+                config.pop("shadow_rate", None)
+        elif options["off"]:
+            config.pop("shadow", None)
+            config.pop("shadow_rate", None)
+        else:
+            if not options["version"]:
+                raise CommandError("Name the version to shadow, or pass --off")
+            if not 0 < options["rate"] <= 1:
+                raise CommandError("--rate must be in (0, 1]")
+            self.check_version(versions_dir, options["version"])
+            config.update(shadow=options["version"], shadow_rate=options["rate"])
+
+        write_serving_config(versions_dir, config)
+        self.stdout.write(self.style.SUCCESS(
+            f"serving.json updated: {config or 'default model'}; workers pick it up within "
+            f"{settings.CLASSIFIER_REGISTRY_POLL_SECONDS:g}s"
+        ))
+
+    def check_version(self, versions_dir, name):
+        try:
+            ModelVersion.from_directory(os.path.join(versions_dir, name))
+        except Exception as e:
+            raise CommandError(f"{name} is not a usable version: {str(e)}")
@@ -0,0 +1,156 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from assistant.calibration import softmax
+from assistant.model_registry import data_cat
+from assistant.preprocessing import preprocess_batch
+from training.data import IMAGE_EXTENSIONS
+
+
+def iter_images(directory, limit=None):
+    """Yield (path, label) for images under ``directory``; label is the data_cat class folder, if any"""
+    count = 0
+    for root, _, files in sorted(os.walk(directory)):
+        folder = os.path.basename(root)
+        label = folder if folder in data_cat else None
+        for filename in sorted(files):
+            if not filename.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+            yield os.path.join(root, filename), label
+            count += 1
+            if limit and count >= limit:
+                return
+
+
+def load_batches(paths, batch_size=32):
+    for start in range(0, len(paths), batch_size):
+        batch, errors = preprocess_batch(paths[start:start + batch_size])
+        keep = [i for i in range(len(batch)) if i not in errors]
+        yield start, keep, batch[keep]
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the Keras skin classifier to TFLite (optionally quantized) and check "
+        "prediction parity against the Keras model"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", default=settings.CLASSIFIER_TFLITE_PATH,
+                            help="Output .tflite file (defaults to CLASSIFIER_TFLITE_PATH)")
+        parser.add_argument("--quantize", choices=["none", "float16", "dynamic", "int8"], default="dynamic",
+                            help="float16 halves the file; dynamic stores int8 weights; "
+                                 "int8 also quantizes activations and needs --calibration-dir")
+        parser.add_argument("--calibration-dir",
+                            help="Training images used as the int8 representative dataset")
+        parser.add_argument("--calibration-samples", type=int, default=200)
+        parser.add_argument("--parity-dir",
+                            help="Held-out images (optionally in data_cat class folders) to compare runtimes on")
+        parser.add_argument("--parity-samples", type=int, default=500)
+        parser.add_argument("--min-agreement", type=float, default=0.98,
+                            help="Fail if top-1 agreement with Keras on --parity-dir is below this")
+
+    def handle(self, *args, **options):
+        import tensorflow as tf
+
+        if options["quantize"] == "int8" and not options["calibration_dir"]:
+            raise CommandError("--quantize int8 needs --calibration-dir for the representative dataset")
+
+        started = time.perf_counter()
+        model = tf.keras.models.load_model(settings.CLASSIFIER_MODEL_PATH)
+        flatbuffer = self.convert(tf, model, options)
+
+        output = options["output"]
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "wb") as handle:
+            handle.write(flatbuffer)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {output} ({options['quantize']}, {len(flatbuffer) / 1e6:.1f} MB; "
+            f"Keras file {os.path.getsize(settings.CLASSIFIER_MODEL_PATH) / 1e6:.1f} MB) "
+            f"in {time.perf_counter() - started:.1f}s"
+        ))
+
+        if options["parity_dir"]:
+            self.check_parity(model, output, options)
+
+    def convert(self, tf, model, options):
+        # Keras 3 models convert most reliably through an exported SavedModel
+        with tempfile.TemporaryDirectory() as saved_model_dir:
+            model.export(saved_model_dir, format="tf_saved_model")
+            converter = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir)
+
+            quantize = options["quantize"]
+            if quantize != "none":
+                converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            if quantize == "float16":
+                converter.target_spec.supported_types = [tf.float16]
+            elif quantize == "int8":
+                paths = [path for path, _ in iter_images(options["calibration_dir"], options["calibration_samples"])]
+                if not paths:
+                    raise CommandError(f"No images found under {options['calibration_dir']}")
+
+                def representative_dataset():
+                    for _, _, batch in load_batches(paths, batch_size=1):
+                        if len(batch):
+                            yield [batch]
+
+                converter.representative_dataset = representative_dataset
+                # Integer kernels inside; float32 input/output so callers need no changes
+                converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+            return converter.convert()
+
+    def check_parity(self, model, output, options):
+        from assistant.inference_backends import TFLiteClassifier
+
+        samples = list(iter_images(options["parity_dir"], options["parity_samples"]))
+        if not samples:
+            raise CommandError(f"No images found under {options['parity_dir']}")
+        paths = [path for path, _ in samples]
+        exported = TFLiteClassifier(output)
+
+        keras_top, lite_top, labels, max_diff = [], [], [], 0.0
+        keras_seconds = lite_seconds = 0.0
+        for start, keep, batch in load_batches(paths):
+            if not len(batch):
+                continue
+            tick = time.perf_counter()
+            keras_probs = softmax(np.asarray(model(batch, training=False)))
+            keras_seconds += time.perf_counter() - tick
+            tick = time.perf_counter()
+            lite_probs = softmax(exported(batch))
+            lite_seconds += time.perf_counter() - tick
+
+            keras_top.extend(np.argmax(keras_probs, axis=1))
+            lite_top.extend(np.argmax(lite_probs, axis=1))
+            labels.extend(samples[start + i][1] for i in keep)
+            max_diff = max(max_diff, float(np.abs(keras_probs - lite_probs).max()))
+
+        if not keras_top:
+            raise CommandError(f"None of the images under {options['parity_dir']} could be decoded")
+        keras_top, lite_top = np.asarray(keras_top), np.asarray(lite_top)
+        agreement = float(np.mean(keras_top == lite_top))
+        self.stdout.write(
+            f"Parity on {len(keras_top)} images: top-1 agreement {agreement:.2%}, "
+            f"max probability difference {max_diff:.4f}, "
+            f"Keras {keras_seconds / len(keras_top) * 1000:.2f} ms/image vs "
+            f"TFLite {lite_seconds / len(keras_top) * 1000:.2f} ms/image"
+        )
+
+        labelled = [i for i, label in enumerate(labels) if label is not None]
+        if labelled:
+            truth = np.asarray([data_cat.index(labels[i]) for i in labelled])
+            self.stdout.write(
+                f"Accuracy on {len(labelled)} labelled images: "
+                f"Keras {np.mean(keras_top[labelled] == truth):.2%}, "
+                f"TFLite {np.mean(lite_top[labelled] == truth):.2%}"
+            )
+
+        if agreement < options["min_agreement"]:
+            raise CommandError(
+                f"Top-1 agreement {agreement:.2%} is below --min-agreement {options['min_agreement']:.2%}"
+            )
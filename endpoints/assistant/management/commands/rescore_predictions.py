@@ -0,0 +1,182 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Max, Q
+
+from assistant.model_registry import get_classifier_registry
+from assistant.models import PredictionRescore, SkinDiseasePrediction
+from assistant.preprocessing import preprocess_batch
+
+
+def batched(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+def load_batch(rows, storage, size, workers):
+    """Decode one batch of (id, image name, disease) rows: (rows, pixels, row index of each pixel row,
+    {row index: error} for images that could not be opened or decoded)"""
+    handles, errors = [], {}
+    for index, row in enumerate(rows):
+        try:
+            handles.append((index, storage.open(row[1], "rb")))
+        except Exception as e:
+            errors[index] = f"{type(e).__name__}: {str(e)}"
+    try:
+        pixels, failed = preprocess_batch([handle for _, handle in handles], size=size, max_workers=workers)
+    finally:
+        for _, handle in handles:
+            handle.close()
+    for position, e in failed.items():
+        errors[handles[position][0]] = f"{type(e).__name__}: {str(e)}"
+    keep = [position for position in range(len(handles)) if position not in failed]
+    return rows, pixels[keep], [handles[position][0] for position in keep], errors
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-classify stored SkinDiseasePrediction images with a model version and record the results "
+        "in PredictionRescore, to measure agreement and drift. Resumes where the last run stopped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--model-version", help="Version to score with (default: the active one; 'default' "
+                                              "for CLASSIFIER_MODEL_PATH)")
+        parser.add_argument("--batch-size", type=int, default=64, help="Images per forward pass")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Rows fetched per database round trip")
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Image decode threads")
+        parser.add_argument("--prefetch", type=int, default=2, help="Batches decoded ahead of inference")
+        parser.add_argument("--since", help="Only predictions created on or after this date (YYYY-MM-DD)")
+        parser.add_argument("--limit", type=int, help="Stop after this many predictions")
+        parser.add_argument("--restart", action="store_true",
+                            help="Discard this version's earlier results instead of resuming")
+
+    def handle(self, *args, **options):
+        registry = get_classifier_registry()
+        try:
+            version = registry.version(options["model_version"]) if options["model_version"] else registry.active()
+        except Exception as e:
+            raise CommandError(f"Cannot load version {options['model_version']}: {str(e)}")
+
+        results = PredictionRescore.objects.filter(model_version=version.name)
+        if options["restart"]:
+            deleted, _ = results.delete()
+            self.stdout.write(f"Discarded {deleted} earlier results for {version.name}")
+        # Results are written in id order, one transaction per batch: the highest id done is the checkpoint
+        checkpoint = results.aggregate(last=Max("prediction_id"))["last"] or 0
+
+        queryset = SkinDiseasePrediction.objects.filter(id__gt=checkpoint).exclude(image="").order_by("id")
+        if options["since"]:
+            try:
+                queryset = queryset.filter(created_at__date__gte=datetime.strptime(options["since"], "%Y-%m-%d").date())
+            except ValueError:
+                raise CommandError("--since must be YYYY-MM-DD")
+        if options["limit"]:
+            queryset = queryset[:options["limit"]]
+        total = queryset.count()
+        self.stdout.write(
+            f"Scoring {total} predictions with {version.name}"
+            + (f", resuming after prediction {checkpoint}" if checkpoint else "")
+        )
+        if not total:
+            self.report(version)
+            return
+
+        rows = queryset.values_list("id", "image", "predicted_disease").iterator(chunk_size=options["chunk_size"])
+        storage = SkinDiseasePrediction._meta.get_field("image").storage
+        batch_size = max(1, options["batch_size"])
+        version.warm_up()
+
+        done = failed = 0
+        waited = inferred = 0.0
+        started = time.perf_counter()
+        # One loader thread keeps --prefetch batches decoding (each on --workers threads) while the model runs;
+        # the database cursor is only ever read from this thread
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="rescore-loader") as loader:
+            pending = deque()
+            batches = batched(rows, batch_size)
+
+            def submit_next():
+                batch = next(batches, None)
+                if batch is not None:
+                    pending.append(loader.submit(load_batch, batch, storage, version.image_size, options["workers"]))
+
+            for _ in range(max(1, options["prefetch"])):
+                submit_next()
+            while pending:
+                wait_started = time.perf_counter()
+                batch, pixels, order, errors = pending.popleft().result()
+                waited += time.perf_counter() - wait_started
+                submit_next()
+
+                infer_started = time.perf_counter()
+                probabilities = version.predict_probabilities(pixels) if len(pixels) else np.empty((0, 0))
+                inferred += time.perf_counter() - infer_started
+
+                scored = {}
+                for index, row in zip(order, probabilities):
+                    disease = version.labels[int(np.argmax(row))]
+                    scored[index] = (disease, float(np.max(row) * 100))
+                with transaction.atomic():
+                    PredictionRescore.objects.bulk_create([
+                        PredictionRescore(
+                            prediction_id=row[0],
+                            model_version=version.name,
+                            predicted_disease=scored.get(index, ("", 0.0))[0],
+                            confidence_score=scored.get(index, ("", 0.0))[1],
+                            agrees=index in scored and scored[index][0] == row[2],
+                            error=errors.get(index, "")[:200],
+                        )
+                        for index, row in enumerate(batch)
+                    ], ignore_conflicts=True)
+
+                done += len(batch)
+                failed += len(errors)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"{done}/{total} ({done / elapsed:.1f} images/s, {failed} unreadable, "
+                    f"last id {batch[-1][0]})", ending="\r"
+                )
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write("")
+        self.stdout.write(
+            f"Scored {done} predictions in {elapsed:.1f}s ({done / elapsed:.1f} images/s); "
+            f"{inferred:.1f}s in inference, {waited:.1f}s waiting for decoded images"
+        )
+        self.report(version)
+
+    def report(self, version):
+        """Agreement and drift over every result recorded for ``version``, including earlier runs"""
+        results = PredictionRescore.objects.filter(model_version=version.name)
+        summary = results.aggregate(
+            total=Count("id"),
+            agreed=Count("id", filter=Q(agrees=True)),
+            unreadable=Count("id", filter=~Q(error="")),
+        )
+        scored = summary["total"] - summary["unreadable"]
+        if not scored:
+            self.stdout.write(f"No scored predictions for {version.name}")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{version.name}: agrees with the stored prediction on {summary['agreed']}/{scored} "
+            f"({summary['agreed'] / scored:.1%}); {summary['unreadable']} images unreadable"
+        ))
+        changes = (
+            results.filter(agrees=False, error="")
+            .values("prediction__predicted_disease", "predicted_disease")
+            .annotate(count=Count("id"))
+            .order_by("-count")[:10]
+        )
+        for change in changes:
+            self.stdout.write(
+                f"  {change['prediction__predicted_disease']} -> {change['predicted_disease']}: {change['count']}"
+            )
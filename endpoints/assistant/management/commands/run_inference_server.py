@@ -0,0 +1,58 @@
+import json
+import os
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from assistant.inference_server import InferenceClient, InferenceServer, InferenceServerError
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the out-of-process classifier pool that Django workers reach through "
+        "INFERENCE_SERVER_SOCKET (one model copy per worker process, no external broker)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--socket", default=settings.INFERENCE_SERVER_SOCKET or "/tmp/dermatology-inference.sock",
+                            help="Unix socket path (defaults to INFERENCE_SERVER_SOCKET)")
+        parser.add_argument("--workers", type=int, default=settings.INFERENCE_SERVER_WORKERS,
+                            help="Worker processes, each holding one model copy (0 = one per core)")
+        parser.add_argument("--threads-per-worker", type=int, default=1)
+        parser.add_argument("--max-pending", type=int, default=settings.INFERENCE_SERVER_MAX_PENDING,
+                            help="Queued batches before new work is rejected as busy")
+        parser.add_argument("--check", action="store_true",
+                            help="Probe a running server's health and exit (non-zero if unreachable)")
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            try:
+                health = InferenceClient(options["socket"]).health()
+            except InferenceServerError as e:
+                raise CommandError(str(e))
+            self.stdout.write(json.dumps(health))
+            return
+
+        server = InferenceServer(
+            options["socket"],
+            settings_module=os.environ.get("DJANGO_SETTINGS_MODULE", "api.settings"),
+            workers=options["workers"] or None,
+            max_pending=options["max_pending"],
+            threads_per_worker=options["threads_per_worker"],
+        )
+        signal.signal(signal.SIGTERM, self.stop)
+        self.stdout.write(self.style.SUCCESS(
+            f"Inference server listening on {options['socket']} with {server.workers} workers"
+        ))
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+
+    @staticmethod
+    def stop(signum, frame):
+        # Unwind serve_forever in the main thread; server_close() then cleans up
+        raise KeyboardInterrupt
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from assistant.tasks import TaskWorker, run_pending
+
+
+class Command(BaseCommand):
+    help = "Run background jobs (deferred diagnosis explanations) from the BackgroundJob table"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=settings.TASK_WORKER_THREADS or 2)
+        parser.add_argument("--poll-interval", type=float, default=settings.TASK_POLL_SECONDS)
+        parser.add_argument("--once", action="store_true",
+                            help="Run the jobs that are due now, then exit")
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            count = run_pending()
+            self.stdout.write(self.style.SUCCESS(f"Ran {count} job(s)"))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Task worker running with {options['threads']} thread(s); Ctrl+C to stop"
+        ))
+        TaskWorker(options["threads"], options["poll_interval"]).run_forever()
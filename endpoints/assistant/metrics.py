@@ -0,0 +1,327 @@
+"""
+In-process Prometheus metrics for the assistant.
+
+Counters and histograms live in plain Python objects, so recording a sample
+is a bisect plus a locked increment (about a microsecond) with no I/O on the
+hot path. ``/metrics`` renders them in the Prometheus text exposition format
+(0.0.4), together with gauges collected on demand from the existing stats
+objects (batching queue, caches, background jobs). Each process exposes its
+own series; scrape every worker, or run a single worker per container.
+
+    with timed("retrieval"):
+        ...
+    ROUTING_DECISIONS.inc(mode="medical_search")
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http import HttpResponse
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans a cache hit (sub-millisecond) to a slow LLM completion
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r'\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._children[key] = self._children.get(key, 0) + amount
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            children = sorted(self._children.items())
+        for key, value in children:
+            lines.append(f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                # [per-bucket counts..., +Inf count], sum
+                child = self._children[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            child[0][index] += 1
+            child[1] += value
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            children = sorted((key, (list(counts), total)) for key, (counts, total) in self._children.items())
+        for key, (counts, total) in children:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        """``collector()`` yields (name, type, help, [(labels dict, value), ...]) when /metrics is scraped"""
+        self._collectors.append(collector)
+        return collector
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                print(f"Metrics collector {collector.__name__} failed: {str(e)}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                sample_name = f"{name}_total" if kind == "counter" else name
+                for labels, value in samples:
+                    if value is None:
+                        continue
+                    lines.append(
+                        f"{sample_name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}"
+                    )
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "assistant_stage_seconds",
+    "Time spent in each processing stage (image_decode, preprocess, inference, retrieval, llm, "
+    "db_write, serialization, ...)",
+    ["stage"],
+)
+REQUEST_STAGE_SECONDS = registry.histogram(
+    "assistant_request_stage_seconds",
+    "Duration of each RequestStages stage of an assistant request (see assistant.fanout)",
+    ["stage"],
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "assistant_http_request_seconds",
+    "End-to-end request latency by route",
+    ["route", "method", "status"],
+)
+ROUTING_DECISIONS = registry.counter(
+    "assistant_routing_decisions",
+    "Text messages by processing mode chosen by the router",
+    ["mode"],
+)
+LLM_CALLS = registry.counter(
+    "assistant_llm_calls",
+    "LLM calls by outcome",
+    ["outcome"],
+)
+LLM_TOKENS = registry.counter(
+    "assistant_llm_tokens",
+    "Tokens reported by the LLM provider",
+    ["kind"],
+)
+LLM_PROMPT_TOKENS = registry.histogram(
+    "assistant_llm_prompt_tokens",
+    "Size of each chat prompt sent to the LLM, in tokens (after history compaction)",
+    buckets=(128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768),
+)
+INFERENCE_IMAGES = registry.counter(
+    "assistant_inference_images",
+    "Images run through the classifier",
+)
+SHADOW_PREDICTIONS = registry.counter(
+    "assistant_shadow_predictions",
+    "Shadow classifier predictions by whether they agree with the active version",
+    ["version", "active", "outcome"],
+)
+
+
+def timed(stage):
+    """Context manager recording the block's duration under assistant_stage_seconds{stage=...}"""
+    return _Timer(STAGE_SECONDS, {"stage": stage})
+
+
+# Database statements, for every connection in the process (request, pool and worker threads)
+
+_WRITE_VERBS = {"INSERT": "insert", "UPDATE": "update", "DELETE": "delete"}
+
+
+def _execute_wrapper(execute, sql, params, many, context):
+    verb = sql.lstrip()[:6].upper()
+    operation = _WRITE_VERBS.get(verb, "select" if verb == "SELECT" else "other")
+    stage = "db_write" if operation in ("insert", "update", "delete") else "db_read"
+    with _Timer(STAGE_SECONDS, {"stage": stage}):
+        return execute(sql, params, many, context)
+
+
+def install_db_instrumentation(sender=None, connection=None, **kwargs):
+    """connection_created receiver: time every statement on the new connection"""
+    if connection is not None and _execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute_wrapper)
+
+
+class MetricsMiddleware:
+    """Records assistant_http_request_seconds, labelled by URL name to keep cardinality bounded"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Under ASGI the chain stays async, so async views are not pushed onto a thread
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self._observe(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self._observe(request, response, started)
+        return response
+
+    def _observe(self, request, response, started):
+        match = getattr(request, "resolver_match", None)
+        route = (match.url_name or match.route) if match else "unmatched"
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - started,
+            route=route, method=request.method, status=str(response.status_code),
+        )
+
+
+@registry.register_collector
+def _runtime_gauges():
+    """Point-in-time values read from the existing stats objects at scrape time"""
+    from django.db.models import Count
+
+    from . import model_registry
+    from .models import BackgroundJob
+    from .prediction_cache import prediction_cache
+    from .response_cache import response_cache
+    from .streaming import ttft_stats
+
+    if model_registry.is_loaded("inference_scheduler"):
+        stats = model_registry.get_inference_scheduler().stats()
+        yield ("assistant_inference_queue_depth", "gauge", "Images waiting for the micro-batcher",
+               [({}, stats["queue_depth"])])
+        yield ("assistant_inference_batches", "counter", "Batches run by the micro-batcher",
+               [({}, stats["batches"])])
+        yield ("assistant_inference_batch_errors", "counter", "Micro-batches that raised",
+               [({}, stats["errors"])])
+
+    caches = {"response": response_cache.stats(), "prediction": prediction_cache.stats()}
+    if model_registry.is_loaded("medical_retriever"):
+        caches["retrieval"] = model_registry.get_medical_retriever().cache.stats()
+    yield ("assistant_cache_hits", "counter", "Cache hits by cache",
+           [({"cache": name}, stats["hits"]) for name, stats in caches.items()])
+    yield ("assistant_cache_misses", "counter", "Cache misses by cache",
+           [({"cache": name}, stats["misses"]) for name, stats in caches.items()])
+    yield ("assistant_cache_entries", "gauge", "Entries currently held by each cache",
+           [({"cache": name}, stats["size"]) for name, stats in caches.items()])
+
+    ttft = ttft_stats.summary()
+    if "p50_ms" in ttft:
+        yield ("assistant_llm_time_to_first_token_seconds", "gauge",
+               "Time to first streamed token over the recent window",
+               [({"quantile": quantile}, ttft[key] / 1000)
+                for quantile, key in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms"))])
+
+    jobs = BackgroundJob.objects.values_list("status").annotate(count=Count("id"))
+    yield ("assistant_background_jobs", "gauge", "Background jobs by status",
+           [({"status": status}, count) for status, count in jobs])
+
+
+def metrics_view(request):
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:22
+
+import assistant.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skindiseaseprediction',
+            name='image_sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='skindiseaseprediction',
+            name='model_version',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='skindiseaseprediction',
+            name='image',
+            field=models.ImageField(storage=assistant.storage.ContentAddressedStorage(), upload_to=assistant.storage.skin_image_upload_to),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.7 on 2026-10-18 18:02
+
+from django.db import migrations, models
+
+TRIGRAM_FIELDS = ('name', 'specialization', 'location')
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # icontains compiles to UPPER(col) LIKE UPPER('%term%') on PostgreSQL; a pg_trgm GIN index on
+    # the same expression turns those scans into index lookups. Other databases keep plain scans.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for field in TRIGRAM_FIELDS:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS assistant_dermatologist_{field}_trgm '
+            f'ON assistant_dermatologist USING gin (UPPER({field}::text) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for field in TRIGRAM_FIELDS:
+        schema_editor.execute(f'DROP INDEX IF EXISTS assistant_dermatologist_{field}_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0003_background_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dermatologist',
+            name='location',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-18 15:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0004_dermatologist_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PredictionRescore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_version', models.CharField(max_length=64)),
+                ('predicted_disease', models.CharField(blank=True, default='', max_length=100)),
+                ('confidence_score', models.FloatField(default=0.0)),
+                ('agrees', models.BooleanField(default=False)),
+                ('error', models.CharField(blank=True, default='', max_length=200)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('prediction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rescores', to='assistant.skindiseaseprediction')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('model_version', 'prediction'), name='unique_rescore_per_version')],
+            },
+        ),
+    ]
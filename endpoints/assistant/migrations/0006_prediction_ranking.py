@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 16:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0005_prediction_rescores'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='skindiseaseprediction',
+            name='ranking',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
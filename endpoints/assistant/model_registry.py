@@ -0,0 +1,352 @@
+"""
+Lazy, thread-safe singletons for the heavy runtime dependencies of the assistant.
+
+Nothing here imports TensorFlow, LangChain's OpenAI client or the Azure Search
+SDK at module import time. Each object is built on first use and then shared
+by every request thread in the process, so management commands, migrations
+and the admin never pay the model loading cost.
+"""
+import os
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+
+from .metrics import INFERENCE_IMAGES, timed
+
+
+# Disease categories (output order of the unversioned classifier; versions carry their own labels.json)
+data_cat = [
+    'acne', 'actinickeratosis', 'alopeciaareata', 'chickenpox', 'cold sores',
+    'eczema', 'folliculitis', 'hives', 'impetigo', 'melanoma', 'psoriasis',
+    'ringworm', 'rosacea', 'shingles', 'uticaria', 'vitiligo', 'warts'
+]
+
+_lock = threading.RLock()
+_instances = {}
+
+
+def _get_or_create(name, factory):
+    """Double-checked lazy initialisation shared by all getters"""
+    instance = _instances.get(name)
+    if instance is None:
+        with _lock:
+            instance = _instances.get(name)
+            if instance is None:
+                instance = factory()
+                _instances[name] = instance
+    return instance
+
+
+def is_loaded(name):
+    return name in _instances
+
+
+def classifier_path():
+    """Model file used by the configured CLASSIFIER_BACKEND"""
+    if settings.CLASSIFIER_BACKEND == "tflite":
+        return settings.CLASSIFIER_TFLITE_PATH
+    return settings.CLASSIFIER_MODEL_PATH
+
+
+def _load_classifier():
+    print("Resolved model path:", classifier_path())
+    if settings.CLASSIFIER_BACKEND == "tflite":
+        from .inference_backends import TFLiteClassifier
+
+        return TFLiteClassifier(classifier_path(), num_threads=settings.CLASSIFIER_NUM_THREADS)
+    if settings.CLASSIFIER_BACKEND != "keras":
+        raise ValueError(f"Unknown CLASSIFIER_BACKEND: {settings.CLASSIFIER_BACKEND}")
+
+    import tensorflow as tf
+
+    return tf.keras.models.load_model(settings.CLASSIFIER_MODEL_PATH)
+
+
+def _resolve_model_version():
+    if settings.CLASSIFIER_MODEL_VERSION:
+        return settings.CLASSIFIER_MODEL_VERSION
+    path = classifier_path()
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return "unknown"
+    name = os.path.basename(path).replace(".", "-")
+    return f"{name}-{stat.st_size}-{int(stat.st_mtime)}"[:64]
+
+
+def _default_version():
+    """The single CLASSIFIER_MODEL_PATH model, served when serving.json names no version"""
+    from .classifier_versions import ModelVersion
+    from .preprocessing import IMAGE_SIZE
+
+    return ModelVersion(_resolve_model_version(), data_cat, IMAGE_SIZE, get_classifier, path=classifier_path(),
+                        calibration_path=settings.CLASSIFIER_CALIBRATION_PATH)
+
+
+def _build_classifier_registry():
+    from .classifier_versions import ClassifierRegistry
+
+    return ClassifierRegistry(
+        settings.CLASSIFIER_VERSIONS_DIR,
+        default_version=_default_version,
+        poll_seconds=settings.CLASSIFIER_REGISTRY_POLL_SECONDS,
+        shadow_max_pending=settings.CLASSIFIER_SHADOW_MAX_PENDING,
+        num_threads=settings.CLASSIFIER_NUM_THREADS,
+    )
+
+
+def _build_llm():
+    from langchain_openai import AzureChatOpenAI
+
+    from .llm_callbacks import LLMMetricsCallback
+
+    return AzureChatOpenAI(
+        openai_api_key=settings.AZURE_OPENAI_API_KEY,
+        azure_endpoint=settings.AZURE_OPENAI_API_ENDPOINT,
+        api_version="2024-05-01-preview",
+        model_name="gpt-35-turbo",
+        temperature=0.7,
+        callbacks=[LLMMetricsCallback()],
+    )
+
+
+def _build_embeddings():
+    from langchain_openai import AzureOpenAIEmbeddings
+
+    return AzureOpenAIEmbeddings(
+        openai_api_key=settings.AZURE_OPENAI_API_KEY,
+        azure_endpoint=settings.AZURE_OPENAI_API_ENDPOINT,
+        api_version="2024-05-01-preview",
+        azure_deployment=settings.AZURE_OPENAI_EMBEDDING_DEPLOYMENT,
+    )
+
+
+def _build_search_client():
+    from azure.core.credentials import AzureKeyCredential
+    from azure.search.documents import SearchClient
+
+    return SearchClient(
+        endpoint=settings.AZURE_AI_SEARCH_ENDPOINT,
+        index_name="medical-knowledge",
+        credential=AzureKeyCredential(settings.AZURE_AI_SEARCH_API or ""),
+    )
+
+
+def _build_async_search_client():
+    from azure.core.credentials import AzureKeyCredential
+    from azure.search.documents.aio import SearchClient
+
+    return SearchClient(
+        endpoint=settings.AZURE_AI_SEARCH_ENDPOINT,
+        index_name="medical-knowledge",
+        credential=AzureKeyCredential(settings.AZURE_AI_SEARCH_API or ""),
+    )
+
+
+def _build_retrieval_backend():
+    from . import retrieval_backends
+
+    backend = settings.RETRIEVAL_BACKEND
+    if backend == "bm25":
+        return retrieval_backends.BM25Index(settings.RETRIEVAL_INDEX_DIR)
+    if backend == "dense":
+        return retrieval_backends.DenseVectorIndex(
+            settings.RETRIEVAL_INDEX_DIR,
+            embed_query=lambda text: get_embeddings().embed_query(text),
+        )
+    if backend == "azure":
+        return retrieval_backends.AzureSearchBackend(get_search_client, get_async_search_client)
+    raise ValueError(f"Unknown RETRIEVAL_BACKEND: {backend}")
+
+
+def _build_medical_retriever():
+    from .retrieval import CoalescingCache, MedicalKnowledgeRetriever
+
+    return MedicalKnowledgeRetriever(
+        _build_retrieval_backend(),
+        cache=CoalescingCache(
+            maxsize=settings.RETRIEVAL_CACHE_SIZE,
+            ttl=settings.RETRIEVAL_CACHE_TTL,
+            negative_ttl=settings.RETRIEVAL_NEGATIVE_TTL,
+        ),
+    )
+
+
+def predict_probabilities(batch, version=None):
+    """One forward pass over an (N, H, W, 3) batch with ``version`` (default: the active one);
+    returns (N, len(version.labels)) softmax probabilities"""
+    INFERENCE_IMAGES.inc(len(batch))
+    with timed("inference"):
+        if settings.INFERENCE_SERVER_SOCKET:
+            return get_inference_client().predict_probabilities(batch)
+        return get_classifier_registry().predict(batch, version)
+
+
+def top_k_classes(probabilities, k=3, labels=None):
+    """Top-k (disease, confidence %) pairs for one row of probabilities, most likely first"""
+    labels = labels if labels is not None else active_version().labels
+    order = np.argsort(probabilities)[::-1][:k]
+    return [
+        {"condition": labels[int(i)], "confidence": float(probabilities[i] * 100)}
+        for i in order
+    ]
+
+
+def predict_views(batch, version=None):
+    """Probabilities for (N, H, W, 3) images, or for (N, V, H, W, 3) test-time augmented views of
+    each image (see preprocessing.augment_views): all N * V views run as one forward pass and
+    each image gets the mean of its views' probabilities"""
+    if batch.ndim == 5:
+        count, views = batch.shape[:2]
+        probabilities = predict_probabilities(batch.reshape(count * views, *batch.shape[2:]), version)
+        return probabilities.reshape(count, views, -1).mean(axis=1)
+    return predict_probabilities(batch, version)
+
+
+def predict_scheduled(batch):
+    """Micro-batcher function: (version, probabilities) per row, so callers read the right labels"""
+    version = active_version()
+    return [(version, row) for row in predict_views(batch, version)]
+
+
+def classify_batch(batch, version=None):
+    """Run one forward pass over a batch and map each row to (disease, confidence)"""
+    version = version or active_version()
+    return [
+        (version.labels[int(np.argmax(row))], float(np.max(row) * 100))
+        for row in predict_probabilities(batch, version)
+    ]
+
+
+def _build_inference_scheduler():
+    from .batching import BatchingScheduler
+
+    return BatchingScheduler(
+        predict_scheduled,
+        max_batch_size=settings.INFERENCE_MAX_BATCH_SIZE,
+        max_wait_ms=settings.INFERENCE_MAX_WAIT_MS,
+    )
+
+
+def model_version():
+    """Version tag (name and calibration) of the classifier in use (does not load the model)"""
+    return active_version().tag
+
+
+def prediction_tag(version, tta=False):
+    """model_version stored with (and caching) a prediction: the version tag, marked when TTA was used"""
+    return version.tag[:60] + "+tta" if tta else version.tag
+
+
+def active_version():
+    """The ModelVersion requests should use now; hold on to it for the whole request"""
+    return get_classifier_registry().active()
+
+
+def _build_inference_client():
+    from .inference_server import InferenceClient
+
+    return InferenceClient(settings.INFERENCE_SERVER_SOCKET, timeout=settings.INFERENCE_TIMEOUT_SECONDS)
+
+
+def _build_intent_engine():
+    from .intents import IntentEngine
+
+    return IntentEngine.from_file(settings.INTENT_RULES_PATH)
+
+
+def _build_dermatologist_search():
+    from .dermatologist_search import DermatologistSearch
+
+    return DermatologistSearch(
+        backend=settings.DERMATOLOGIST_SEARCH_BACKEND,
+        directory_max_rows=settings.DERMATOLOGIST_DIRECTORY_MAX_ROWS,
+        directory_ttl=settings.DERMATOLOGIST_DIRECTORY_TTL,
+        page_size=settings.DERMATOLOGIST_PAGE_SIZE,
+    )
+
+
+def get_classifier():
+    """The unversioned CLASSIFIER_MODEL_PATH model; requests go through active_version()"""
+    return _get_or_create("classifier", _load_classifier)
+
+
+def get_classifier_registry():
+    return _get_or_create("classifier_registry", _build_classifier_registry)
+
+
+def get_llm():
+    return _get_or_create("llm", _build_llm)
+
+
+def get_embeddings():
+    return _get_or_create("embeddings", _build_embeddings)
+
+
+def get_search_client():
+    return _get_or_create("search_client", _build_search_client)
+
+
+def get_async_search_client():
+    """aio SearchClient for the ASGI view; it must be used from the server's event loop"""
+    return _get_or_create("async_search_client", _build_async_search_client)
+
+
+def get_medical_retriever():
+    return _get_or_create("medical_retriever", _build_medical_retriever)
+
+
+def get_inference_scheduler():
+    return _get_or_create("inference_scheduler", _build_inference_scheduler)
+
+
+def get_inference_client():
+    return _get_or_create("inference_client", _build_inference_client)
+
+
+def get_intent_engine():
+    return _get_or_create("intent_engine", _build_intent_engine)
+
+
+def get_dermatologist_search():
+    return _get_or_create("dermatologist_search", _build_dermatologist_search)
+
+
+def warm_up():
+    """Eagerly build every singleton and run one dummy inference so the first request is not cold"""
+    timings = {}
+    # With an inference server the classifier lives there; just check it is reachable
+    classifier = (
+        ("inference_server", lambda: get_inference_client().health())
+        if settings.INFERENCE_SERVER_SOCKET else ("classifier", lambda: active_version().model)
+    )
+    for name, getter in (
+        classifier,
+        ("llm", get_llm),
+        ("search_client", get_search_client),
+        ("intent_engine", get_intent_engine),
+    ):
+        started = time.perf_counter()
+        try:
+            getter()
+        except Exception as e:
+            print(f"Warm-up of {name} failed: {str(e)}")
+            continue
+        timings[name] = time.perf_counter() - started
+
+    if "classifier" in timings or "inference_server" in timings:
+        width, height = active_version().image_size
+        started = time.perf_counter()
+        classify_batch(np.zeros((1, height, width, 3), dtype=np.float32))
+        timings["first_inference"] = time.perf_counter() - started
+
+    print("Model registry warm-up:", {k: f"{v:.2f}s" for k, v in timings.items()})
+    return timings
+
+
+def warm_up_if_enabled():
+    """Startup hook for WSGI/ASGI entry points, controlled by MODEL_WARMUP_ON_STARTUP"""
+    if settings.MODEL_WARMUP_ON_STARTUP:
+        warm_up()
@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser,Group,Permission
 import uuid
 
+from .storage import ContentAddressedStorage, skin_image_upload_to
+
 # 1. Users Table
 class User(AbstractUser):
     groups = models.ManyToManyField(
@@ -34,6 +36,11 @@ class Dermatologist(models.Model):
     email = models.EmailField(null=True)  # Fixed typo: EmallField → EmailField
     specialization = models.CharField(max_length=100, default='General Dermatology')
     phone_number = models.CharField(max_length=15, blank=True, null=True)
+    # City or area, for location-aware search ranking (assistant.dermatologist_search)
+    location = models.CharField(max_length=100, blank=True, default='')
+
+    # On PostgreSQL, migration 0004 adds pg_trgm GIN indexes on UPPER(name/specialization/location),
+    # which serve the icontains filters used by the search
 
     def __str__(self):
         return self.name
@@ -97,16 +104,41 @@ class ConversationSession(models.Model):
 class SkinDiseasePrediction(models.Model):
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     session = models.ForeignKey(ConversationSession, on_delete=models.CASCADE)
-    image = models.ImageField(upload_to='skin_images/')
+    # Stored as skin_images/<aa>/<sha256>.<ext>, so repeat uploads share one file
+    image = models.ImageField(upload_to=skin_image_upload_to, storage=ContentAddressedStorage())
+    image_sha256 = models.CharField(max_length=64, blank=True, default='', db_index=True)
+    model_version = models.CharField(max_length=64, blank=True, default='')
     symptoms = models.TextField()
     predicted_disease = models.CharField(max_length=100)
     confidence_score = models.FloatField()
+    # Every class as {"condition", "confidence"}, most likely first, so repeat uploads can be
+    # answered with any top_k from this row (assistant.prediction_cache); null on older rows
+    ranking = models.JSONField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     chatbot_response = models.TextField(null=True, blank=True)
 
     def __str__(self):
         return f"{self.predicted_disease} ({self.confidence_score:.2f}%)"
 
+class PredictionRescore(models.Model):
+    """A stored upload re-classified offline by another model version (manage.py rescore_predictions)"""
+    prediction = models.ForeignKey(SkinDiseasePrediction, on_delete=models.CASCADE, related_name='rescores')
+    model_version = models.CharField(max_length=64)
+    predicted_disease = models.CharField(max_length=100, blank=True, default='')
+    confidence_score = models.FloatField(default=0.0)
+    agrees = models.BooleanField(default=False)
+    # Set when the stored image could not be read; the row still marks the prediction as done
+    error = models.CharField(max_length=200, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['model_version', 'prediction'], name='unique_rescore_per_version'),
+        ]
+
+    def __str__(self):
+        return f"{self.model_version}: {self.predicted_disease} ({self.confidence_score:.2f}%)"
+
 class ChatHistory(models.Model):
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     session = models.ForeignKey(ConversationSession, on_delete=models.CASCADE)
@@ -116,4 +148,32 @@ class ChatHistory(models.Model):
     metadata = models.JSONField(default=dict,null=True, blank=True)
 
     def __str__(self):
-        return f"Chat {self.id} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
\ No newline at end of file
+        return f"Chat {self.id} - {self.created_at.strftime('%Y-%m-%d %H:%M')}"
+
+class BackgroundJob(models.Model):
+    """Durable unit of deferred work, run by assistant.tasks workers"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    job_id = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    kind = models.CharField(max_length=50)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    session = models.ForeignKey(ConversationSession, on_delete=models.CASCADE, null=True, blank=True)
+    payload = models.JSONField(default=dict)
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField()
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'run_after'])]
+
+    def __str__(self):
+        return f"{self.kind} {self.job_id} ({self.status})"
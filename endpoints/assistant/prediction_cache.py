@@ -0,0 +1,66 @@
+"""
+Prediction cache for repeat uploads of the same photo.
+
+Predictions are keyed on the image's SHA-256 plus the classifier version tag
+(including calibration and test-time augmentation, which change confidences), so
+a retry or an "upload_new_image" with an identical file skips the forward
+pass. Lookups check the per-worker LRU first and then earlier
+SkinDiseasePrediction rows (shared by every worker); a model upgrade changes
+the version and therefore invalidates both. Both keep the full class ranking
+of the forward pass, so any top_k can be answered; rows saved before rankings
+were stored only answer requests for a single class.
+"""
+from django.conf import settings
+
+from .caching import LRUTTLCache
+
+
+class PredictionCache:
+
+    def __init__(self, maxsize=4096, ttl=None):
+        self.cache = LRUTTLCache(maxsize=maxsize, ttl=ttl)
+        self.db_hits = 0
+
+    def get(self, digest, version, top_k=1):
+        """Return (predicted_disease, confidence_score, ranking) with at least ``top_k`` ranked classes, or None"""
+        key = (digest, version)
+        cached = self.cache.get(key)
+        if cached is not None and len(cached[2]) >= top_k:
+            return cached
+
+        from .models import SkinDiseasePrediction
+
+        row = (
+            SkinDiseasePrediction.objects
+            .filter(image_sha256=digest, model_version=version)
+            .order_by("-created_at")
+            .values_list("predicted_disease", "confidence_score", "ranking")
+            .first()
+        )
+        if row is None:
+            return None
+        predicted_disease, confidence_score, ranking = row
+        if not ranking:
+            if top_k > 1:
+                return None
+            self.db_hits += 1
+            return (predicted_disease, confidence_score, [{"condition": predicted_disease, "confidence": confidence_score}])
+        self.db_hits += 1
+        value = (predicted_disease, confidence_score, ranking)
+        self.cache.set(key, value)
+        return value
+
+    def set(self, digest, version, predicted_disease, confidence_score, ranking):
+        """``ranking``: top_k_classes over every class, most likely first"""
+        self.cache.set((digest, version), (predicted_disease, confidence_score, ranking))
+
+    def stats(self):
+        stats = self.cache.stats()
+        stats["db_hits"] = self.db_hits
+        return stats
+
+
+prediction_cache = PredictionCache(
+    maxsize=settings.PREDICTION_CACHE_SIZE,
+    ttl=settings.PREDICTION_CACHE_TTL,
+)
@@ -0,0 +1,110 @@
+"""
+Image preprocessing for the skin disease classifier.
+
+Phone photos are often 12MP JPEGs, but the model only needs 180x180 RGB.
+``Image.draft`` lets libjpeg decode at 1/2, 1/4 or 1/8 scale (DCT scaling),
+so the full-resolution bitmap is never materialised. The resized pixels are
+written straight into a caller-provided float32 buffer, which lets batched
+callers fill one preallocated (N, 180, 180, 3) array with no intermediate
+per-image tensors. The model's own Rescaling layer handles normalisation, so
+values stay in 0..255.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+from .metrics import timed
+
+IMG_WIDTH, IMG_HEIGHT = 180, 180
+IMAGE_SIZE = (IMG_WIDTH, IMG_HEIGHT)
+
+
+def allocate_batch(count, size=IMAGE_SIZE, dtype=np.float32):
+    return np.empty((count, size[1], size[0], 3), dtype=dtype)
+
+
+def load_image(source, out=None, size=IMAGE_SIZE):
+    """
+    Decode ``source`` (path, file object or Django UploadedFile) into an (H, W, 3) array.
+
+    If ``out`` is given the pixels are written into it and it is returned.
+    """
+    if hasattr(source, "seek"):
+        source.seek(0)
+    with Image.open(source) as image:
+        with timed("image_decode"):
+            # JPEG only: ask libjpeg for the smallest DCT scale still >= the target size
+            image.draft("RGB", size)
+            image.load()
+        with timed("preprocess"):
+            if image.mode != "RGB":
+                image = image.convert("RGB")
+            # reducing_gap does a cheap box reduction first when the draft is still large
+            image = image.resize(size, reducing_gap=3.0)
+            if out is None:
+                out = np.empty((size[1], size[0], 3), dtype=np.float32)
+            np.copyto(out, np.asarray(image), casting="unsafe")
+    return out
+
+
+def preprocess_batch(sources, out=None, size=IMAGE_SIZE, max_workers=None):
+    """
+    Decode many uploads in parallel into one (N, H, W, 3) buffer.
+
+    Pillow releases the GIL while decoding and resizing, so a thread pool
+    scales across cores. Returns ``(batch, errors)`` where ``errors`` maps the
+    index of each image that failed to decode to its exception; those rows are
+    left zeroed.
+    """
+    sources = list(sources)
+    if out is None:
+        out = allocate_batch(len(sources), size)
+    errors = {}
+
+    def work(index):
+        try:
+            load_image(sources[index], out=out[index], size=size)
+        except Exception as e:
+            out[index] = 0
+            errors[index] = e
+
+    if len(sources) <= 1:
+        for index in range(len(sources)):
+            work(index)
+    else:
+        workers = max_workers or min(len(sources), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(work, range(len(sources))))
+    return out, errors
+
+
+# Test-time augmentation views (besides the original image)
+TTA_VIEWS = ("flip_lr", "flip_ud", "crop")
+TTA_CROP = 0.875
+
+
+def augment_views(images, views=TTA_VIEWS):
+    """
+    (N, H, W, 3) images -> (N, 1 + len(views), H, W, 3): each image followed by its
+    augmented views, ready to run as one (N * V)-image forward pass and be averaged.
+    ``crop`` takes the central 87.5% and scales it back up.
+    """
+    images = np.asarray(images, dtype=np.float32)
+    count, height, width = images.shape[:3]
+    out = np.empty((count, 1 + len(views), height, width, 3), dtype=np.float32)
+    out[:, 0] = images
+    for position, view in enumerate(views, start=1):
+        if view == "flip_lr":
+            out[:, position] = images[:, :, ::-1]
+        elif view == "flip_ud":
+            out[:, position] = images[:, ::-1]
+        elif view == "crop":
+            top, left = round(height * (1 - TTA_CROP) / 2), round(width * (1 - TTA_CROP) / 2)
+            for index, image in enumerate(images):
+                crop = Image.fromarray(np.clip(image[top:height - top, left:width - left], 0, 255).astype(np.uint8))
+                out[index, position] = np.asarray(crop.resize((width, height)), dtype=np.float32)
+        else:
+            raise ValueError(f"Unknown test-time augmentation view: {view}")
+    return out
@@ -0,0 +1,137 @@
+"""
+Response cache for repeated, stateless dermatology questions.
+
+Answers are keyed on the normalised question text plus the predicted disease
+(if any). When RESPONSE_CACHE_SEMANTIC is enabled, a miss on the exact key
+falls back to a cosine-similarity lookup over embeddings of the cached
+questions, so "how do I treat acne?" can reuse the answer to "how to treat
+acne". Only first-turn questions should be cached: later turns depend on the
+session history.
+"""
+import re
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+
+from .caching import LRUTTLCache
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(text):
+    text = _PUNCTUATION.sub(" ", (text or "").lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class ResponseCache:
+
+    def __init__(self, maxsize=2048, ttl=None, embed_fn=None, similarity_threshold=0.92):
+        self.entries = LRUTTLCache(maxsize=maxsize, ttl=ttl)
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self._embeddings = LRUTTLCache(maxsize=maxsize)
+        self._vectors = OrderedDict()  # key -> (disease, unit vector)
+        self._lock = threading.Lock()
+
+        self.semantic_hits = 0
+        self.saved_llm_calls = 0
+        self.saved_seconds = 0.0
+
+    @staticmethod
+    def make_key(question, disease=None):
+        return f"{disease or ''}|{normalize_question(question)}"
+
+    def _embed(self, normalized):
+        vector = self._embeddings.get(normalized)
+        if vector is None:
+            vector = np.asarray(self.embed_fn(normalized), dtype=np.float32)
+            vector /= (np.linalg.norm(vector) or 1.0)
+            self._embeddings.set(normalized, vector)
+        return vector
+
+    def _nearest_key(self, question, disease):
+        vector = self._embed(normalize_question(question))
+        with self._lock:
+            candidates = [(key, stored) for key, (stored_disease, stored) in self._vectors.items()
+                          if stored_disease == (disease or '')]
+        if not candidates:
+            return None
+        similarities = np.stack([stored for _, stored in candidates]) @ vector
+        best = int(np.argmax(similarities))
+        if similarities[best] >= self.similarity_threshold:
+            return candidates[best][0]
+        return None
+
+    def _hit(self, entry):
+        with self._lock:
+            self.saved_llm_calls += entry["llm_calls"]
+            self.saved_seconds += entry["elapsed"]
+        return dict(entry["result"])
+
+    def get(self, question, disease=None):
+        """Return a copy of the cached result dict, or None"""
+        entry = self.entries.get(self.make_key(question, disease))
+        if entry is not None:
+            return self._hit(entry)
+        if self.embed_fn is None:
+            return None
+
+        try:
+            key = self._nearest_key(question, disease)
+        except Exception as e:
+            print(f"Response cache embedding error: {str(e)}")
+            return None
+        if key is None:
+            return None
+        entry = self.entries.get(key)
+        if entry is None:
+            # Expired or evicted since it was indexed
+            with self._lock:
+                self._vectors.pop(key, None)
+            return None
+        with self._lock:
+            self.semantic_hits += 1
+        return self._hit(entry)
+
+    def set(self, question, disease, result, elapsed=0.0, llm_calls=1):
+        key = self.make_key(question, disease)
+        self.entries.set(key, {"result": dict(result), "elapsed": elapsed, "llm_calls": llm_calls})
+        if self.embed_fn is None:
+            return
+        try:
+            vector = self._embed(normalize_question(question))
+        except Exception as e:
+            print(f"Response cache embedding error: {str(e)}")
+            return
+        with self._lock:
+            self._vectors[key] = (disease or '', vector)
+            self._vectors.move_to_end(key)
+            while len(self._vectors) > self.entries.maxsize:
+                self._vectors.popitem(last=False)
+
+    def stats(self):
+        stats = self.entries.stats()
+        with self._lock:
+            stats.update({
+                "semantic": self.embed_fn is not None,
+                "semantic_hits": self.semantic_hits,
+                "saved_llm_calls": self.saved_llm_calls,
+                "saved_seconds": self.saved_seconds,
+            })
+        return stats
+
+
+def _embed_question(text):
+    from .model_registry import get_embeddings
+    return get_embeddings().embed_query(text)
+
+
+response_cache = ResponseCache(
+    maxsize=settings.RESPONSE_CACHE_SIZE,
+    ttl=settings.RESPONSE_CACHE_TTL,
+    embed_fn=_embed_question if settings.RESPONSE_CACHE_SEMANTIC else None,
+    similarity_threshold=settings.RESPONSE_CACHE_SIMILARITY,
+)
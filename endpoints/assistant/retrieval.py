@@ -0,0 +1,125 @@
+"""
+Cached, coalesced access to the medical-knowledge retrieval backend.
+
+Concurrent identical queries share one in-flight round trip (sync callers
+and async callers alike), results are kept in a bounded LRU+TTL cache, and
+failures are negatively cached for a short time so an outage does not turn
+into a retry storm against the backend.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+
+from .caching import LRUTTLCache
+from .metrics import timed
+
+
+class CoalescingCache:
+    """LRU+TTL cache where concurrent misses for the same key share one load"""
+
+    _FAILED = object()
+
+    def __init__(self, maxsize=1024, ttl=3600, negative_ttl=30):
+        self.cache = LRUTTLCache(maxsize=maxsize, ttl=ttl)
+        self.negative_ttl = negative_ttl
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.coalesced = 0
+        self.failures = 0
+
+    def _lookup(self, key):
+        """Return (hit, value); a negatively cached failure is a hit with value None"""
+        value = self.cache.get(key)
+        if value is None:
+            return False, None
+        return True, (None if value is self._FAILED else value)
+
+    def _claim(self, key):
+        """Return (future, owner); the owner is responsible for loading the key"""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            self.loads += 1
+            return future, True
+
+    def _finish(self, key, future, value, failed):
+        if failed:
+            self.failures += 1
+            self.cache.set(key, self._FAILED, ttl=self.negative_ttl)
+        else:
+            self.cache.set(key, value)
+        with self._lock:
+            self._inflight.pop(key, None)
+        future.set_result(None if failed else value)
+        return None if failed else value
+
+    def get(self, key, loader):
+        hit, value = self._lookup(key)
+        if hit:
+            return value
+        future, owner = self._claim(key)
+        if not owner:
+            return future.result()
+        try:
+            value = loader()
+        except Exception as e:
+            print(f"Search error: {str(e)}")
+            return self._finish(key, future, None, failed=True)
+        return self._finish(key, future, value, failed=False)
+
+    async def aget(self, key, aloader):
+        hit, value = self._lookup(key)
+        if hit:
+            return value
+        future, owner = self._claim(key)
+        if not owner:
+            return await asyncio.wrap_future(future)
+        try:
+            value = await aloader()
+        except asyncio.CancelledError:
+            # Release waiters without caching anything
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_result(None)
+            raise
+        except Exception as e:
+            print(f"Search error: {str(e)}")
+            return self._finish(key, future, None, failed=True)
+        return self._finish(key, future, value, failed=False)
+
+    def stats(self):
+        stats = self.cache.stats()
+        stats.update({
+            "loads": self.loads,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+            "inflight": len(self._inflight),
+        })
+        return stats
+
+
+class MedicalKnowledgeRetriever:
+    """Top-k lookups against a retrieval backend (see retrieval_backends), through a CoalescingCache"""
+
+    def __init__(self, backend, top=5, cache=None):
+        self.backend = backend
+        self.top = top
+        self.cache = cache or CoalescingCache()
+
+    @staticmethod
+    def make_key(query):
+        return " ".join((query or "").lower().split())
+
+    def search(self, query):
+        """Return a list of {"content", "source"} dicts, or None if the search failed"""
+        with timed("retrieval"):
+            return self.cache.get(self.make_key(query), lambda: self.backend.search(query, self.top))
+
+    async def asearch(self, query):
+        with timed("retrieval"):
+            return await self.cache.aget(self.make_key(query), lambda: self.backend.asearch(query, self.top))
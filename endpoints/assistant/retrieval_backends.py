@@ -0,0 +1,231 @@
+"""
+Pluggable backends for medical-knowledge retrieval.
+
+Every backend exposes ``search(query, top)`` (and ``asearch``) returning a list
+of ``{"content", "source"}`` dicts. ``AzureSearchBackend`` talks to the
+``medical-knowledge`` index; ``BM25Index`` and ``DenseVectorIndex`` answer
+queries in-process from an index directory built by
+``python manage.py build_retrieval_index``.
+
+Index directory layout:
+    documents.json        passages as [{"content", "source"}, ...]
+    meta.json             backend kind and build parameters
+    BM25:  vocab.json, postings_offsets.npy, postings_docs.npy,
+           postings_tf.npy, doc_lengths.npy
+    dense: embeddings.npy (float32, L2-normalised rows)
+
+The .npy arrays are opened with ``mmap_mode="r"``, so workers share the
+pages through the OS page cache instead of each holding a private copy.
+"""
+import asyncio
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+import numpy as np
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it my of on or "
+    "the this to was what when which who why with you your".split()
+)
+
+
+def tokenize(text):
+    return [token for token in _TOKEN.findall((text or "").lower()) if token not in _STOPWORDS]
+
+
+def _to_sources(hits):
+    return [{"content": hit["content"], "source": hit.get("source", "medical database")}
+            for hit in hits]
+
+
+class RetrievalBackend:
+    name = "base"
+
+    def search(self, query, top=5):
+        raise NotImplementedError
+
+    async def asearch(self, query, top=5):
+        return await asyncio.to_thread(self.search, query, top)
+
+
+class AzureSearchBackend(RetrievalBackend):
+    """Azure AI Search; the client getters are zero-argument callables (lazy, easy to fake)"""
+    name = "azure"
+
+    def __init__(self, get_search_client, get_async_search_client=None):
+        self.get_search_client = get_search_client
+        self.get_async_search_client = get_async_search_client
+
+    def search(self, query, top=5):
+        results = self.get_search_client().search(
+            search_text=query,
+            top=top,
+            include_total_count=True
+        )
+        return _to_sources(results)
+
+    async def asearch(self, query, top=5):
+        if self.get_async_search_client is None:
+            return await super().asearch(query, top)
+        results = await self.get_async_search_client().search(
+            search_text=query,
+            top=top,
+            include_total_count=True
+        )
+        return _to_sources([hit async for hit in results])
+
+
+# Corpus loading
+
+def iter_corpus(corpus_dir, max_words=200):
+    """
+    Yield {"content", "source"} passages from a corpus directory.
+
+    .txt/.md files are split on blank lines and paragraphs are merged up to
+    ``max_words``; .jsonl files are read as one passage per line.
+    """
+    for root, _, files in os.walk(corpus_dir):
+        for filename in sorted(files):
+            path = os.path.join(root, filename)
+            source = os.path.relpath(path, corpus_dir)
+            if filename.endswith(".jsonl"):
+                with open(path, encoding="utf-8") as handle:
+                    for line in handle:
+                        if line.strip():
+                            record = json.loads(line)
+                            yield {"content": record["content"], "source": record.get("source", source)}
+            elif filename.endswith((".txt", ".md")):
+                with open(path, encoding="utf-8") as handle:
+                    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", handle.read()) if p.strip()]
+                buffer = []
+                for paragraph in paragraphs:
+                    buffer.append(paragraph)
+                    if sum(len(p.split()) for p in buffer) >= max_words:
+                        yield {"content": "\n\n".join(buffer), "source": source}
+                        buffer = []
+                if buffer:
+                    yield {"content": "\n\n".join(buffer), "source": source}
+
+
+def _write_common(index_dir, documents, meta):
+    os.makedirs(index_dir, exist_ok=True)
+    with open(os.path.join(index_dir, "documents.json"), "w", encoding="utf-8") as handle:
+        json.dump(documents, handle)
+    with open(os.path.join(index_dir, "meta.json"), "w", encoding="utf-8") as handle:
+        json.dump(meta, handle)
+
+
+def _load_documents(index_dir):
+    with open(os.path.join(index_dir, "documents.json"), encoding="utf-8") as handle:
+        return json.load(handle)
+
+
+def _top_k(scores, top):
+    top = min(top, len(scores))
+    if top <= 0:
+        return []
+    candidates = np.argpartition(-scores, top - 1)[:top]
+    return candidates[np.argsort(-scores[candidates])]
+
+
+class BM25Index(RetrievalBackend):
+    """Okapi BM25 over a CSR-style inverted index stored as memory-mapped arrays"""
+    name = "bm25"
+
+    def __init__(self, index_dir, k1=1.5, b=0.75):
+        self.documents = _load_documents(index_dir)
+        with open(os.path.join(index_dir, "vocab.json"), encoding="utf-8") as handle:
+            self.vocab = json.load(handle)
+        load = lambda name: np.load(os.path.join(index_dir, name), mmap_mode="r")
+        self.offsets = load("postings_offsets.npy")
+        self.postings_docs = load("postings_docs.npy")
+        self.postings_tf = load("postings_tf.npy")
+        self.doc_lengths = np.asarray(load("doc_lengths.npy"), dtype=np.float32)
+        self.k1 = k1
+        self.b = b
+        self.avg_length = float(self.doc_lengths.mean()) if len(self.doc_lengths) else 0.0
+        self._length_norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / (self.avg_length or 1.0))
+
+    @classmethod
+    def build(cls, documents, index_dir):
+        vocab = {}
+        postings = defaultdict(list)
+        doc_lengths = np.zeros(len(documents), dtype=np.int32)
+        for doc_id, document in enumerate(documents):
+            tokens = tokenize(document["content"])
+            doc_lengths[doc_id] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                term_id = vocab.setdefault(term, len(vocab))
+                postings[term_id].append((doc_id, tf))
+
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        for term_id in range(len(vocab)):
+            offsets[term_id + 1] = offsets[term_id] + len(postings[term_id])
+        docs = np.empty(offsets[-1], dtype=np.int32)
+        tfs = np.empty(offsets[-1], dtype=np.float32)
+        for term_id, entries in postings.items():
+            start = offsets[term_id]
+            docs[start:start + len(entries)] = [doc_id for doc_id, _ in entries]
+            tfs[start:start + len(entries)] = [tf for _, tf in entries]
+
+        _write_common(index_dir, documents, {"backend": cls.name, "documents": len(documents), "terms": len(vocab)})
+        with open(os.path.join(index_dir, "vocab.json"), "w", encoding="utf-8") as handle:
+            json.dump(vocab, handle)
+        np.save(os.path.join(index_dir, "postings_offsets.npy"), offsets)
+        np.save(os.path.join(index_dir, "postings_docs.npy"), docs)
+        np.save(os.path.join(index_dir, "postings_tf.npy"), tfs)
+        np.save(os.path.join(index_dir, "doc_lengths.npy"), doc_lengths)
+
+    def search(self, query, top=5):
+        scores = np.zeros(len(self.documents), dtype=np.float32)
+        n_docs = len(self.documents)
+        matched = False
+        for term in set(tokenize(query)):
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.postings_docs[start:end]
+            tf = self.postings_tf[start:end]
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tf * (self.k1 + 1) / (tf + self._length_norm[docs])
+            matched = True
+        if not matched:
+            return []
+        return [self.documents[i] for i in _top_k(scores, top) if scores[i] > 0]
+
+
+class DenseVectorIndex(RetrievalBackend):
+    """Cosine similarity over memory-mapped, L2-normalised passage embeddings"""
+    name = "dense"
+
+    def __init__(self, index_dir, embed_query):
+        self.documents = _load_documents(index_dir)
+        self.embeddings = np.load(os.path.join(index_dir, "embeddings.npy"), mmap_mode="r")
+        self.embed_query = embed_query
+
+    @classmethod
+    def build(cls, documents, index_dir, embed_documents, batch_size=64):
+        vectors = []
+        for start in range(0, len(documents), batch_size):
+            batch = [document["content"] for document in documents[start:start + batch_size]]
+            vectors.extend(embed_documents(batch))
+        embeddings = np.asarray(vectors, dtype=np.float32).reshape(len(documents), -1)
+        embeddings /= np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+
+        _write_common(index_dir, documents, {
+            "backend": cls.name, "documents": len(documents), "dimensions": int(embeddings.shape[1]),
+        })
+        np.save(os.path.join(index_dir, "embeddings.npy"), embeddings)
+
+    def search(self, query, top=5):
+        if not self.documents:
+            return []
+        vector = np.asarray(self.embed_query(query), dtype=np.float32)
+        vector /= (np.linalg.norm(vector) or 1.0)
+        scores = self.embeddings @ vector
+        return [self.documents[i] for i in _top_k(scores, top)]
@@ -3,6 +3,7 @@ from rest_framework import serializers
 from django_rest_passwordreset.models import ResetPasswordToken
 from .models import SkinDiseasePrediction,ChatHistory
 from django.contrib.auth import get_user_model
+from .metrics import timed
 
 
 User = get_user_model()
@@ -28,7 +29,14 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
     password = serializers.CharField()
 
 
-class SkinDiseasePredictionSerializer(serializers.ModelSerializer):
+class TimedSerializerMixin:
+    """Records to_representation time under assistant_stage_seconds{stage="serialization"}"""
+    def to_representation(self, instance):
+        with timed("serialization"):
+            return super().to_representation(instance)
+
+
+class SkinDiseasePredictionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     image_url = serializers.SerializerMethodField()
     
     class Meta:
@@ -51,7 +59,7 @@ class SkinDiseasePredictionSerializer(serializers.ModelSerializer):
             return obj.image.url
         return None
 
-class ChatHistorySerializer(serializers.ModelSerializer):
+class ChatHistorySerializer(TimedSerializerMixin, serializers.ModelSerializer):
     user_id = serializers.CharField(source='session.user_id', read_only=True) 
 
     class Meta:
@@ -0,0 +1,72 @@
+"""
+Content-addressed storage for uploaded skin images.
+
+Uploads are hashed (SHA-256, streamed in chunks) and stored as
+``skin_images/<aa>/<sha256>.<ext>``. Re-uploading the same photo, e.g. on a
+retry or through the "upload_new_image" flow, reuses the existing file
+instead of writing another ``_AbCdEfG`` copy.
+"""
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def hash_upload(upload):
+    """
+    Streaming SHA-256 of an uploaded file (or any binary file object).
+
+    The digest is memoised on the object as ``content_sha256`` and the file is
+    rewound, so later readers (PIL, storage) start from the beginning.
+    """
+    digest = getattr(upload, "content_sha256", None)
+    if digest:
+        return digest
+
+    sha = hashlib.sha256()
+    if hasattr(upload, "chunks"):
+        for chunk in upload.chunks(HASH_CHUNK_SIZE):
+            sha.update(chunk)
+    else:
+        upload.seek(0)
+        for chunk in iter(lambda: upload.read(HASH_CHUNK_SIZE), b""):
+            sha.update(chunk)
+    upload.seek(0)
+
+    digest = sha.hexdigest()
+    try:
+        upload.content_sha256 = digest
+    except AttributeError:
+        pass
+    return digest
+
+
+def content_addressed_name(upload, filename):
+    digest = hash_upload(upload)
+    extension = os.path.splitext(filename)[1].lower() or ".jpg"
+    return f"skin_images/{digest[:2]}/{digest}{extension}"
+
+
+def skin_image_upload_to(instance, filename):
+    return content_addressed_name(instance.image.file, filename)
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Names are content hashes, so an existing file with the same name already
+    holds these bytes. Overwrites are allowed so two workers racing on the same
+    new upload both succeed (writing identical content) instead of renaming.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("allow_overwrite", True)
+        super().__init__(**kwargs)
+
+    def _save(self, name, content):
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
@@ -0,0 +1,88 @@
+import json
+import threading
+import time
+from collections import deque
+
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Lets DRF content negotiation accept ``Accept: text/event-stream``"""
+    media_type = "text/event-stream"
+    format = "sse"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Only reached for non-streaming error responses
+        return sse_event("error", data).encode(self.charset)
+
+
+class LatencyStats:
+    """Bounded window of latency samples (seconds) with simple percentile summaries"""
+
+    def __init__(self, window=1000):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def observe(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+
+    def summary(self):
+        with self._lock:
+            samples = sorted(self._samples)
+            count = self.count
+        if not samples:
+            return {"count": count}
+
+        def percentile(p):
+            return samples[min(len(samples) - 1, int(p * len(samples)))] * 1000
+
+        return {
+            "count": count,
+            "mean_ms": sum(samples) / len(samples) * 1000,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": samples[-1] * 1000,
+        }
+
+
+# Time from request start to the first streamed LLM token
+ttft_stats = LatencyStats()
+
+
+class TokenTimer:
+    """Tracks time-to-first-token for one streamed request"""
+
+    def __init__(self, stats=ttft_stats):
+        self.started = time.perf_counter()
+        self.first_token_at = None
+        self.stats = stats
+
+    def mark(self):
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+            self.stats.observe(self.first_token_at - self.started)
+
+    def summary(self):
+        return {
+            "ttft_ms": (self.first_token_at - self.started) * 1000 if self.first_token_at else None,
+            "total_ms": (time.perf_counter() - self.started) * 1000,
+        }
+
+
+def sse_event(event, data):
+    """Format one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def event_stream_response(events):
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx/Azure front ends from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
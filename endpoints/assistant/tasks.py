@@ -0,0 +1,190 @@
+"""
+Durable background jobs backed by the BackgroundJob table.
+
+Work is enqueued as a row, so it survives worker restarts and needs no
+external broker. Workers claim a job with a conditional UPDATE (only one
+claimant can flip it from pending to running), run its handler and record the
+result. Failures are retried with exponential backoff up to ``max_attempts``.
+A job whose worker died mid-run is picked up again once its lease
+(TASK_LEASE_SECONDS) expires.
+
+Workers run in a dedicated ``python manage.py run_task_worker`` process and,
+when TASK_WORKER_THREADS > 0, as daemon threads inside each web process.
+Handlers are registered with ``@task("kind")``; the modules in
+``TASK_MODULES`` are imported before a worker runs so their handlers exist.
+"""
+import importlib
+import os
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+TASK_MODULES = ["assistant.views"]
+
+_handlers = {}
+
+
+def task(kind):
+    """Register ``fn(payload, job)`` as the handler for jobs of ``kind``; its return value is stored as the result"""
+    def decorator(fn):
+        _handlers[kind] = fn
+        return fn
+    return decorator
+
+
+def _load_handlers():
+    for module in TASK_MODULES:
+        importlib.import_module(module)
+
+
+def enqueue(kind, payload, session=None, max_attempts=None):
+    from .models import BackgroundJob
+
+    job = BackgroundJob.objects.create(
+        kind=kind,
+        payload=payload,
+        session=session,
+        max_attempts=max_attempts or settings.TASK_MAX_ATTEMPTS,
+        run_after=timezone.now(),
+    )
+    worker = get_task_worker()
+    if worker is not None:
+        transaction.on_commit(worker.wake)
+    return job
+
+
+def claim_next():
+    """Claim the oldest runnable job (pending and due, or running with an expired lease), or return None"""
+    from .models import BackgroundJob
+
+    now = timezone.now()
+    expired = now - timedelta(seconds=settings.TASK_LEASE_SECONDS)
+    candidates = (
+        BackgroundJob.objects
+        .filter(Q(status="pending", run_after__lte=now) | Q(status="running", locked_at__lt=expired))
+        .order_by("run_after")
+        .values_list("id", "status", "locked_at")[:10]
+    )
+    for job_pk, status, locked_at in candidates:
+        claimed = BackgroundJob.objects.filter(pk=job_pk, status=status, locked_at=locked_at).update(
+            status="running", locked_at=now, attempts=F("attempts") + 1
+        )
+        if claimed:
+            return BackgroundJob.objects.get(pk=job_pk)
+    return None
+
+
+def run_job(job):
+    handler = _handlers.get(job.kind)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job kind {job.kind!r}")
+        if job.attempts > job.max_attempts:
+            raise TimeoutError("lease expired on the final attempt")
+        result = handler(job.payload, job)
+    except Exception as e:
+        print(f"Job {job.job_id} ({job.kind}) attempt {job.attempts} failed: {str(e)}")
+        job.error = traceback.format_exc(limit=5)
+        if job.attempts < job.max_attempts and handler is not None:
+            job.status = "pending"
+            job.run_after = timezone.now() + timedelta(
+                seconds=settings.TASK_RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1)
+            )
+        else:
+            job.status = "failed"
+        job.locked_at = None
+        job.save(update_fields=["status", "error", "run_after", "locked_at", "updated_at"])
+        return False
+
+    job.status = "succeeded"
+    job.result = result
+    job.error = ""
+    job.locked_at = None
+    job.save(update_fields=["status", "result", "error", "locked_at", "updated_at"])
+    return True
+
+
+def run_pending(limit=None):
+    """Run due jobs in the calling thread until none are left (or ``limit`` ran); returns the count"""
+    _load_handlers()
+    count = 0
+    while limit is None or count < limit:
+        job = claim_next()
+        if job is None:
+            break
+        run_job(job)
+        count += 1
+    return count
+
+
+class TaskWorker:
+    """Polling worker threads; ``wake()`` skips the poll delay after an enqueue"""
+
+    def __init__(self, threads=1, poll_interval=1.0):
+        self.threads = max(1, int(threads))
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._started = []
+
+    def start(self):
+        for index in range(self.threads):
+            thread = threading.Thread(target=self._loop, name=f"task-worker-{os.getpid()}-{index}", daemon=True)
+            thread.start()
+            self._started.append(thread)
+        return self
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _loop(self):
+        _load_handlers()
+        while not self._stop.is_set():
+            ran = False
+            try:
+                close_old_connections()
+                job = claim_next()
+                if job is not None:
+                    run_job(job)
+                    ran = True
+            except Exception as e:
+                print(f"Task worker error: {str(e)}")
+            finally:
+                close_old_connections()
+            if not ran:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def run_forever(self):
+        self.start()
+        try:
+            while not self._stop.is_set():
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            self.stop()
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_task_worker():
+    """The in-process worker, started on first use; None when TASK_WORKER_THREADS is 0"""
+    global _worker
+    if settings.TASK_WORKER_THREADS <= 0:
+        return None
+    if _worker is None:
+        with _worker_lock:
+            if _worker is None:
+                _worker = TaskWorker(settings.TASK_WORKER_THREADS, settings.TASK_POLL_SECONDS).start()
+    return _worker
@@ -1,8 +1,265 @@
-from django.test import TestCase
-
-# testing database
-# python manage.py shell
-from assistant.models import Dermatologist
-print(list(Dermatologist.objects.values('name', 'specialization')))
-# Example VALID entry:
-# {'name': 'Dr. Smith', 'specialization': 'Cosmetic dermatologist'}
\ No newline at end of file
+"""
+Tests for the assistant app.
+
+The LLM, the medical search index and the classifier are replaced by the
+local fakes from benchmarks.fakes, so no Azure credentials or model file are
+needed:
+    python manage.py test assistant
+    python manage.py test assistant --settings=benchmarks.settings   # SQLite instead of PostgreSQL
+"""
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+
+import numpy as np
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from benchmarks import fakes
+
+from . import tasks
+from .calibration import fit_temperature, negative_log_likelihood, softmax
+from .dermatologist_search import location_lookup, parse_query
+from .metrics import ROUTING_DECISIONS
+from .models import BackgroundJob, ChatHistory, ConversationSession, Dermatologist, SkinDiseasePrediction
+from .prediction_cache import PredictionCache, prediction_cache
+
+
+def jpeg(color, size=(320, 240)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="JPEG")
+    return SimpleUploadedFile("photo.jpg", buffer.getvalue(), content_type="image/jpeg")
+
+
+def ranking(*pairs):
+    return [{"condition": condition, "confidence": confidence} for condition, confidence in pairs]
+
+
+class FakesMixin:
+    """Fake LLM, search and classifier with no added latency, and a throwaway MEDIA_ROOT"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        fakes.install(llm_latency_ms=0, llm_jitter_ms=0, token_delay_ms=0, search_latency_ms=0, classifier="numpy")
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(MEDIA_ROOT=cls.media_root, RESPONSE_CACHE_ENABLED=False)
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        prediction_cache.cache.clear()
+
+
+# Stages and chat history run on other threads, so rows must be committed to be visible there
+class MedicalAssistantAPITests(FakesMixin, TransactionTestCase):
+
+    def post(self, data):
+        response = self.client.post("/api/medical-assistant/", {"user_id": "anon_test", **data})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def routed(self, mode):
+        return ROUTING_DECISIONS._children.get((mode,), 0)
+
+    def test_image_is_diagnosed(self):
+        body = self.post({"message": "itchy red patch", "image": jpeg("red"), "top_k": 3})
+        self.assertIsNotNone(body["diagnosis"])
+        self.assertEqual(len(body["prediction"]["top_k"]), 3)
+        self.assertEqual(body["diagnosis"]["predicted_disease"], body["prediction"]["top_k"][0]["condition"])
+        self.assertEqual(SkinDiseasePrediction.objects.count(), 1)
+        self.assertEqual(len(SkinDiseasePrediction.objects.get().ranking), fakes.NUM_CLASSES)
+
+    def test_repeat_upload_skips_the_classifier(self):
+        first = self.post({"image": jpeg("blue")})
+        hits = prediction_cache.stats()["hits"]
+        second = self.post({"image": jpeg("blue")})
+        self.assertEqual(prediction_cache.stats()["hits"], hits + 1)
+        self.assertEqual(second["prediction"], first["prediction"])
+
+    def test_treatment_question_uses_medical_search(self):
+        before = self.routed("medical_search")
+        body = self.post({"message": "What is the best treatment for eczema?"})
+        self.assertEqual(self.routed("medical_search"), before + 1)
+        self.assertEqual(body["chat_response"]["chatbot_response"], fakes.ANSWER)
+        self.assertEqual(body["suggested_actions"], ["more_details", "dermatologist_referral"])
+        self.assertTrue(ChatHistory.objects.get().metadata["sources"])
+
+    def test_dermatologist_request_lists_dermatologists(self):
+        Dermatologist.objects.create(name="Dr. Wanjiku", specialization="Acne", location="Nairobi")
+        Dermatologist.objects.create(name="Dr. Otieno", specialization="Psoriasis", location="Kisumu")
+        before = self.routed("dermatologist_query")
+        body = self.post({"message": "Find me a dermatologist for acne in nairobi"})
+        self.assertEqual(self.routed("dermatologist_query"), before + 1)
+        self.assertEqual(body["dermatologists"]["query"]["location"], "Nairobi")
+        self.assertEqual([row["name"] for row in body["dermatologists"]["results"]], ["Dr. Wanjiku"])
+        self.assertEqual(body["suggested_actions"], ["book_appointment", "more_options"])
+
+    def test_off_topic_question_is_declined(self):
+        before = self.routed("off_topic")
+        body = self.post({"message": "Who won the football match last night?"})
+        self.assertEqual(self.routed("off_topic"), before + 1)
+        self.assertIn("I specialize only in dermatology", body["chat_response"]["chatbot_response"])
+        self.assertEqual(body["suggested_actions"], [])
+
+
+class PredictionCacheTests(TestCase):
+
+    def setUp(self):
+        self.session = ConversationSession.objects.create()
+
+    def test_memory_hit_needs_enough_ranked_classes(self):
+        cache = PredictionCache(maxsize=8)
+        cache.set("abc", "v1", "Acne", 91.0, ranking(("Acne", 91.0), ("Rosacea", 5.0)))
+        self.assertEqual(cache.get("abc", "v1", top_k=2)[0], "Acne")
+        self.assertIsNone(cache.get("abc", "v1", top_k=3))
+        self.assertIsNone(cache.get("abc", "v2"))
+
+    def test_database_fallback_serves_top_k_from_the_stored_ranking(self):
+        stored = ranking(("Eczema", 80.0), ("Psoriasis", 12.0), ("Hives", 5.0))
+        SkinDiseasePrediction.objects.create(
+            image="skin_images/a.jpg", image_sha256="abc", model_version="v1", ranking=stored,
+            predicted_disease="Eczema", confidence_score=80.0, session=self.session,
+        )
+        cache = PredictionCache(maxsize=8)
+        self.assertEqual(cache.get("abc", "v1", top_k=3), ("Eczema", 80.0, stored))
+        self.assertEqual(cache.stats()["db_hits"], 1)
+        # Now served from memory
+        SkinDiseasePrediction.objects.all().delete()
+        self.assertEqual(cache.get("abc", "v1", top_k=3)[2], stored)
+
+    def test_rows_without_a_ranking_only_serve_the_top_class(self):
+        SkinDiseasePrediction.objects.create(
+            image="skin_images/a.jpg", image_sha256="abc", model_version="v1",
+            predicted_disease="Eczema", confidence_score=80.0, session=self.session,
+        )
+        cache = PredictionCache(maxsize=8)
+        self.assertIsNone(cache.get("abc", "v1", top_k=3))
+        self.assertEqual(cache.get("abc", "v1", top_k=1)[:2], ("Eczema", 80.0))
+
+
+@override_settings(TASK_LEASE_SECONDS=60, TASK_RETRY_BACKOFF_SECONDS=5, TASK_MAX_ATTEMPTS=2)
+class TaskTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.calls = []
+
+        @tasks.task("test_echo")
+        def echo(payload, job):
+            cls.calls.append(payload)
+            return {"echo": payload["value"]}
+
+        @tasks.task("test_broken")
+        def broken(payload, job):
+            raise RuntimeError("boom")
+
+    @classmethod
+    def tearDownClass(cls):
+        tasks._handlers.pop("test_echo", None)
+        tasks._handlers.pop("test_broken", None)
+        super().tearDownClass()
+
+    def test_claim_marks_the_job_running_once(self):
+        job = tasks.enqueue("test_echo", {"value": 1})
+        claimed = tasks.claim_next()
+        self.assertEqual(claimed.pk, job.pk)
+        self.assertEqual((claimed.status, claimed.attempts), ("running", 1))
+        self.assertIsNotNone(claimed.locked_at)
+        self.assertIsNone(tasks.claim_next())
+
+    def test_job_runs_and_stores_its_result(self):
+        job = tasks.enqueue("test_echo", {"value": 7})
+        self.assertEqual(tasks.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.result, job.error), ("succeeded", {"echo": 7}, ""))
+
+    def test_expired_lease_is_reclaimed(self):
+        job = tasks.enqueue("test_echo", {"value": 2})
+        tasks.claim_next()
+        BackgroundJob.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(seconds=61))
+        reclaimed = tasks.claim_next()
+        self.assertEqual(reclaimed.pk, job.pk)
+        self.assertEqual(reclaimed.attempts, 2)
+
+    def test_lease_expiring_on_the_final_attempt_fails_the_job(self):
+        job = tasks.enqueue("test_echo", {"value": 3})
+        for _ in range(2):
+            tasks.claim_next()
+            BackgroundJob.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(seconds=61))
+        self.assertFalse(tasks.run_job(tasks.claim_next()))
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+        self.assertNotIn({"value": 3}, self.calls)
+
+    def test_failure_is_retried_with_backoff_then_fails(self):
+        job = tasks.enqueue("test_broken", {})
+        started = timezone.now()
+        self.assertFalse(tasks.run_job(tasks.claim_next()))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("pending", 1))
+        self.assertIn("boom", job.error)
+        self.assertGreaterEqual(job.run_after, started + timedelta(seconds=5))
+        # Not due yet
+        self.assertIsNone(tasks.claim_next())
+
+        BackgroundJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        self.assertFalse(tasks.run_job(tasks.claim_next()))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("failed", 2))
+
+    def test_unknown_kind_fails_without_retrying(self):
+        job = tasks.enqueue("test_missing", {})
+        tasks.run_job(tasks.claim_next())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ("failed", 1))
+
+
+class ParseQueryTests(SimpleTestCase):
+    locations = location_lookup(["Nairobi", "Westlands, Nairobi", "Mombasa"])
+
+    def test_condition_from_keyword_or_cue(self):
+        self.assertEqual(parse_query("dermatologist for my pimples").condition, "acne")
+        self.assertEqual(parse_query("someone who treats scalp scarring in town").condition, "scalp scarring")
+
+    def test_location_is_matched_case_insensitively(self):
+        self.assertEqual(parse_query("acne doctor in nairobi", self.locations).location, "Nairobi")
+        self.assertEqual(parse_query("anyone near WESTLANDS?", self.locations).location, "Westlands")
+        self.assertEqual(parse_query("clinics around westlands, please", self.locations).location, "Westlands")
+
+    def test_unknown_or_missing_locations_are_ignored(self):
+        self.assertIsNone(parse_query("a dermatologist in my area", self.locations).location)
+        self.assertIsNone(parse_query("a dermatologist in nairobi").location)
+
+    def test_name(self):
+        query = parse_query("Is Dr. Jane Mwangi available in Mombasa", self.locations)
+        self.assertEqual(query.as_dict(), {"condition": None, "location": "Mombasa", "name": "Jane Mwangi"})
+
+
+class FitTemperatureTests(SimpleTestCase):
+
+    def test_recovers_the_temperature_of_over_confident_logits(self):
+        rng = np.random.default_rng(0)
+        calibrated = rng.normal(0, 2, (4000, 17))
+        probabilities = softmax(calibrated, dtype=np.float64)
+        labels = np.array([rng.choice(17, p=row) for row in probabilities])
+        logits = calibrated * 3.0
+
+        temperature = fit_temperature(logits, labels)
+        self.assertAlmostEqual(temperature, 3.0, delta=0.3)
+        self.assertLess(negative_log_likelihood(logits, labels, temperature), negative_log_likelihood(logits, labels))
+
+    def test_keeps_the_ranking(self):
+        logits = np.random.default_rng(1).normal(0, 4, (50, 17))
+        temperature = fit_temperature(logits, logits.argmax(axis=1))
+        np.testing.assert_array_equal(softmax(logits, temperature).argmax(axis=1), logits.argmax(axis=1))
@@ -1,7 +1,9 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
-from .views import RegisterView, LoginView, PasswordResetView, PasswordResetConfirmView, MedicalAssistantAPI
+from .views import RegisterView, LoginView, PasswordResetView, PasswordResetConfirmView, MedicalAssistantAPI, BatchDiagnosisAPI, InferenceStatsView, StreamStatsView, CacheStatsView, JobStatusView, RequestStatsView, DermatologistSearchView, ModelVersionsView
 from django.conf import settings
+from django.views.decorators.csrf import csrf_exempt
+from .async_views import AsyncMedicalAssistantAPI
 from django.conf.urls.static import static
 
 
@@ -15,6 +17,15 @@ urlpatterns = [
     path('password-reset/', PasswordResetView.as_view(), name='password_reset'),
     path('password-reset/confirm/', PasswordResetConfirmView.as_view(), name='password_reset_confirm'),
     path('medical-assistant/', MedicalAssistantAPI.as_view(), name='assistant'),
+    path('medical-assistant/batch/', BatchDiagnosisAPI.as_view(), name='assistant_batch'),
+    path('medical-assistant/async/', csrf_exempt(AsyncMedicalAssistantAPI.as_view()), name='assistant_async'),
+    path('inference-stats/', InferenceStatsView.as_view(), name='inference_stats'),
+    path('stream-stats/', StreamStatsView.as_view(), name='stream_stats'),
+    path('cache-stats/', CacheStatsView.as_view(), name='cache_stats'),
+    path('request-stats/', RequestStatsView.as_view(), name='request_stats'),
+    path('jobs/<uuid:job_id>/', JobStatusView.as_view(), name='job_status'),
+    path('dermatologists/', DermatologistSearchView.as_view(), name='dermatologist_search'),
+    path('model-versions/', ModelVersionsView.as_view(), name='model_versions'),
     
 
     # urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,4 +1,3 @@
-from PIL import Image
 from rest_framework.parsers import JSONParser,MultiPartParser
 
 from rest_framework import generics, permissions, status
@@ -13,61 +12,64 @@ from .serializers import (
     ChatHistorySerializer,
 )
 from django.db.models import Q
-from .models import User, SkinDiseasePrediction, ChatHistory,Dermatologist,ConversationSession
-import numpy as np
-import tensorflow as tf
+from .models import User, SkinDiseasePrediction, ChatHistory,Dermatologist,ConversationSession,BackgroundJob
+from .model_registry import (
+    active_version,
+    get_classifier_registry,
+    get_llm,
+    get_medical_retriever,
+    get_inference_client,
+    get_dermatologist_search,
+    get_inference_scheduler,
+    get_intent_engine,
+    model_version,
+    predict_views,
+    prediction_tag,
+    top_k_classes,
+)
 from rest_framework.views import APIView
-import os
+import time
 import uuid
 from django.conf import settings
+from django.urls import reverse
 
-from langchain.chains import ConversationChain
-from langchain.memory import ConversationBufferMemory
-from langchain_core.chat_history import InMemoryChatMessageHistory
-from langchain_core.runnables.history import RunnableWithMessageHistory,BaseChatMessageHistory
-from langchain_openai import AzureChatOpenAI
-from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.messages import SystemMessage
-
-# # Configure Azure OpenAI
-api_key = settings.AZURE_OPENAI_API_KEY
-api_endpoint = settings.AZURE_OPENAI_API_ENDPOINT
-azure_search_api=settings.AZURE_AI_SEARCH_API
-azure_search_endpoint = settings.AZURE_AI_SEARCH_ENDPOINT
-
-from azure.search.documents import SearchClient
-from azure.core.credentials import AzureKeyCredential
-
-
-llm = AzureChatOpenAI(
-    openai_api_key=settings.AZURE_OPENAI_API_KEY,
-    azure_endpoint=settings.AZURE_OPENAI_API_ENDPOINT,
-    api_version="2024-05-01-preview",
-    model_name="gpt-35-turbo",
-    temperature=0.7,
-)
+# Heavy clients (TensorFlow model, AzureChatOpenAI, SearchClient) are built lazily
+# by model_registry on first use, so importing this module stays cheap.
+from langchain_core.runnables.history import RunnableWithMessageHistory
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableLambda
+
+# Session history is read from ChatHistory/SkinDiseasePrediction rows through a bounded cache
+from .chat_memory import get_session_history
+from .dermatologist_search import format_results, parse_query
+from .fanout import RequestStages, stage_stats
+from .metrics import ROUTING_DECISIONS
+from .history_compaction import HistoryCompactor, record_prompt_tokens
+from .preprocessing import augment_views, load_image, preprocess_batch
+from .response_cache import response_cache
+from .prediction_cache import prediction_cache
+from .storage import content_addressed_name, hash_upload
+from .tasks import enqueue, task
+from .streaming import EventStreamRenderer, TokenTimer, event_stream_response, sse_event, ttft_stats
+from rest_framework.settings import api_settings
+import asyncio
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+def wants_tta(data):
+    """Per-request test-time augmentation (``tta`` field): slower, usually more accurate"""
+    value = str(data.get('tta', '')).lower()
+    if value:
+        return value in ('1', 'true', 'yes')
+    return settings.CLASSIFIER_TTA_DEFAULT
+
+
+def requested_top_k(data):
+    try:
+        return max(1, int(data.get('top_k', 3)))
+    except (TypeError, ValueError):
+        return 3
 
-# Initialize chat history
-chat_history = InMemoryChatMessageHistory()
-
-# Define the function to retrieve session history
-store={}
-def get_session_history(session_id: str) -> BaseChatMessageHistory:
-    if session_id not in store:
-        store[session_id] = InMemoryChatMessageHistory()
-    return store[session_id]
-# Create a ConversationChain
-conversation_chain = ConversationChain(
-    llm=llm,
-    memory=ConversationBufferMemory(),
-)
-# Initialize the conversation handler
-conversation_handler = RunnableWithMessageHistory(
-    runnable=conversation_chain,
-    get_session_history=get_session_history,
-    input_messages_key="input", 
-    history_messages_key="history"  
-)
 
 class RegisterView(generics.CreateAPIView):
     queryset = User.objects.all()
@@ -88,31 +90,57 @@ class PasswordResetView(ResetPasswordRequestToken):
 class PasswordResetConfirmView(ResetPasswordConfirm):
     serializer_class = PasswordResetConfirmSerializer
 
-# Load the model
-# model_path = os.path.abspath(
-#     "endpoints/static/model/Skin_Disease_Classification.keras"
-# )
-# Get the directory of the current script (views.py)
-current_dir = os.path.dirname(os.path.abspath(__file__))
+class InferenceStatsView(APIView):
+    """Expose micro-batching queue depth and batch-size metrics for tuning"""
+    def get(self, request, *args, **kwargs):
+        stats = get_inference_scheduler().stats()
+        if settings.INFERENCE_SERVER_SOCKET:
+            try:
+                stats["inference_server"] = get_inference_client().health()
+            except Exception as e:
+                stats["inference_server"] = {"status": "unavailable", "error": str(e)}
+        return Response(stats, status=status.HTTP_200_OK)
 
-# Go up one level to the 'endpoints' directory
-base_dir = os.path.dirname(current_dir)
+class CacheStatsView(APIView):
+    """Hit/miss counters for the response, retrieval and prediction caches"""
+    def get(self, request, *args, **kwargs):
+        return Response({
+            "response_cache": response_cache.stats(),
+            "prediction_cache": prediction_cache.stats(),
+            "retrieval_cache": get_medical_retriever().cache.stats(),
+            "dermatologist_directory": get_dermatologist_search().stats(),
+        }, status=status.HTTP_200_OK)
 
-# Build the absolute path to the model
-model_path = os.path.join(base_dir, "model", "Skin_Disease_Classification.keras")
+class ModelVersionsView(APIView):
+    """Active and shadow classifier versions, with images served and shadow agreement per version"""
+    def get(self, request, *args, **kwargs):
+        return Response(get_classifier_registry().stats(), status=status.HTTP_200_OK)
 
-print("Resolved model path:", model_path) 
-model = tf.keras.models.load_model(model_path)
-# print(model.summary())
-# print(f"Model file path: {os.path.abspath('model.h5')}")
+class RequestStatsView(APIView):
+    """Per-stage latency of assistant requests (inference, retrieval, session lookup, LLM)"""
+    def get(self, request, *args, **kwargs):
+        return Response({"stages": stage_stats.summary()}, status=status.HTTP_200_OK)
 
-# Disease categories
-data_cat = [
-    'acne', 'actinickeratosis', 'alopeciaareata', 'chickenpox', 'cold sores',
-    'eczema', 'folliculitis', 'hives', 'impetigo', 'melanoma', 'psoriasis',
-    'ringworm', 'rosacea', 'shingles', 'uticaria', 'vitiligo', 'warts'
-]
+class DermatologistSearchView(APIView):
+    """Paginated dermatologist search: ``q`` free text, or ``condition`` / ``location`` / ``name``"""
+    def get(self, request, *args, **kwargs):
+        params = request.query_params
+        search = get_dermatologist_search()
+        query = parse_query(params.get('q', ''), search.locations())
+        for field in ('condition', 'location', 'name'):
+            if params.get(field):
+                setattr(query, field, params[field])
+        try:
+            page = int(params.get('page', 1))
+            page_size = min(int(params.get('page_size', settings.DERMATOLOGIST_PAGE_SIZE)), 50)
+        except ValueError:
+            return Response({"error": "page and page_size must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(search.search(query, page=page, page_size=page_size), status=status.HTTP_200_OK)
 
+class StreamStatsView(APIView):
+    """Time-to-first-token summary for streamed assistant responses"""
+    def get(self, request, *args, **kwargs):
+        return Response({"time_to_first_token": ttft_stats.summary()}, status=status.HTTP_200_OK)
 
 
 # Autonomous ChatBot AI Agent
@@ -141,12 +169,12 @@ class MedicalAssistantAPI(APIView):
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        # Initialize Azure Cognitive Search client
-        self.search_client = SearchClient(
-            endpoint=azure_search_endpoint,
-            index_name="medical-knowledge",
-            credential=AzureKeyCredential('azure_search_api'),
-        )
+        # Shared, cached and coalesced Azure Cognitive Search lookups
+        self.retriever = get_medical_retriever()
+        # Top-k classes, version tag and TTA mode of this request's image prediction, and its
+        # full class ranking (saved with the SkinDiseasePrediction row)
+        self.prediction = None
+        self.ranking = None
         
         # Enhanced conversation chain with system prompt
         self.prompt = ChatPromptTemplate.from_messages([
@@ -155,7 +183,14 @@ class MedicalAssistantAPI(APIView):
             ("human", "{input}"),
         ])
         
-        self.conversation_chain = self.prompt | llm
+        # Older turns are folded into a running summary before reaching the prompt
+        llm = get_llm()
+        self.conversation_chain = (
+            RunnableLambda(HistoryCompactor(llm))
+            | self.prompt
+            | RunnableLambda(record_prompt_tokens)
+            | llm
+        )
         self.conversation_handler = RunnableWithMessageHistory(
             runnable=self.conversation_chain,
             get_session_history=get_session_history,
@@ -163,6 +198,7 @@ class MedicalAssistantAPI(APIView):
             history_messages_key="history"
         )
     parser_classes = [JSONParser,MultiPartParser]
+    renderer_classes = list(api_settings.DEFAULT_RENDERER_CLASSES) + [EventStreamRenderer]
     def post(self, request, *args, **kwargs):
         response_data = {
             "session_id": None,
@@ -186,51 +222,88 @@ class MedicalAssistantAPI(APIView):
                 session_uuid = uuid.uuid4()
                 session_id = str(session_uuid)
 
+            # Independent stages overlap: inference or text routing + retrieval run on the
+            # request pool while the session lookup runs here; both join before any LLM call
+            stream = self.wants_stream(request)
+            stages = self.stages = RequestStages()
+            if not stream:
+                if image:
+                    stages.submit("inference", self.predict_disease, image,
+                                  wants_tta(request.data), requested_top_k(request.data))
+                else:
+                    stages.submit("text_context", self.prepare_text_input, message or "Explain this diagnosis")
+
             # Get or create session object
-            session, created = ConversationSession.objects.get_or_create(
+            session, created = stages.run(
+                "session",
+                ConversationSession.objects.get_or_create,
                 session_id=session_uuid,
                 defaults={'user_id': user_id if not user_id.startswith('anon_') else None}
             )
 
             response_data["session_id"] = str(session.session_id)
+            # Stateless/first-turn answers may be served from the response cache
+            first_turn = created and settings.RESPONSE_CACHE_ENABLED
+
+            # Server-sent events mode: forward LLM tokens as they arrive
+            if stream:
+                return event_stream_response(
+                    self.stream_events(message, user_id, session, image, request)
+                )
 
             # Process image if provided
             if image:
                 try:
-                    predicted_disease, confidence_score = self.predict_disease(image)
+                    predicted_disease, confidence_score = stages.result("inference")
+                    response_data["prediction"] = self.prediction
                      # Handle low confidence first
                     if confidence_score < 65:
+                        response_data.update(
+                            self.low_confidence_payload(predicted_disease, confidence_score)
+                        )
+                        return Response(response_data, status=status.HTTP_200_OK)
+
+                    # Deferred mode: answer with the classifier result now, explain in a background job
+                    if self.wants_deferred(request):
+                        job = enqueue("diagnosis_explanation", {
+                            "session_id": str(session.session_id),
+                            "user_id": user_id if not user_id.startswith('anon_') else None,
+                            "image": self.store_image(image),
+                            "image_sha256": hash_upload(image),
+                            "model_version": self.prediction["model_version"],
+                            "ranking": self.ranking,
+                            "message": message,
+                            "predicted_disease": predicted_disease,
+                            "confidence_score": confidence_score,
+                            "cacheable": first_turn,
+                        }, session=session)
                         response_data.update({
-                            "status": "low_confidence",
-                            "diagnosis": {
-                                "condition": predicted_disease,
-                                "confidence": confidence_score
-                            },
-                            "message": (
-                                f"Possible {predicted_disease} detected ({confidence_score:.1f}% confidence). "
-                                "For better accuracy:\n"
-                                "1. Upload a clearer, closer photo\n"
-                                "2. Ensure good lighting\n"
-                                "3. Consult a dermatologist"
-                            ),
-                            "suggested_actions": [
-                                "upload_new_image",
-                                "find_specialist"
-                            ]
+                            "diagnosis": {"condition": predicted_disease, "confidence": confidence_score},
+                            "status": "processing",
+                            "job_id": str(job.job_id),
+                            "job_url": request.build_absolute_uri(reverse('job_status', args=[job.job_id])),
                         })
-                        return Response(response_data, status=status.HTTP_200_OK)
-                    
-                    analysis = self.generate_chatbot_response(
+                        return Response(response_data, status=status.HTTP_202_ACCEPTED)
+
+                    analysis = stages.run(
+                        "llm_diagnosis",
+                        self.generate_chatbot_response,
                         predicted_disease=predicted_disease,
                         confidence_score=confidence_score,
                         symptoms=message,
-                        session_id=str(session.session_id)
+                        session_id=str(session.session_id),
+                        cacheable=first_turn
                     )
 
                     # Create prediction with session object
-                    prediction = SkinDiseasePrediction.objects.create(
+                    prediction = stages.run(
+                        "persist_prediction",
+                        SkinDiseasePrediction.objects.create,
                         user_id=user_id if not user_id.startswith('anon_') else None,
                         image=image,
+                        image_sha256=hash_upload(image),
+                        model_version=self.prediction["model_version"],
+                        ranking=self.ranking,
                         symptoms=message,
                         predicted_disease=predicted_disease,
                         confidence_score=confidence_score,
@@ -265,10 +338,14 @@ class MedicalAssistantAPI(APIView):
             # Process text message (if any)
             if message or not image:
                 try:
-                    chat_response = self.handle_text_input(
+                    chat_response = stages.run(
+                        "llm_chat",
+                        self.handle_text_input,
                         message=message or "Explain this diagnosis",
                         session_id=str(session.session_id),
-                        is_followup=bool(image)
+                        is_followup=bool(image),
+                        cacheable=first_turn and not image,
+                        prepared=stages.result("text_context") if "text_context" in stages else None
                     )
 
                     # Create chat history with session object
@@ -288,6 +365,8 @@ class MedicalAssistantAPI(APIView):
                         context={'request': request}
                     ).data
                     response_data["suggested_actions"] = chat_response.get('suggested_actions', [])
+                    if chat_response.get('dermatologists'):
+                        response_data["dermatologists"] = chat_response['dermatologists']
 
                 except Exception as e:
                     return Response(
@@ -304,6 +383,155 @@ class MedicalAssistantAPI(APIView):
             )
 
 
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        stages = getattr(self, "stages", None)
+        if stages is not None and stages.timings:
+            response["Server-Timing"] = stages.server_timing()
+        return response
+
+    def wants_stream(self, request):
+        if 'text/event-stream' in request.META.get('HTTP_ACCEPT', ''):
+            return True
+        return str(request.data.get('stream', '')).lower() in ('1', 'true', 'yes')
+
+    def wants_deferred(self, request):
+        if 'respond-async' in request.META.get('HTTP_PREFER', ''):
+            return True
+        value = str(request.data.get('defer', '')).lower()
+        if value:
+            return value in ('1', 'true', 'yes')
+        return settings.DIAGNOSIS_DEFERRED_DEFAULT
+
+    def store_image(self, image):
+        """Write the upload to content-addressed storage now, so a background job can reference it by name"""
+        storage = SkinDiseasePrediction._meta.get_field('image').storage
+        return storage.save(content_addressed_name(image, image.name), image)
+
+    def low_confidence_payload(self, predicted_disease, confidence_score):
+        return {
+            "status": "low_confidence",
+            "diagnosis": {
+                "condition": predicted_disease,
+                "confidence": confidence_score
+            },
+            "message": (
+                f"Possible {predicted_disease} detected ({confidence_score:.1f}% confidence). "
+                "For better accuracy:\n"
+                "1. Upload a clearer, closer photo\n"
+                "2. Ensure good lighting\n"
+                "3. Consult a dermatologist"
+            ),
+            "suggested_actions": [
+                "upload_new_image",
+                "find_specialist"
+            ]
+        }
+
+    def stream_llm(self, prompt, session_id, timer):
+        """Yield LLM text chunks for a prompt through the history-aware handler"""
+        for chunk in self.conversation_handler.stream(
+            {"input": prompt},
+            config={"configurable": {"session_id": session_id}},
+        ):
+            if chunk.content:
+                timer.mark()
+                yield chunk.content
+
+    def stream_events(self, message, user_id, session, image, request):
+        """
+        SSE variant of post(). Events, in order: "session", optionally
+        "diagnosis" (+ "token" events with stage=diagnosis), "token" events
+        with stage=chat, "chat_response", then "done" with TTFT/total timings.
+        Rows are persisted once each LLM stream has finished.
+        """
+        timer = TokenTimer()
+        session_id = str(session.session_id)
+        owner_id = user_id if not user_id.startswith('anon_') else None
+        yield sse_event("session", {"session_id": session_id})
+
+        try:
+            if image:
+                predicted_disease, confidence_score = self.predict_disease(
+                    image, wants_tta(request.data), requested_top_k(request.data)
+                )
+                if confidence_score < 65:
+                    yield sse_event("diagnosis", {
+                        **self.low_confidence_payload(predicted_disease, confidence_score),
+                        "prediction": self.prediction,
+                    })
+                    yield sse_event("done", {"session_id": session_id, **timer.summary()})
+                    return
+
+                yield sse_event("diagnosis", {
+                    "status": "streaming",
+                    "condition": predicted_disease,
+                    "confidence": confidence_score,
+                    "prediction": self.prediction,
+                })
+                prompt = self.build_diagnosis_prompt(predicted_disease, confidence_score, message)
+                analysis = []
+                for text in self.stream_llm(prompt, session_id, timer):
+                    analysis.append(text)
+                    yield sse_event("token", {"stage": "diagnosis", "text": text})
+
+                prediction = SkinDiseasePrediction.objects.create(
+                    user_id=owner_id,
+                    image=image,
+                    image_sha256=hash_upload(image),
+                    model_version=self.prediction["model_version"],
+                    ranking=self.ranking,
+                    symptoms=message,
+                    predicted_disease=predicted_disease,
+                    confidence_score=confidence_score,
+                    chatbot_response="".join(analysis),
+                    session=session
+                )
+                yield sse_event("diagnosis", {
+                    "status": "success",
+                    **SkinDiseasePredictionSerializer(prediction, context={'request': request}).data,
+                })
+                message = f"I was diagnosed with {predicted_disease}. {message}"
+
+            suggested_actions = ["explain_diagnosis", "treatment_options"] if image else []
+            if message or not image:
+                result = self.prepare_text_input(message or "Explain this diagnosis", is_followup=bool(image))
+                prompt = result.pop("prompt")
+                if prompt is not None:
+                    parts = []
+                    for text in self.stream_llm(prompt, session_id, timer):
+                        parts.append(text)
+                        yield sse_event("token", {"stage": "chat", "text": text})
+                    result["text"] = "".join(parts)
+                else:
+                    yield sse_event("token", {"stage": "chat", "text": result["text"]})
+
+                chat = ChatHistory.objects.create(
+                    user_id=owner_id,
+                    user_message=message,
+                    chatbot_response=result['text'],
+                    session=session,
+                    metadata={
+                        'sources': result.get('sources'),
+                        'suggested_actions': result.get('suggested_actions')
+                    }
+                )
+                yield sse_event("chat_response", ChatHistorySerializer(chat, context={'request': request}).data)
+                suggested_actions = result.get('suggested_actions', [])
+
+            summary = timer.summary()
+            yield sse_event("done", {
+                "session_id": session_id,
+                "suggested_actions": suggested_actions,
+                **summary,
+            })
+
+        except Exception as e:
+            yield sse_event("error", {
+                "error": str(e),
+                "suggested_actions": ["retry_upload", "contact_support"] if image else []
+            })
+
     def process_image(self, image, symptoms, session_id):
         """Handle image-based diagnosis flow"""
         try:
@@ -321,6 +549,9 @@ class MedicalAssistantAPI(APIView):
             SkinDiseasePrediction.objects.create(
                 user_id=session_id,
                 image=image,
+                image_sha256=hash_upload(image),
+                model_version=self.prediction["model_version"],
+                ranking=self.ranking,
                 symptoms=symptoms,
                 predicted_disease=predicted_disease,
                 confidence_score=confidence_score,
@@ -338,105 +569,142 @@ class MedicalAssistantAPI(APIView):
 
 
     # Helper methods
+    def classify_message(self, message):
+        """Healthcare filter, routing mode and follow-up actions in one pass (see assistant.intents)"""
+        if getattr(self, "_intent", (None, None))[0] != message:
+            self._intent = (message, get_intent_engine().classify(message))
+        return self._intent[1]
+
     def is_healthcare_question(self, message):
         """Determine if the message is healthcare-related"""
-        healthcare_keywords = [
-            'skin', 'rash', 'acne', 'treatment', 'medicine', 'doctor',
-            'dermatologist', 'itch', 'itchy', 'red', 'bump', 'pimple',
-            'eczema', 'psoriasis', 'melanoma', 'hives', 'allergy',
-            'infection', 'diagnose', 'symptom', 'pain', 'swelling',
-            'prescription', 'medical', 'health', 'disease', 'condition',
-            'cure', 'relief', 'ointment', 'cream', 'antibiotic', 'fungal',
-            'virus', 'bacteria', 'allergic', 'reaction', 'scar', 'mark',
-            'spot', 'patch', 'dry', 'oily', 'sensitive', 'burn', 'sting',
-            'peel', 'blister', 'wart', 'mole', 'freckle', 'patch','hello','hey',
-            'thank you'
-        ]
-        
-        message_lower = message.lower()
-        
-        # Check for explicit non-healthcare phrases
-        non_healthcare_phrases = [
-            'joke','code'
-        ]
-        
-        if any(phrase in message_lower for phrase in non_healthcare_phrases):
-            return False
-        
-        # Check for healthcare keywords
-        return any(keyword in message_lower for keyword in healthcare_keywords)
-    def handle_text_input(self, message, session_id, is_followup=False):
-        """Process text input with intelligent routing"""
-        try:
-            # Process text input with healthcare filtering
-            if not self.is_healthcare_question(message):
-                return {
-                    "text": "I specialize only in dermatology and skin health questions. "
-                        "Please ask me about skin conditions, treatments, or related medical concerns.",
-                    "suggested_actions": []
-                }
-            # Determine processing path
-            processing_mode = self.determine_processing_mode(message, is_followup)
-            
-            if processing_mode == "medical_search":
-                # Retrieve evidence-based medical information
-                results = self.retrieve_medical_info(message)
-                if results:
-                    prompt = f"Question: {message}\nMedical Context: {results}\nProvide a concise answer citing sources:"
-                    response = self.conversation_handler.invoke(
-                        {"input": prompt},
-                        config={"configurable": {"session_id": session_id}},
-                    )
-                    return {
-                        "text": response.content,
-                        "sources": results[:3],  # Return top 3 sources
-                        "suggested_actions": ["more_details", "dermatologist_referral"]
-                    }
-                else:
-                    # Fallback to general chat if no results found
-                    processing_mode = "general_chat"
-            
-            if processing_mode == "dermatologist_query":
-                dermatologists = self.query_dermatologists(message)
-                if dermatologists:
-                    return {
-                        "text": f"I found these dermatologists matching your query:\n{dermatologists}",
-                        "suggested_actions": ["book_appointment", "more_options"]
-                    }
-                else:
-                    return {
-                        "text": "I couldn't find dermatologists matching your criteria. Would you like to expand your search?",
-                        "suggested_actions": ["broaden_search"]
-                    }
-            
-            # Default to general conversation
-            response = self.conversation_handler.invoke(
-                {"input": message},
-                config={"configurable": {"session_id": session_id}},
-            )
-            
+        return self.classify_message(message).healthcare
+
+    def route_text_input(self, message, is_followup=False):
+        """Pick the processing mode for a text message ("off_topic" for non-healthcare questions)"""
+        intent = self.classify_message(message)
+        if not intent.healthcare:
+            mode = "off_topic"
+        else:
+            mode = "general_chat" if is_followup else intent.mode
+        ROUTING_DECISIONS.inc(mode=mode)
+        return mode
+
+    def build_text_result(self, processing_mode, message, results=None, dermatologists=None):
+        """
+        Turn a routed message and its fetched context into a result dict.
+
+        When "prompt" is set the caller still has to run it through the
+        conversation handler (blocking, streaming or async) and use the output
+        as "text"; otherwise the result is already final.
+        """
+        if processing_mode == "off_topic":
             return {
-                "text": response.content,
-                "suggested_actions": self.generate_followup_actions(message)
+                "prompt": None,
+                "text": "I specialize only in dermatology and skin health questions. "
+                    "Please ask me about skin conditions, treatments, or related medical concerns.",
+                "suggested_actions": []
             }
-            
+
+        if processing_mode == "medical_search":
+            # Evidence-based medical information
+            if results:
+                return {
+                    "prompt": f"Question: {message}\nMedical Context: {results}\nProvide a concise answer citing sources:",
+                    "sources": results[:3],  # Return top 3 sources
+                    "suggested_actions": ["more_details", "dermatologist_referral"]
+                }
+            else:
+                # Fallback to general chat if no results found
+                processing_mode = "general_chat"
+
+        if processing_mode == "dermatologist_query":
+            if dermatologists and dermatologists["results"]:
+                return {
+                    "prompt": None,
+                    "text": f"I found these dermatologists matching your query:\n{format_results(dermatologists)}",
+                    "dermatologists": dermatologists,
+                    "suggested_actions": ["book_appointment", "more_options"]
+                }
+            else:
+                return {
+                    "prompt": None,
+                    "text": "I couldn't find dermatologists matching your criteria. Would you like to expand your search?",
+                    "suggested_actions": ["broaden_search"]
+                }
+
+        # Default to general conversation
+        return {
+            "prompt": message,
+            "suggested_actions": self.generate_followup_actions(message)
+        }
+
+    def prepare_text_input(self, message, is_followup=False):
+        """Route a text message and fetch its context, without calling the LLM"""
+        processing_mode = self.route_text_input(message, is_followup)
+        results = dermatologists = None
+        if processing_mode == "medical_search":
+            results = self.retrieve_medical_info(message)
+        elif processing_mode == "dermatologist_query":
+            dermatologists = self.query_dermatologists(message)
+        return self.build_text_result(processing_mode, message, results, dermatologists)
+
+    def handle_text_input(self, message, session_id, is_followup=False, cacheable=False, prepared=None):
+        """Process text input with intelligent routing (``prepared``: a prepare_text_input result fetched earlier)"""
+        try:
+            # First-turn questions do not depend on history, so their answers can be shared
+            if cacheable:
+                cached = response_cache.get(message)
+                if cached is not None:
+                    return cached
+
+            started = time.perf_counter()
+            result = dict(prepared) if prepared is not None else self.prepare_text_input(message, is_followup)
+            prompt = result.pop("prompt")
+            if prompt is not None:
+                response = self.conversation_handler.invoke(
+                    {"input": prompt},
+                    config={"configurable": {"session_id": session_id}},
+                )
+                result["text"] = response.content
+                if cacheable:
+                    response_cache.set(message, None, result, elapsed=time.perf_counter() - started)
+            return result
+
         except Exception as e:
             raise Exception(f"Text processing failed: {str(e)}") 
-    def predict_disease(self, image):
-        """Predict disease from image with enhanced preprocessing"""
+    def predict_disease(self, image, tta=None, top_k=3):
+        """Predict disease from image; the top-k classes, version tag and TTA mode go to self.prediction"""
+        tta = settings.CLASSIFIER_TTA_DEFAULT if tta is None else tta
         try:
-            img_width, img_height = 180, 180
-            pil_image = Image.open(image).convert("RGB")
-            pil_image = pil_image.resize((img_width, img_height))
-            image_arr = tf.keras.utils.array_to_img(pil_image)
-            image_bat = tf.expand_dims(image_arr, axis=0)
-            
-            # Predict and process results
-            predict = model.predict(image_bat)
-            score = tf.nn.softmax(predict)
-            confidence_score = float(np.max(score)*100)
-            predicted_idx = np.argmax(score)
-            predicted_disease = data_cat[predicted_idx]
+            # Same bytes + same model version, calibration and TTA mode: reuse the earlier prediction
+            version = active_version()
+            top_k = min(top_k, len(version.labels))
+            digest = hash_upload(image)
+            cached = prediction_cache.get(digest, prediction_tag(version, tta), top_k)
+            if cached is not None:
+                predicted_disease, confidence_score, top = cached
+                self.prediction = {"model_version": prediction_tag(version, tta), "tta": tta, "top_k": top[:top_k]}
+                self.ranking = top if len(top) == len(version.labels) else None
+                return predicted_disease, confidence_score
+
+            # Reduced-size JPEG decode straight into a float32 array at the version's input size
+            image_arr = load_image(image, size=version.image_size)
+            if tta:
+                # The original and its flipped/cropped views travel as one (V, H, W, 3) item and run
+                # in one forward pass with other TTA requests; the micro-batcher groups items by
+                # shape, so plain (H, W, 3) images waiting in the same batch get a pass of their own
+                image_arr = augment_views(image_arr[None], settings.CLASSIFIER_TTA_VIEWS)[0]
+
+            # Predict through the shared batching scheduler; a hot-swap may land meanwhile
+            version, probabilities = get_inference_scheduler().submit(
+                image_arr, timeout=settings.INFERENCE_TIMEOUT_SECONDS
+            )
+            tag = prediction_tag(version, tta)
+            top = top_k_classes(probabilities, len(version.labels), version.labels)
+            predicted_disease, confidence_score = top[0]["condition"], top[0]["confidence"]
+            prediction_cache.set(digest, tag, predicted_disease, confidence_score, top)
+            self.prediction = {"model_version": tag, "tta": tta, "top_k": top[:top_k]}
+            self.ranking = top
             print(f"Predicted:{predicted_disease} ({confidence_score:.2f}%)")
             
             return predicted_disease, confidence_score
@@ -445,10 +713,8 @@ class MedicalAssistantAPI(APIView):
             print(f"Prediction error: {str(e)}")
             raise Exception("Could not process the image. Please try again with a clearer photo.")
     
-    def generate_chatbot_response(self,predicted_disease, confidence_score, symptoms, session_id):
-        """Generate AI response for diagnosis"""
-        try:
-            prompt = f"""
+    def build_diagnosis_prompt(self, predicted_disease, confidence_score, symptoms):
+        return f"""
             Diagnosis: {predicted_disease} ({confidence_score:.1f}% confidence)
             Symptoms: {symptoms}
             
@@ -458,11 +724,24 @@ class MedicalAssistantAPI(APIView):
             3. When to see a doctor
             4. Any precautions
             """
-            
+
+    def generate_chatbot_response(self,predicted_disease, confidence_score, symptoms, session_id, cacheable=False):
+        """Generate AI response for diagnosis"""
+        try:
+            if cacheable:
+                cached = response_cache.get(symptoms, predicted_disease)
+                if cached is not None:
+                    return cached["text"]
+
+            started = time.perf_counter()
+            prompt = self.build_diagnosis_prompt(predicted_disease, confidence_score, symptoms)
             response = self.conversation_handler.invoke(
                 {"input": prompt},
                 config={"configurable": {"session_id": session_id}},
             )
+            if cacheable:
+                response_cache.set(symptoms, predicted_disease, {"text": response.content},
+                                   elapsed=time.perf_counter() - started)
             return response.content
         except Exception as e:
             raise Exception(f"Response generation failed: {str(e)}")
@@ -470,49 +749,20 @@ class MedicalAssistantAPI(APIView):
 
     def determine_processing_mode(self, message, is_followup):
         """Intelligent routing of text inputs"""
-        message_lower = message.lower()
         if is_followup:
             return "general_chat"
-        elif any(keyword in message_lower for keyword in ["treatment", "medicine", "remedy"]):
-            return "medical_search"
-        elif any(keyword in message_lower for keyword in ["dermatologist", "doctor", "specialist","recommend a doctor"]):
-            return "dermatologist_query"
-        else:
-            return "general_chat"
+        mode = self.classify_message(message).mode
+        return "general_chat" if mode == "off_topic" else mode
 
     def retrieve_medical_info(self, query):
         """Enhanced medical information retrieval"""
-        try:
-            results = self.search_client.search(
-                search_text=query,
-                top=5,
-                include_total_count=True
-            )
-            return [{"content": hit["content"], "source": hit.get("source", "medical database")} 
-                   for hit in results]
-        except Exception as e:
-            print(f"Search error: {str(e)}")
-            return None
+        # Failures are logged and negatively cached by the retriever, which returns None
+        return self.retriever.search(query)
 
-    def query_dermatologists(self, query):
-        """Search for dermatologists with location awareness"""
+    def query_dermatologists(self, query, page=1):
+        """Search for dermatologists with location awareness (a page dict, see assistant.dermatologist_search)"""
         try:
-            print(f"DEBUG QUERY: {query}") 
-            base_qs = Dermatologist.objects.filter(
-            Q(specialization__icontains="dermatology") |
-            Q(name__icontains="dermatology"))
-            # Simple implementation - extend with location filtering if available
-            if "specializing in" in query.lower():
-                _, condition = query.lower().split("specializing in", 1)
-                condition = condition.strip()
-                # Search for both dermatology AND condition
-                return base_qs.filter(
-                    Q(specialization__icontains=condition) |
-                    Q(name__icontains=condition)
-                )[:5]
-        
-            return base_qs[:5]
-           
+            return get_dermatologist_search().search(query, page=page)
         except Exception as e:
             print(f"Dermatologist query error: {str(e)}")
             return None
@@ -528,20 +778,7 @@ class MedicalAssistantAPI(APIView):
 
     def generate_followup_actions(self, message):
         """Generate context-aware suggested actions"""
-        message_lower = message.lower()
-        actions = []
-        
-        if any(word in message_lower for word in ["treatment", "medicine"]):
-            actions.append("alternative_treatments")
-        if "serious" in message_lower:
-            actions.append("emergency_contact")
-        if any(word in message_lower for word in ["prevent", "avoid"]):
-            actions.append("prevention_tips")
-            
-        if not actions:
-            actions = ["learn_more", "ask_specialist", "related_conditions"]
-            
-        return actions
+        return list(self.classify_message(message).actions)
 
     def save_interaction(self, user_id, session_id, user_message, image, response_data):
         """Save complete interaction to both chat history and prediction tables"""
@@ -565,6 +802,9 @@ class MedicalAssistantAPI(APIView):
                     user_id=user_id,
                     session_id=session_id,
                     image=image,
+                    image_sha256=hash_upload(image),
+                    model_version=self.prediction["model_version"] if self.prediction else model_version(),
+                    ranking=self.ranking,
                     symptoms=user_message,
                     predicted_disease=response_data["diagnosis"]["condition"],
                     confidence_score=response_data["diagnosis"]["confidence"],
@@ -574,3 +814,295 @@ class MedicalAssistantAPI(APIView):
         except Exception as e:
             print(f"Failed to save interaction: {str(e)}")
        
+
+
+class BatchDiagnosisAPI(MedicalAssistantAPI):
+    """
+    Diagnose several lesion photos for one patient in a single request.
+
+    Images are decoded in parallel into one buffer, classified with a single
+    batched forward pass and explained by one consolidated LLM call. The
+    SkinDiseasePrediction rows are inserted with bulk_create.
+    """
+    parser_classes = [MultiPartParser]
+
+    def post(self, request, *args, **kwargs):
+        try:
+            data = request.data
+            images = request.FILES.getlist('images')
+            message = data.get('message', '')
+            user_id = data.get('user_id', f"anon_{str(uuid.uuid4())[:8]}")
+            session_id = data.get('session_id', str(uuid.uuid4()))
+            owner_id = user_id if not user_id.startswith('anon_') else None
+            # One version for the whole request, even if a swap lands meanwhile
+            version = active_version()
+            tta = wants_tta(data)
+            tag = prediction_tag(version, tta)
+            try:
+                top_k = max(1, min(len(version.labels), int(data.get('top_k', 3))))
+            except (TypeError, ValueError):
+                top_k = 3
+
+            if not images:
+                return Response(
+                    {"error": "Upload one or more files in the 'images' field."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if len(images) > settings.BATCH_DIAGNOSIS_MAX_IMAGES:
+                return Response(
+                    {"error": f"At most {settings.BATCH_DIAGNOSIS_MAX_IMAGES} images per request."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            try:
+                session_uuid = uuid.UUID(session_id)
+            except ValueError:
+                session_uuid = uuid.uuid4()
+            session, created = ConversationSession.objects.get_or_create(
+                session_id=session_uuid,
+                defaults={'user_id': owner_id}
+            )
+
+            batch, errors = preprocess_batch(images, size=version.image_size)
+            valid = [i for i in range(len(images)) if i not in errors]
+            if valid and tta:
+                # Every image's views in one (N * V)-image forward pass
+                probabilities = predict_views(augment_views(batch[valid], settings.CLASSIFIER_TTA_VIEWS), version)
+            else:
+                probabilities = predict_views(batch[valid], version) if valid else []
+
+            results = [None] * len(images)
+            for index, error in errors.items():
+                print(f"Prediction error for {images[index].name}: {str(error)}")
+                results[index] = {
+                    "filename": images[index].name,
+                    "status": "error",
+                    "error": "Could not process the image. Please try again with a clearer photo.",
+                }
+            findings = []
+            rankings = {}
+            for index, row in zip(valid, probabilities):
+                ranking = top_k_classes(row, len(version.labels), version.labels)
+                top = ranking[:top_k]
+                condition, confidence = top[0]["condition"], top[0]["confidence"]
+                results[index] = {
+                    "filename": images[index].name,
+                    "status": "success" if confidence >= 65 else "low_confidence",
+                    "condition": condition,
+                    "confidence": confidence,
+                    "top_k": top,
+                }
+                findings.append((index, condition, confidence))
+                rankings[index] = ranking
+                prediction_cache.set(hash_upload(images[index]), tag, condition, confidence, ranking)
+
+            analysis = None
+            confident = [(i, c, p) for i, c, p in findings if p >= 65]
+            if confident:
+                analysis = self.generate_batch_response(confident, findings, message, str(session.session_id))
+
+            predictions = SkinDiseasePrediction.objects.bulk_create([
+                SkinDiseasePrediction(
+                    user_id=owner_id,
+                    session=session,
+                    image=images[index],
+                    image_sha256=hash_upload(images[index]),
+                    model_version=tag,
+                    ranking=rankings[index],
+                    symptoms=message,
+                    predicted_disease=condition,
+                    confidence_score=confidence,
+                    chatbot_response=analysis,
+                )
+                for index, condition, confidence in findings
+            ])
+            for (index, _, _), prediction in zip(findings, predictions):
+                results[index]["diagnosis"] = SkinDiseasePredictionSerializer(
+                    prediction,
+                    context={'request': request}
+                ).data
+
+            return Response({
+                "session_id": str(session.session_id),
+                "model_version": tag,
+                "tta": tta,
+                "results": results,
+                "chat_response": analysis,
+                "suggested_actions": (
+                    ["explain_diagnosis", "treatment_options"] if confident
+                    else ["upload_new_image", "find_specialist"]
+                ),
+            }, status=status.HTTP_200_OK)
+
+        except Exception as e:
+            return Response(
+                {"error": f"Server error: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+    def generate_batch_response(self, confident, findings, symptoms, session_id):
+        """One LLM explanation covering every confidently classified image"""
+        lines = [
+            f"Image {position}: {condition} ({confidence:.1f}% confidence)"
+            + ("" if confidence >= 65 else " - low confidence, may need a clearer photo")
+            for position, (_, condition, confidence) in enumerate(findings, start=1)
+        ]
+        prompt = f"""
+            The patient uploaded {len(findings)} photos of skin lesions.
+            {chr(10).join(lines)}
+            Symptoms: {symptoms}
+
+            As a dermatology assistant, provide one consolidated answer:
+            1. A simple explanation of each distinct condition ({len({c for _, c, _ in confident})} found)
+            2. Whether the findings are consistent with each other
+            3. Recommended self-care measures
+            4. When to see a doctor
+            """
+        response = self.conversation_handler.invoke(
+            {"input": prompt},
+            config={"configurable": {"session_id": session_id}},
+        )
+        return response.content
+
+
+@task("diagnosis_explanation")
+def explain_diagnosis(payload, job):
+    """Deferred half of MedicalAssistantAPI.post: LLM explanation, prediction row and follow-up chat"""
+    assistant = MedicalAssistantAPI()
+    session = ConversationSession.objects.get(session_id=payload["session_id"])
+    # Steps already recorded by an earlier attempt are not repeated on retry
+    progress = dict(job.result or {})
+
+    if "prediction_id" not in progress:
+        analysis = assistant.generate_chatbot_response(
+            predicted_disease=payload["predicted_disease"],
+            confidence_score=payload["confidence_score"],
+            symptoms=payload["message"],
+            session_id=payload["session_id"],
+            cacheable=payload["cacheable"]
+        )
+        prediction = SkinDiseasePrediction.objects.create(
+            user_id=payload["user_id"],
+            image=payload["image"],
+            image_sha256=payload["image_sha256"],
+            model_version=payload["model_version"],
+            ranking=payload.get("ranking"),
+            symptoms=payload["message"],
+            predicted_disease=payload["predicted_disease"],
+            confidence_score=payload["confidence_score"],
+            chatbot_response=analysis,
+            session=session
+        )
+        progress["prediction_id"] = prediction.id
+        job.result = progress
+        job.save(update_fields=["result"])
+
+    if "chat_id" not in progress:
+        message = f"I was diagnosed with {payload['predicted_disease']}. {payload['message']}"
+        chat_response = assistant.handle_text_input(
+            message=message,
+            session_id=payload["session_id"],
+            is_followup=True
+        )
+        chat = ChatHistory.objects.create(
+            user_id=payload["user_id"],
+            user_message=message,
+            chatbot_response=chat_response['text'],
+            session=session,
+            metadata={
+                'sources': chat_response.get('sources'),
+                'suggested_actions': chat_response.get('suggested_actions')
+            }
+        )
+        progress["chat_id"] = chat.id
+        progress["suggested_actions"] = chat_response.get('suggested_actions', [])
+    return progress
+
+
+class JobStatusView(APIView):
+    """
+    Poll a background job. Once a deferred diagnosis succeeds the response
+    carries the same "diagnosis" / "chat_response" payloads as the synchronous
+    endpoint. With Accept: text/event-stream the status is pushed instead.
+
+    Under ASGI the stream is an async generator, so a waiting client holds no
+    thread between polls. Under WSGI every open stream pins a worker, so it
+    ends after JOB_STREAM_WSGI_SECONDS with a "timeout" event; clients then
+    reconnect or poll.
+    """
+    renderer_classes = list(api_settings.DEFAULT_RENDERER_CLASSES) + [EventStreamRenderer]
+    STREAM_TIMEOUT_SECONDS = 120
+    STREAM_POLL_SECONDS = 0.5
+
+    def get(self, request, job_id, *args, **kwargs):
+        if 'text/event-stream' in request.META.get('HTTP_ACCEPT', ''):
+            if isinstance(request._request, ASGIRequest):
+                return event_stream_response(self.astream(job_id, request))
+            return event_stream_response(self.stream(job_id, request, settings.JOB_STREAM_WSGI_SECONDS))
+        job = BackgroundJob.objects.filter(job_id=job_id).first()
+        if job is None:
+            return Response({"error": "Job not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self.describe(job, request), status=status.HTTP_200_OK)
+
+    def describe(self, job, request):
+        data = {
+            "job_id": str(job.job_id),
+            "kind": job.kind,
+            "status": job.status,
+            "attempts": job.attempts,
+        }
+        if job.status == "failed":
+            data["error"] = (job.error.strip().splitlines() or ["Job failed"])[-1]
+        if job.status == "succeeded":
+            result = job.result or {}
+            prediction = SkinDiseasePrediction.objects.filter(pk=result.get("prediction_id")).first()
+            chat = ChatHistory.objects.filter(pk=result.get("chat_id")).first()
+            data.update({
+                "session_id": str(job.session_id) if job.session_id else None,
+                "diagnosis": SkinDiseasePredictionSerializer(
+                    prediction, context={'request': request}
+                ).data if prediction else None,
+                "chat_response": ChatHistorySerializer(
+                    chat, context={'request': request}
+                ).data if chat else None,
+                "suggested_actions": result.get("suggested_actions", []),
+            })
+        return data
+
+    def poll(self, job_id, request, last_status, deadline):
+        """One look at the job: (events to send, its status, whether the stream is over)"""
+        job = BackgroundJob.objects.filter(job_id=job_id).first()
+        if job is None:
+            return [sse_event("error", {"error": "Job not found"})], None, True
+        events = []
+        if job.status != last_status:
+            events.append(sse_event("status", {"status": job.status, "attempts": job.attempts}))
+        if job.status in ("succeeded", "failed"):
+            events.append(sse_event("result", self.describe(job, request)))
+            return events, job.status, True
+        if time.monotonic() > deadline:
+            events.append(sse_event("timeout", {"status": job.status, "job_id": str(job_id)}))
+            return events, job.status, True
+        return events, job.status, False
+
+    def stream(self, job_id, request, timeout):
+        deadline = time.monotonic() + timeout
+        last_status = None
+        while True:
+            events, last_status, done = self.poll(job_id, request, last_status, deadline)
+            yield from events
+            if done:
+                return
+            time.sleep(self.STREAM_POLL_SECONDS)
+
+    async def astream(self, job_id, request):
+        deadline = time.monotonic() + self.STREAM_TIMEOUT_SECONDS
+        last_status = None
+        poll = sync_to_async(self.poll)
+        while True:
+            events, last_status, done = await poll(job_id, request, last_status, deadline)
+            for event in events:
+                yield event
+            if done:
+                return
+            await asyncio.sleep(self.STREAM_POLL_SECONDS)
@@ -0,0 +1,85 @@
+"""
+Load-test comparison of the WSGI and ASGI assistant endpoints.
+
+Start the two servers first, e.g.:
+    gunicorn api.wsgi:application --workers 2 --threads 8 --bind 127.0.0.1:8000
+    uvicorn api.asgi:application --workers 2 --port 8001
+
+then run (from the endpoints directory):
+    python -m benchmarks.async_load --requests 500 --concurrency 200
+
+Both targets receive the same mix of text messages at the same concurrency.
+Throughput and latency percentiles are printed side by side.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+MESSAGES = [
+    "What treatment is best for acne?",
+    "My skin is red and itchy after using a new cream",
+    "Can you recommend a dermatologist specializing in eczema?",
+    "How do I prevent psoriasis flare ups?",
+]
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+async def run_target(url, total, concurrency, timeout):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async with httpx.AsyncClient(timeout=timeout, limits=httpx.Limits(max_connections=concurrency)) as client:
+        async def one(i):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(url, json={"message": MESSAGES[i % len(MESSAGES)]})
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - started)
+                except Exception:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "requests": total,
+        "errors": errors,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000 if latencies else None,
+        "p95_ms": percentile(latencies, 0.95) * 1000 if latencies else None,
+        "p99_ms": percentile(latencies, 0.99) * 1000 if latencies else None,
+        "mean_ms": statistics.mean(latencies) * 1000 if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare WSGI and ASGI assistant endpoints under load")
+    parser.add_argument("--wsgi-url", default="http://127.0.0.1:8000/api/medical-assistant/")
+    parser.add_argument("--asgi-url", default="http://127.0.0.1:8001/api/medical-assistant/async/")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    for name, url in (("wsgi", args.wsgi_url), ("asgi", args.asgi_url)):
+        result = asyncio.run(run_target(url, args.requests, args.concurrency, args.timeout))
+        fmt = lambda value: f"{value:8.1f}" if value is not None else "     n/a"
+        print(
+            f"{name}: {result['throughput_rps']:7.1f} req/s  "
+            f"p50 {fmt(result['p50_ms'])}ms  p95 {fmt(result['p95_ms'])}ms  "
+            f"p99 {fmt(result['p99_ms'])}ms  errors {result['errors']}/{result['requests']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Cold-start time, peak memory and CPU latency of the classifier runtimes.
+
+Compares the Keras model (CLASSIFIER_MODEL_PATH) with TFLite exports written
+by ``manage.py export_classifier``. Each runtime runs in a fresh interpreter,
+so import cost and peak RSS (VmHWM) include everything that runtime pulls in.
+Prediction parity is checked by ``export_classifier --parity-dir``.
+
+Usage (from the endpoints directory):
+    python manage.py export_classifier --quantize dynamic --output /tmp/dynamic.tflite
+    python -m benchmarks.classifier_runtime --tflite /tmp/dynamic.tflite --tflite /tmp/float16.tflite
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+SNIPPET = """
+import json, sys, time
+started = time.perf_counter()
+import numpy as np
+sys.path.insert(0, ".")
+
+def high_water_kb():
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+
+runtime, path, runs, batch_size = {runtime!r}, {path!r}, {runs}, {batch_size}
+if runtime == "keras":
+    import tensorflow as tf
+    model = tf.keras.models.load_model(path)
+else:
+    from assistant.inference_backends import TFLiteClassifier
+    model = TFLiteClassifier(path)
+load_s = time.perf_counter() - started
+
+rng = np.random.default_rng(0)
+single = rng.uniform(0, 255, (1, 180, 180, 3)).astype(np.float32)
+batch = rng.uniform(0, 255, (batch_size, 180, 180, 3)).astype(np.float32)
+np.asarray(model(single, training=False))  # first call builds kernels / traces
+
+latencies = []
+for _ in range(runs):
+    tick = time.perf_counter()
+    np.asarray(model(single, training=False))
+    latencies.append((time.perf_counter() - tick) * 1000)
+
+np.asarray(model(batch, training=False))
+tick = time.perf_counter()
+for _ in range(max(1, runs // 10)):
+    np.asarray(model(batch, training=False))
+batch_ms = (time.perf_counter() - tick) * 1000 / max(1, runs // 10)
+
+print(json.dumps({{
+    "load_s": load_s,
+    "p50_ms": float(np.percentile(latencies, 50)),
+    "p95_ms": float(np.percentile(latencies, 95)),
+    "batch_ms_per_image": batch_ms / batch_size,
+    "peak_rss_mb": high_water_kb() / 1024,
+}}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Keras vs TFLite classifier runtimes")
+    parser.add_argument("--keras", default=None, help="Keras model (defaults to CLASSIFIER_MODEL_PATH)")
+    parser.add_argument("--tflite", action="append", default=[], help="Exported .tflite file (repeatable)")
+    parser.add_argument("--runs", type=int, default=100)
+    parser.add_argument("--batch-size", type=int, default=16)
+    args = parser.parse_args()
+
+    keras_path = args.keras or os.getenv(
+        "CLASSIFIER_MODEL_PATH", os.path.join("model", "Skin_Disease_Classification.keras")
+    )
+    variants = [("keras", keras_path)] + [("tflite", path) for path in args.tflite]
+    print(f"{args.runs} single-image runs, batch size {args.batch_size}")
+    for runtime, path in variants:
+        run_variant(runtime, path, args.runs, args.batch_size)
+
+
+def run_variant(runtime, path, runs, batch_size):
+    label = f"{runtime}:{os.path.basename(path)}"
+    result = subprocess.run(
+        [sys.executable, "-c", SNIPPET.format(runtime=runtime, path=path, runs=runs, batch_size=batch_size)],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        print(f"{label:>40}: failed ({result.stderr.strip().splitlines()[-1]})")
+        return
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+    size_mb = os.path.getsize(path) / 1e6
+    print(
+        f"{label:>40}: {size_mb:6.1f} MB file  load {stats['load_s']:5.2f}s  "
+        f"p50 {stats['p50_ms']:7.2f} ms  p95 {stats['p95_ms']:7.2f} ms  "
+        f"batched {stats['batch_ms_per_image']:6.2f} ms/image  peak RSS {stats['peak_rss_mb']:7.1f} MB"
+    )
+
+
+if __name__ == "__main__":
+    main()
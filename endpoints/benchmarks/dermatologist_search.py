@@ -0,0 +1,137 @@
+"""
+Dermatologist search over a large directory: the original icontains lookup
+against assistant.dermatologist_search (database and in-memory backends).
+
+Run from the endpoints directory:
+    python -m benchmarks.dermatologist_search --rows 100000
+
+Uses a throwaway SQLite database by default (benchmarks.settings). To measure
+the pg_trgm indexes, point it at PostgreSQL with BENCH_USE_PROJECT_DB=True;
+the table is emptied and reseeded, so use a scratch database.
+"""
+import argparse
+import os
+import random
+import time
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+from benchmarks.load_suite import percentile, vm_status  # noqa: E402
+
+FIRST = ["Amina", "Brian", "Carol", "Daniel", "Esther", "Faith", "George", "Hassan", "Irene", "James",
+         "Kevin", "Lucy", "Mary", "Nelson", "Olive", "Peter", "Grace", "Ruth", "Samuel", "Tom"]
+LAST = ["Otieno", "Kimani", "Wanjiru", "Mwangi", "Achieng", "Njoroge", "Kamau", "Omondi", "Mutua",
+        "Chebet", "Smith", "Patel", "Garcia", "Nguyen", "Okafor", "Mensah", "Haddad", "Kowalski"]
+SPECIALIZATIONS = [
+    "General Dermatology", "Acne", "Acne & Rosacea", "Eczema", "Eczema & Dermatitis", "Psoriasis",
+    "Skin Cancer", "Mohs Surgery & Skin Cancer", "Pediatric Dermatology", "Hair Loss & Alopecia",
+    "Vitiligo", "Cosmetic Dermatology", "Infectious Skin Disease (Ringworm, Impetigo)", "Warts & Moles",
+]
+CITIES = ["Nairobi", "Mombasa", "Kisumu", "Nakuru", "Eldoret", "Thika", "Malindi", "Kitale", "Garissa",
+          "Nyeri", "Machakos", "Meru", "Kericho", "Naivasha", "Lamu"]
+QUERIES = [
+    "Can you recommend a dermatologist specializing in eczema?",
+    "I need a dermatologist for acne in Nairobi",
+    "Which dermatologist should I see for a mole check near Mombasa?",
+    "Find Dr. Kamau",
+    "dermatologist for psoriasis in Kisumu",
+    "Who treats vitiligo around Eldoret?",
+    "I need a dermatologist",
+    "skin doctor for hair loss",
+]
+
+
+def seed(rows, seed_value):
+    from assistant.models import Dermatologist
+
+    rng = random.Random(seed_value)
+    Dermatologist.objects.all().delete()
+    batch = []
+    for index in range(rows):
+        batch.append(Dermatologist(
+            name=f"Dr. {rng.choice(FIRST)} {rng.choice(LAST)} {index}",
+            email=f"dr{index}@example.com",
+            specialization=rng.choice(SPECIALIZATIONS),
+            location=rng.choice(CITIES),
+            phone_number=f"+2547{index:08d}",
+        ))
+        if len(batch) == 5000:
+            Dermatologist.objects.bulk_create(batch)
+            batch = []
+    Dermatologist.objects.bulk_create(batch)
+
+
+def legacy_query(query):
+    """query_dermatologists before assistant.dermatologist_search"""
+    from django.db.models import Q
+
+    from assistant.models import Dermatologist
+
+    base_qs = Dermatologist.objects.filter(
+        Q(specialization__icontains="dermatology") |
+        Q(name__icontains="dermatology"))
+    if "specializing in" in query.lower():
+        _, condition = query.lower().split("specializing in", 1)
+        condition = condition.strip()
+        return list(base_qs.filter(
+            Q(specialization__icontains=condition) |
+            Q(name__icontains=condition)
+        )[:5])
+    return list(base_qs[:5])
+
+
+def measure(name, fn, repeats):
+    latencies = []
+    for _ in range(repeats):
+        for query in QUERIES:
+            started = time.perf_counter()
+            fn(query)
+            latencies.append(time.perf_counter() - started)
+    total = sum(latencies)
+    print(
+        f"{name:>10}: {len(latencies) / total:9.1f} queries/s  p50 {percentile(latencies, 0.5) * 1000:8.2f}  "
+        f"p95 {percentile(latencies, 0.95) * 1000:8.2f}  p99 {percentile(latencies, 0.99) * 1000:8.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark dermatologist search")
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--repeats", type=int, default=20, help="Passes over the query set per variant")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import django
+
+    django.setup()
+    from django.core.management import call_command
+    from django.db import connection
+
+    from assistant.dermatologist_search import DermatologistSearch
+
+    call_command("migrate", verbosity=0)
+    started = time.perf_counter()
+    seed(args.rows, args.seed)
+    print(f"Seeded {args.rows} rows into {connection.vendor} in {time.perf_counter() - started:.1f}s")
+
+    database = DermatologistSearch(backend="database")
+    memory = DermatologistSearch(backend="memory", directory_ttl=float("inf"))
+    rss_before = vm_status("VmRSS")
+    started = time.perf_counter()
+    memory.directory()
+    rss_after = vm_status("VmRSS")
+    growth = f", +{rss_after - rss_before:.0f} MB RSS" if rss_before else ""
+    print(f"Loaded the in-memory directory in {time.perf_counter() - started:.2f}s{growth}")
+
+    measure("legacy", legacy_query, args.repeats)
+    measure("database", database.search, args.repeats)
+    measure("memory", memory.search, args.repeats)
+
+    mismatches = [query for query in QUERIES if database.search(query) != memory.search(query)]
+    print(f"Database and memory backends agree on {len(QUERIES) - len(mismatches)}/{len(QUERIES)} queries")
+    for query in mismatches:
+        print(f"  differs: {query!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Local stand-ins for the assistant's external dependencies, for benchmarks.
+
+``install()`` puts them into assistant.model_registry in place of the lazily
+built singletons, so the real views, routing, caches and database code run
+unchanged. Only the network calls and the production model are simulated:
+
+- FakeAzureChatOpenAI: a LangChain chat model with configurable latency
+  (time to first token plus per-token streaming delay) and jitter
+- FakeSearchClient / AsyncFakeSearchClient: the medical-knowledge index
+- a tiny Keras CNN when TensorFlow is installed, otherwise a NumPy classifier
+  with the same ``model(batch, training=False)`` interface
+"""
+import asyncio
+import random
+import time
+
+import numpy as np
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+NUM_CLASSES = 17
+
+ANSWER = (
+    "Based on the information provided, this is most consistent with a common, treatable skin "
+    "condition. Keep the area clean, avoid irritants, and consider an over-the-counter option. "
+    "See a dermatologist if it spreads, becomes painful, or does not improve within two weeks."
+)
+
+
+class FakeAzureChatOpenAI(BaseChatModel):
+    """Chat model that sleeps like a remote completion and returns a canned answer"""
+    latency_ms: float = 400.0
+    jitter_ms: float = 100.0
+    token_delay_ms: float = 5.0
+    response: str = ANSWER
+    seed: int = 0
+
+    @property
+    def _llm_type(self):
+        return "fake-azure-chat-openai"
+
+    def _first_token_delay(self):
+        return max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = self.response.split(" ")
+        time.sleep(self._first_token_delay() + len(tokens) * self.token_delay_ms / 1000)
+        usage = {"prompt_tokens": sum(len(str(m.content)) // 4 for m in messages),
+                 "completion_tokens": len(tokens)}
+        return ChatResult(
+            generations=[ChatGeneration(message=AIMessage(content=self.response))],
+            llm_output={"token_usage": usage},
+        )
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self._first_token_delay())
+        for index, token in enumerate(self.response.split(" ")):
+            if index:
+                time.sleep(self.token_delay_ms / 1000)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=(" " if index else "") + token))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = self.response.split(" ")
+        await asyncio.sleep(self._first_token_delay() + len(tokens) * self.token_delay_ms / 1000)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.response))])
+
+
+def _passages(query, top):
+    return [
+        {"content": f"Clinical guidance passage {i} relevant to: {query}", "source": f"guideline-{i}.md"}
+        for i in range(top)
+    ]
+
+
+class FakeSearchClient:
+    """Duck-typed azure.search.documents.SearchClient"""
+
+    def __init__(self, latency_ms=80.0):
+        self.latency_ms = latency_ms
+
+    def search(self, search_text, top=5, include_total_count=False, **kwargs):
+        time.sleep(self.latency_ms / 1000)
+        return _passages(search_text, top)
+
+
+class _AsyncResults:
+    def __init__(self, items):
+        self._items = items
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for item in self._items:
+            yield item
+
+
+class AsyncFakeSearchClient(FakeSearchClient):
+    """Duck-typed azure.search.documents.aio.SearchClient"""
+
+    async def search(self, search_text, top=5, include_total_count=False, **kwargs):
+        await asyncio.sleep(self.latency_ms / 1000)
+        return _AsyncResults(_passages(search_text, top))
+
+
+class NumpyClassifier:
+    """Keras-compatible stand-in: pooled colour features through a fixed random projection"""
+
+    def __init__(self, latency_ms=0.0, seed=0):
+        rng = np.random.default_rng(seed)
+        self.weights = rng.normal(0, 0.05, (48, NUM_CLASSES)).astype(np.float32)
+        self.latency_ms = latency_ms
+
+    def __call__(self, batch, training=False):
+        batch = np.asarray(batch, dtype=np.float32)
+        pooled = batch.reshape(len(batch), 4, 45, 4, 45, 3).mean(axis=(2, 4)).reshape(len(batch), -1)
+        logits = (pooled / 255.0) @ self.weights
+        # One confidently predicted class per image, so the diagnosis path reaches the LLM
+        logits[np.arange(len(batch)), np.argmax(logits, axis=1)] += 6.0
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return logits
+
+
+def build_tiny_keras_model(seed=0):
+    import tensorflow as tf
+
+    tf.random.set_seed(seed)
+    model = tf.keras.Sequential([
+        tf.keras.layers.Input((180, 180, 3)),
+        tf.keras.layers.Rescaling(1.0 / 255),
+        tf.keras.layers.Conv2D(8, 3, strides=2, activation="relu"),
+        tf.keras.layers.MaxPooling2D(),
+        tf.keras.layers.Conv2D(16, 3, strides=2, activation="relu"),
+        tf.keras.layers.GlobalAveragePooling2D(),
+        tf.keras.layers.Dense(NUM_CLASSES),
+    ])
+    dense = model.layers[-1]
+    kernel, bias = dense.get_weights()
+    bias[0] += 6.0  # confident predictions, as with NumpyClassifier
+    dense.set_weights([kernel, bias])
+    return model
+
+
+def build_classifier(kind="auto", latency_ms=0.0, seed=0):
+    if kind in ("auto", "keras"):
+        try:
+            return build_tiny_keras_model(seed), "keras"
+        except ImportError:
+            if kind == "keras":
+                raise
+    return NumpyClassifier(latency_ms=latency_ms, seed=seed), "numpy"
+
+
+def install(llm_latency_ms=400.0, llm_jitter_ms=100.0, token_delay_ms=5.0, search_latency_ms=80.0,
+            classifier="auto", classifier_latency_ms=0.0, seed=0):
+    """Replace the model registry singletons with fakes; returns the classifier kind in use"""
+    from assistant import model_registry
+    from assistant.retrieval import CoalescingCache, MedicalKnowledgeRetriever
+    from assistant.retrieval_backends import AzureSearchBackend
+
+    random.seed(seed)
+    llm = FakeAzureChatOpenAI(
+        latency_ms=llm_latency_ms, jitter_ms=llm_jitter_ms, token_delay_ms=token_delay_ms, seed=seed
+    )
+    search_client = FakeSearchClient(search_latency_ms)
+    async_search_client = AsyncFakeSearchClient(search_latency_ms)
+    model, kind = build_classifier(classifier, classifier_latency_ms, seed)
+
+    from django.conf import settings
+
+    model_registry._instances.update({
+        "llm": llm,
+        "search_client": search_client,
+        "async_search_client": async_search_client,
+        "classifier": model,
+        "medical_retriever": MedicalKnowledgeRetriever(
+            AzureSearchBackend(lambda: search_client, lambda: async_search_client),
+            cache=CoalescingCache(
+                maxsize=settings.RETRIEVAL_CACHE_SIZE,
+                ttl=settings.RETRIEVAL_CACHE_TTL,
+                negative_ttl=settings.RETRIEVAL_NEGATIVE_TTL,
+            ),
+        ),
+    })
+    return kind
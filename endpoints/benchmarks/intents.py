@@ -0,0 +1,137 @@
+"""
+Throughput of message classification: the original per-list substring scans
+against the compiled assistant.intents engine.
+
+Run from the endpoints directory:
+    python -m benchmarks.intents --messages 200000
+
+The corpus is seeded and mixes short questions with long, rambling messages.
+Besides messages per second, the routing decisions of both implementations
+are compared; they differ where the substring scan matched inside other words
+("red" in "bored", "code" in "barcode").
+"""
+import argparse
+import os
+import random
+import time
+from collections import Counter
+
+from assistant.intents import IntentEngine
+
+RULES_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assistant", "intent_rules.json")
+
+OPENINGS = [
+    "What treatment is best for", "Can you recommend a dermatologist for", "How do I prevent",
+    "I have a rash and", "Is this serious:", "Tell me a joke about", "My barcode scanner shows",
+    "I'm bored and", "Which medicine helps with", "Hello, I noticed", "Thank you! Also",
+    "Write code to", "Where can I buy", "My credit card", "Is it normal to have",
+]
+TOPICS = [
+    "acne", "eczema on my hands", "psoriasis flare ups", "itchy red bumps", "dry skin in winter",
+    "a mole that changed colour", "warts", "hives after eating", "the weather tomorrow",
+    "football scores", "sunburn blisters", "scars from pimples", "a fungal infection", "my taxes",
+]
+FILLER = (
+    "it started about two weeks ago and I have tried a few things at home but nothing really seems "
+    "to work and I am getting worried because it keeps coming back after a couple of days"
+).split()
+
+
+def legacy_classify(message, is_followup=False):
+    """The routing in MedicalAssistantAPI before assistant.intents"""
+    healthcare_keywords = [
+        'skin', 'rash', 'acne', 'treatment', 'medicine', 'doctor',
+        'dermatologist', 'itch', 'itchy', 'red', 'bump', 'pimple',
+        'eczema', 'psoriasis', 'melanoma', 'hives', 'allergy',
+        'infection', 'diagnose', 'symptom', 'pain', 'swelling',
+        'prescription', 'medical', 'health', 'disease', 'condition',
+        'cure', 'relief', 'ointment', 'cream', 'antibiotic', 'fungal',
+        'virus', 'bacteria', 'allergic', 'reaction', 'scar', 'mark',
+        'spot', 'patch', 'dry', 'oily', 'sensitive', 'burn', 'sting',
+        'peel', 'blister', 'wart', 'mole', 'freckle', 'patch', 'hello', 'hey',
+        'thank you'
+    ]
+    message_lower = message.lower()
+    if any(phrase in message_lower for phrase in ['joke', 'code']):
+        healthcare = False
+    else:
+        healthcare = any(keyword in message_lower for keyword in healthcare_keywords)
+
+    message_lower = message.lower()
+    if not healthcare:
+        mode = "off_topic"
+    elif is_followup:
+        mode = "general_chat"
+    elif any(keyword in message_lower for keyword in ["treatment", "medicine", "remedy"]):
+        mode = "medical_search"
+    elif any(keyword in message_lower for keyword in ["dermatologist", "doctor", "specialist", "recommend a doctor"]):
+        mode = "dermatologist_query"
+    else:
+        mode = "general_chat"
+
+    message_lower = message.lower()
+    actions = []
+    if any(word in message_lower for word in ["treatment", "medicine"]):
+        actions.append("alternative_treatments")
+    if "serious" in message_lower:
+        actions.append("emergency_contact")
+    if any(word in message_lower for word in ["prevent", "avoid"]):
+        actions.append("prevention_tips")
+    return mode, actions or ["learn_more", "ask_specialist", "related_conditions"]
+
+
+def build_corpus(count, seed):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        message = f"{rng.choice(OPENINGS)} {rng.choice(TOPICS)}?"
+        if rng.random() < 0.3:
+            message += " " + " ".join(rng.choices(FILLER, k=rng.randint(10, 60)))
+        corpus.append(message)
+    return corpus
+
+
+def measure(fn, corpus):
+    started = time.perf_counter()
+    results = [fn(message) for message in corpus]
+    return results, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark message intent classification")
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rules", default=RULES_PATH)
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.messages, args.seed)
+    average = sum(len(message) for message in corpus) / len(corpus)
+    print(f"{len(corpus)} messages, {average:.0f} characters on average")
+
+    started = time.perf_counter()
+    engine = IntentEngine.from_file(args.rules)
+    print(f"Compiled rules in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    legacy, legacy_seconds = measure(legacy_classify, corpus)
+
+    def compiled(message):
+        intent = engine.classify(message)
+        return intent.mode, intent.actions
+
+    current, compiled_seconds = measure(compiled, corpus)
+    for name, seconds in (("substring", legacy_seconds), ("compiled", compiled_seconds)):
+        print(f"{name:>10}: {len(corpus) / seconds:12,.0f} messages/s  ({seconds / len(corpus) * 1e6:.2f} us/message)")
+    print(f"speed-up: {legacy_seconds / compiled_seconds:.1f}x")
+
+    changed = Counter(
+        (before[0], after[0]) for before, after in zip(legacy, current) if before[0] != after[0]
+    )
+    same = sum(1 for before, after in zip(legacy, current) if before[0] == after[0])
+    print(f"Same routing for {same / len(corpus):.1%} of messages; changes (substring -> compiled):")
+    for (before, after), count in changed.most_common():
+        example = next(m for m, b, a in zip(corpus, legacy, current) if (b[0], a[0]) == (before, after))
+        print(f"  {before:>20} -> {after:<20} {count:8d}  e.g. {example[:70]!r}")
+
+
+if __name__ == "__main__":
+    main()
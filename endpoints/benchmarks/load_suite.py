@@ -0,0 +1,362 @@
+"""
+Reproducible load suite for /api/medical-assistant/, with no Azure services.
+
+The real views, routing, caches, database and thread pools run in-process;
+the chat model, search index and classifier are swapped for the local fakes
+in benchmarks.fakes (configurable latency, seeded). Each scenario runs in its
+own subprocess against a fresh SQLite database, so memory numbers and cache
+state do not leak between scenarios.
+
+Run from the endpoints directory:
+    python -m benchmarks.load_suite
+    python -m benchmarks.load_suite --requests 400 --concurrency 16 --llm-latency-ms 800
+    python -m benchmarks.load_suite --compare benchmarks/results/<earlier run>.json
+
+Results (throughput, p50/p95/p99, errors, peak RSS per scenario, plus git
+revision and parameters) are written to benchmarks/results/ so runs can be
+compared across commits.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+SCENARIOS = ["image_diagnosis", "treatment_question", "dermatologist_lookup", "off_topic", "mixed"]
+
+# Share of each request type in the "mixed" scenario
+MIX = {"image_diagnosis": 0.35, "treatment_question": 0.35, "dermatologist_lookup": 0.15, "off_topic": 0.15}
+
+TREATMENT_QUESTIONS = [
+    "What treatment is best for acne?",
+    "How do I prevent psoriasis flare ups?",
+    "Is hydrocortisone cream safe for eczema on the face?",
+    "What are the side effects of isotretinoin?",
+    "How long does ringworm take to clear with treatment?",
+    "My skin is red and itchy after using a new cream, what should I do?",
+]
+DERMATOLOGIST_QUESTIONS = [
+    "Can you recommend a dermatologist specializing in eczema?",
+    "I need a dermatologist for acne",
+    "Find me a skin doctor who treats psoriasis",
+    "Which dermatologist should I see for a mole check?",
+]
+OFF_TOPIC = [
+    "What's the weather like today?",
+    "Tell me a joke",
+    "Who won the football match yesterday?",
+    "Hello",
+]
+SPECIALIZATIONS = ["Acne", "Eczema", "Psoriasis", "Skin Cancer", "Pediatric Dermatology", "General Dermatology"]
+CITIES = ["Nairobi", "Mombasa", "Kisumu", "Nakuru", "Eldoret"]
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def vm_status(field):
+    """VmRSS / VmHWM from /proc/self/status in MB (Linux); None elsewhere"""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+# Worker side: runs inside the scenario subprocess
+
+def make_jpeg(rng, size=(640, 480)):
+    """A distinct image per request, so content hashing does not turn the run into cache hits"""
+    import io
+
+    import numpy as np
+    from PIL import Image
+
+    base = rng.integers(0, 256, 3)
+    noise = rng.integers(-20, 21, (size[1] // 8, size[0] // 8, 3))
+    pixels = np.clip(base + noise, 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).resize(size).save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def build_workload(scenario, count, seed):
+    import numpy as np
+
+    rng = random.Random(seed)
+    image_rng = np.random.default_rng(seed)
+    kinds = (
+        rng.choices(list(MIX), weights=list(MIX.values()), k=count)
+        if scenario == "mixed" else [scenario] * count
+    )
+    workload = []
+    for kind in kinds:
+        if kind == "image_diagnosis":
+            workload.append((kind, {"message": "I have this rash on my arm"}, make_jpeg(image_rng)))
+        elif kind == "treatment_question":
+            workload.append((kind, {"message": rng.choice(TREATMENT_QUESTIONS)}, None))
+        elif kind == "dermatologist_lookup":
+            workload.append((kind, {"message": rng.choice(DERMATOLOGIST_QUESTIONS)}, None))
+        else:
+            workload.append((kind, {"message": rng.choice(OFF_TOPIC)}, None))
+    return workload
+
+
+def send(client, payload, image):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    if image is None:
+        return client.post("/api/medical-assistant/", payload, content_type="application/json")
+    data = dict(payload, image=SimpleUploadedFile("lesion.jpg", image, content_type="image/jpeg"))
+    return client.post("/api/medical-assistant/", data)
+
+
+def seed_database(rows, seed):
+    from assistant.models import Dermatologist
+
+    rng = random.Random(seed)
+    Dermatologist.objects.bulk_create(
+        Dermatologist(
+            name=f"Dr. Bench {index}",
+            email=f"dr{index}@example.com",
+            specialization=rng.choice(SPECIALIZATIONS),
+            location=rng.choice(CITIES),
+            phone_number=f"555-{index:07d}",
+        )
+        for index in range(rows)
+    )
+
+
+def run_worker(args):
+    import django
+
+    django.setup()
+    from django.core.management import call_command
+    from django.db import close_old_connections
+    from django.test import Client
+
+    from benchmarks import fakes
+
+    call_command("migrate", verbosity=0)
+    seed_database(args.dermatologists, args.seed)
+    classifier = fakes.install(
+        llm_latency_ms=args.llm_latency_ms,
+        llm_jitter_ms=args.llm_jitter_ms,
+        token_delay_ms=args.token_delay_ms,
+        search_latency_ms=args.search_latency_ms,
+        classifier=args.classifier,
+        seed=args.seed,
+    )
+
+    warmup = build_workload(args.scenario, args.warmup, args.seed + 1)
+    workload = build_workload(args.scenario, args.requests, args.seed)
+    client = Client()
+    for _, payload, image in warmup:
+        send(client, payload, image)
+
+    rss_before = vm_status("VmRSS")
+    latencies = {}
+    errors = {}
+    lock = threading.Lock()
+    cursor = iter(range(len(workload)))
+
+    def drive():
+        thread_client = Client()
+        while True:
+            with lock:
+                index = next(cursor, None)
+            if index is None:
+                break
+            kind, payload, image = workload[index]
+            started = time.perf_counter()
+            try:
+                ok = send(thread_client, payload, image).status_code < 400
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                if ok:
+                    latencies.setdefault(kind, []).append(elapsed)
+                else:
+                    errors[kind] = errors.get(kind, 0) + 1
+        close_old_connections()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=drive) for _ in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    samples = [value for values in latencies.values() for value in values]
+    result = summarize(samples, sum(errors.values()), elapsed)
+    result["by_kind"] = {
+        kind: summarize(latencies.get(kind, []), errors.get(kind, 0), elapsed)
+        for kind in sorted(set(latencies) | set(errors))
+    } if args.scenario == "mixed" else {}
+    result["classifier"] = classifier
+    result["peak_rss_mb"] = vm_status("VmHWM")
+    result["rss_growth_mb"] = (vm_status("VmRSS") or 0) - (rss_before or 0) if rss_before else None
+    print(json.dumps(result))
+
+
+def summarize(samples, errors, elapsed):
+    return {
+        "requests": len(samples) + errors,
+        "errors": errors,
+        "throughput_rps": len(samples) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(samples, 0.50) * 1000 if samples else None,
+        "p95_ms": percentile(samples, 0.95) * 1000 if samples else None,
+        "p99_ms": percentile(samples, 0.99) * 1000 if samples else None,
+    }
+
+
+# Driver side
+
+def run_scenario(scenario, args, passthrough):
+    workdir = tempfile.mkdtemp(prefix=f"bench-{scenario}-")
+    env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE="benchmarks.settings",
+        BENCH_DB_PATH=os.path.join(workdir, "db.sqlite3"),
+        BENCH_MEDIA_ROOT=os.path.join(workdir, "media"),
+        # Deferred jobs are not part of the request path being measured
+        TASK_WORKER_THREADS="0",
+        DIAGNOSIS_DEFERRED_DEFAULT="False",
+        INFERENCE_SERVER_SOCKET="",
+        CLASSIFIER_BACKEND="keras",
+    )
+    if args.no_caches:
+        env.update(RESPONSE_CACHE_ENABLED="False", PREDICTION_CACHE_TTL="0", RETRIEVAL_CACHE_TTL="0")
+    env["CLASSIFIER_TTA_DEFAULT"] = str(bool(args.tta))
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.load_suite", "--worker", scenario] + passthrough,
+        capture_output=True, text=True, env=env,
+    )
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines() or ["no output"]
+        return {"failed": lines[-1]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def git_revision():
+    def git(*command):
+        try:
+            return subprocess.run(["git", *command], capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    return {"sha": git("rev-parse", "HEAD"), "dirty": bool(git("status", "--porcelain", "--untracked-files=no"))}
+
+
+def format_row(name, stats):
+    if "failed" in stats:
+        return f"{name:>32}: failed ({stats['failed']})"
+    if stats["p50_ms"] is None:
+        return f"{name:>32}: no successful requests ({stats['errors']} errors)"
+    line = (
+        f"{name:>32}: {stats['throughput_rps']:7.1f} req/s  p50 {stats['p50_ms']:7.1f}  "
+        f"p95 {stats['p95_ms']:7.1f}  p99 {stats['p99_ms']:7.1f} ms  errors {stats['errors']}"
+    )
+    if stats.get("peak_rss_mb") is not None:
+        line += f"  peak RSS {stats['peak_rss_mb']:.0f} MB (+{stats['rss_growth_mb']:.1f} MB during run)"
+    return line
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as handle:
+        baseline = json.load(handle)
+    print(f"\nvs {baseline_path} ({(baseline['git']['sha'] or 'unknown')[:10]}):")
+    for name, stats in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if not before or "failed" in stats or "failed" in before or stats["p50_ms"] is None or before["p50_ms"] is None:
+            print(f"{name:>32}: not comparable")
+            continue
+        deltas = []
+        for key in ("throughput_rps", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb"):
+            if stats.get(key) is not None and before.get(key):
+                deltas.append(f"{key} {(stats[key] - before[key]) / before[key] * 100:+.1f}%")
+        print(f"{name:>32}: " + "  ".join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load suite for the medical assistant endpoint with local fakes")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--llm-latency-ms", type=float, default=400.0, help="Time to first token of the fake LLM")
+    parser.add_argument("--llm-jitter-ms", type=float, default=100.0)
+    parser.add_argument("--token-delay-ms", type=float, default=5.0)
+    parser.add_argument("--search-latency-ms", type=float, default=80.0)
+    parser.add_argument("--classifier", choices=["auto", "keras", "numpy"], default="auto",
+                        help="Tiny Keras model when TensorFlow is installed (auto), or the NumPy stand-in")
+    parser.add_argument("--dermatologists", type=int, default=200, help="Dermatologist rows to seed")
+    parser.add_argument("--no-caches", action="store_true", help="Disable the response, prediction and retrieval caches")
+    parser.add_argument("--tta", action="store_true", help="Classify images with test-time augmentation")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<timestamp>_<sha>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="Earlier result file to diff against")
+    parser.add_argument("--worker", choices=SCENARIOS, dest="scenario", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        run_worker(args)
+        return
+
+    passthrough = [
+        "--requests", str(args.requests), "--concurrency", str(args.concurrency), "--warmup", str(args.warmup),
+        "--seed", str(args.seed), "--llm-latency-ms", str(args.llm_latency_ms),
+        "--llm-jitter-ms", str(args.llm_jitter_ms), "--token-delay-ms", str(args.token_delay_ms),
+        "--search-latency-ms", str(args.search_latency_ms), "--classifier", args.classifier,
+        "--dermatologists", str(args.dermatologists),
+    ]
+    run = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("scenario", "output", "compare")},
+        "scenarios": {},
+    }
+    print(
+        f"{args.requests} requests per scenario at concurrency {args.concurrency}; "
+        f"fake LLM {args.llm_latency_ms:.0f}±{args.llm_jitter_ms:.0f} ms, search {args.search_latency_ms:.0f} ms"
+    )
+    for scenario in args.scenarios:
+        stats = run_scenario(scenario, args, passthrough)
+        run["scenarios"][scenario] = stats
+        print(format_row(scenario, stats))
+        for kind, kind_stats in stats.get("by_kind", {}).items():
+            print(format_row(f"{scenario}/{kind}", kind_stats))
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        output = os.path.join(RESULTS_DIR, f"{stamp}_{(run['git']['sha'] or 'nogit')[:10]}.json")
+    with open(output, "w") as handle:
+        json.dump(run, handle, indent=2)
+    print(f"\nWrote {output}")
+
+    if args.compare:
+        compare(run, args.compare)
+
+
+if __name__ == "__main__":
+    main()
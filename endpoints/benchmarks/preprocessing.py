@@ -0,0 +1,116 @@
+"""
+Per-image preprocessing time and peak memory for large phone photos.
+
+Compares the previous predict_disease preprocessing (full-resolution PIL
+decode, RGB convert, resize, array conversion) with
+assistant.preprocessing.load_image (JPEG draft-mode decode into a
+preallocated float32 buffer), plus batched preprocess_batch throughput.
+Each variant runs in a fresh interpreter so peak RSS is not shared.
+
+Usage (from the endpoints directory):
+    python -m benchmarks.preprocessing --megapixels 12 --images 20
+"""
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import numpy as np
+from PIL import Image
+
+SNIPPET = """
+import io, json, sys, time
+import numpy as np
+from PIL import Image
+sys.path.insert(0, ".")
+from assistant.preprocessing import allocate_batch, load_image, preprocess_batch
+
+count, variant = {count}, {variant!r}
+with open({path!r}, "rb") as handle:
+    payload = handle.read()
+
+def legacy(data):
+    image = Image.open(io.BytesIO(data)).convert("RGB")
+    image = image.resize((180, 180))
+    return np.asarray(image, dtype=np.float32)
+
+def high_water_kb():
+    # VmHWM is per address space, so unlike ru_maxrss it is not inherited from the parent
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+
+baseline_kb = high_water_kb()
+started = time.perf_counter()
+if variant == "legacy":
+    for _ in range(count):
+        legacy(payload)
+elif variant == "draft":
+    out = allocate_batch(1)[0]
+    for _ in range(count):
+        load_image(io.BytesIO(payload), out=out)
+else:
+    batch, errors = preprocess_batch([io.BytesIO(payload) for _ in range(count)])
+elapsed = time.perf_counter() - started
+peak_kb = high_water_kb()
+print(json.dumps({{
+    "per_image_ms": elapsed / count * 1000,
+    "peak_rss_mb": peak_kb / 1024,
+    "peak_over_baseline_mb": (peak_kb - baseline_kb) / 1024,
+}}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark image preprocessing for predict_disease")
+    parser.add_argument("--megapixels", type=float, default=12.0)
+    parser.add_argument("--images", type=int, default=20)
+    args = parser.parse_args()
+
+    width = int((args.megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    path = write_sample_jpeg(width, height)
+    print(f"{width}x{height} JPEG ({os.path.getsize(path) / 1024:.0f} KB), {args.images} images per variant")
+    try:
+        for variant in ("legacy", "draft", "batched"):
+            run_variant(variant, path, args.images)
+    finally:
+        os.remove(path)
+
+
+def write_sample_jpeg(width, height):
+    """Smooth gradient plus noise, so it compresses like a photo rather than pure noise"""
+    rng = np.random.default_rng(0)
+    row = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    pixels = np.empty((height, width, 3), dtype=np.uint8)
+    for start in range(0, height, 500):
+        stop = min(height, start + 500)
+        noise = rng.normal(0, 12, (stop - start, width, 3)).astype(np.float32)
+        pixels[start:stop] = (row + noise).clip(0, 255)
+    handle, path = tempfile.mkstemp(suffix=".jpg")
+    with os.fdopen(handle, "wb") as output:
+        Image.fromarray(pixels).save(output, format="JPEG", quality=90)
+    return path
+
+
+def run_variant(variant, path, count):
+    result = subprocess.run(
+        [sys.executable, "-c", SNIPPET.format(path=path, count=count, variant=variant)],
+        capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        print(f"{variant:>8}: failed ({result.stderr.strip().splitlines()[-1]})")
+        return
+    stats = json.loads(result.stdout.strip().splitlines()[-1])
+    print(
+        f"{variant:>8}: {stats['per_image_ms']:7.2f} ms/image  "
+        f"peak RSS {stats['peak_rss_mb']:7.1f} MB (+{stats['peak_over_baseline_mb']:.1f} MB over baseline)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+"""Django settings for the benchmarks that run Django: a throwaway SQLite database and media directory"""
+import os
+
+from api.settings import *  # noqa: F401,F403
+
+DEBUG = False
+ALLOWED_HOSTS = ["testserver", "localhost", "127.0.0.1"]
+
+# BENCH_USE_PROJECT_DB=True keeps the project's PostgreSQL database (e.g. to measure its indexes)
+if os.environ.get("BENCH_USE_PROJECT_DB", "False") != "True":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": os.environ.get("BENCH_DB_PATH", "/tmp/dermatology-bench.sqlite3"),
+            # Concurrent writers queue on SQLite's lock instead of failing immediately
+            "OPTIONS": {"timeout": 60},
+        }
+    }
+MEDIA_ROOT = os.environ.get("BENCH_MEDIA_ROOT", "/tmp/dermatology-bench-media")
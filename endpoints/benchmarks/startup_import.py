@@ -0,0 +1,78 @@
+"""
+Cold-import benchmark for the assistant.
+
+Each scenario runs in a fresh interpreter so module caches do not leak between
+runs. "eager" reproduces the old behaviour of assistant/views.py, which loaded
+the Keras model and built the LLM client at import time; "lazy" is the
+current import path used by manage.py, migrations, the admin and worker boot.
+
+Usage (from the endpoints directory):
+    python -m benchmarks.startup_import --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ENDPOINTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIO_SNIPPET = """
+import os, sys, time, json
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api.settings')
+started = time.perf_counter()
+import django
+django.setup()
+import api.urls
+from assistant import model_registry
+if {eager!r}:
+    model_registry.get_classifier()
+    model_registry.get_llm()
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    "seconds": elapsed,
+    "tensorflow_imported": "tensorflow" in sys.modules,
+}}))
+"""
+
+SCENARIOS = {
+    "lazy": False,
+    "eager": True,
+}
+
+
+def run_scenario(eager):
+    result = subprocess.run(
+        [sys.executable, "-c", SCENARIO_SNIPPET.format(eager=eager)],
+        cwd=ENDPOINTS_DIR,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), action="append")
+    args = parser.parse_args()
+
+    for name in args.scenario or ["lazy", "eager"]:
+        try:
+            samples = [run_scenario(SCENARIOS[name]) for _ in range(args.runs)]
+        except RuntimeError as e:
+            print(f"{name:>6}: failed ({e})")
+            continue
+        seconds = [sample["seconds"] for sample in samples]
+        print(
+            f"{name:>6}: median {statistics.median(seconds):.3f}s "
+            f"min {min(seconds):.3f}s max {max(seconds):.3f}s "
+            f"tensorflow imported: {samples[-1]['tensorflow_imported']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
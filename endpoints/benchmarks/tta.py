@@ -0,0 +1,132 @@
+"""
+Latency of classifier inference with and without test-time augmentation.
+
+Each setting runs the code predict_disease and the batch API use: uploads are
+decoded and resized (preprocessing.preprocess_batch), TTA views are built by
+preprocessing.augment_views and model_registry.predict_views classifies them
+in one forward pass. "sequential" runs one forward pass per view instead, the
+cost TTA would have without batching the views. Temperature scaling is
+timed too; it is one division per logit row.
+
+Through predict_disease the views go to the micro-batcher as one item per
+image. It batches items by shape, so when TTA and plain requests wait in the
+same micro-batch they run as two forward passes, not one; this script times
+each setting on its own and does not include that extra pass.
+
+Run from the endpoints directory:
+    python -m benchmarks.tta
+    python -m benchmarks.tta --batch-sizes 1,8,32 --views flip_lr,flip_ud,crop --runs 200
+
+The classifier is the local fake from benchmarks.fakes (a tiny Keras model
+when TensorFlow is installed, else numpy). For the end-to-end cost through the
+API, run the load suite with and without --tta:
+    python -m benchmarks.load_suite --scenarios image_diagnosis --tta
+"""
+import argparse
+import io
+import os
+import time
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "benchmarks.settings")
+
+from benchmarks.load_suite import percentile  # noqa: E402
+
+
+def uploads(count, seed):
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    encoded = []
+    for _ in range(count):
+        pixels = rng.integers(0, 256, (480, 640, 3), dtype=np.uint8)
+        buffer = io.BytesIO()
+        Image.fromarray(pixels).save(buffer, format="JPEG", quality=90)
+        encoded.append(buffer.getvalue())
+    return encoded
+
+
+def settings_under_test(version, views):
+    import numpy as np
+
+    from assistant.model_registry import predict_views
+    from assistant.preprocessing import augment_views
+
+    def plain(images):
+        return predict_views(images, version)
+
+    def batched(images):
+        return predict_views(augment_views(images, views), version)
+
+    def sequential(images):
+        augmented = augment_views(images, views)
+        return np.mean([predict_views(augmented[:, view], version) for view in range(augmented.shape[1])], axis=0)
+
+    return [("no TTA", plain), (f"TTA x{len(views) + 1} batched", batched),
+            (f"TTA x{len(views) + 1} sequential", sequential)]
+
+
+def measure(function, images, runs):
+    function(images)
+    latencies = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function(images)
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark classifier latency with and without TTA")
+    parser.add_argument("--batch-sizes", default="1,8,32", help="Comma-separated images per call")
+    parser.add_argument("--views", default="flip_lr,flip_ud,crop",
+                        help="Comma-separated augmented views (see preprocessing.TTA_VIEWS)")
+    parser.add_argument("--runs", type=int, default=50, help="Timed calls per setting")
+    parser.add_argument("--classifier", choices=["auto", "keras", "numpy"], default="auto")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    import django
+
+    django.setup()
+
+    import numpy as np
+
+    from assistant.calibration import fit_temperature, softmax
+    from assistant.classifier_versions import ModelVersion
+    from assistant.preprocessing import IMAGE_SIZE, TTA_VIEWS, preprocess_batch
+    from benchmarks.fakes import NUM_CLASSES, build_classifier
+
+    views = [view for view in args.views.split(",") if view]
+    unknown = set(views) - set(TTA_VIEWS)
+    if unknown:
+        parser.error(f"Unknown views {sorted(unknown)}; choose from {list(TTA_VIEWS)}")
+    model, kind = build_classifier(args.classifier, seed=args.seed)
+    version = ModelVersion("bench", [f"class {i}" for i in range(NUM_CLASSES)], IMAGE_SIZE, lambda: model)
+    version.warm_up()
+
+    batch_sizes = [int(size) for size in args.batch_sizes.split(",")]
+    encoded = uploads(max(batch_sizes), args.seed)
+    print(f"{kind} classifier, views {views}, {args.runs} runs per setting")
+    print(f"{'batch':>5}  {'setting':<24} {'decode p50':>10} {'p50 ms':>8} {'p95 ms':>8} {'ms/image':>9}")
+    for size in batch_sizes:
+        decode_ms = percentile(measure(
+            lambda files: preprocess_batch([io.BytesIO(data) for data in files])[0], encoded[:size], args.runs
+        ), 0.5)
+        images, _ = preprocess_batch([io.BytesIO(data) for data in encoded[:size]])
+        for label, function in settings_under_test(version, views):
+            latencies = measure(function, images, args.runs)
+            p50 = percentile(latencies, 0.5)
+            print(f"{size:>5}  {label:<24} {decode_ms:>10.2f} {p50:>8.2f} "
+                  f"{percentile(latencies, 0.95):>8.2f} {p50 / size:>9.2f}")
+
+    # Temperature scaling on the last batch; the labels are the model's own, only the timing matters
+    logits = version.predict_logits(images)
+    labels = np.argmax(logits, axis=1)
+    temperature = fit_temperature(logits, labels)
+    latencies = measure(lambda rows: softmax(rows, temperature), logits, args.runs)
+    print(f"temperature scaling ({len(logits)} rows, T={temperature:.3f}): p50 {percentile(latencies, 0.5):.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,13 @@
+"""
+Training pipeline for the skin disease classifier (replaces skin_disease.ipynb).
+
+Runs without Django, so it can be used on a training machine with only the
+dataset and TensorFlow:
+
+    python -m training --train-dir data/train --val-dir data/validation \
+        --epochs 30 --cache memory --output-dir model/versions
+
+Each run writes a versioned directory with the .keras model, labels.json
+(the class names in output order, i.e. data_cat) and metadata.json (metrics,
+per-epoch images/sec, parameters). See ``python -m training --help``.
+"""
@@ -0,0 +1,31 @@
+import time
+
+
+def throughput_callback(num_images):
+    """Keras callback printing training images/sec per epoch and adding ``images_per_sec`` to the logs"""
+    import tensorflow as tf
+
+    class Throughput(tf.keras.callbacks.Callback):
+        def __init__(self):
+            super().__init__()
+            self.epochs = []
+
+        def on_epoch_begin(self, epoch, logs=None):
+            self.started = time.perf_counter()
+
+        def on_test_begin(self, logs=None):
+            # Validation runs inside the epoch; keep it out of the training rate
+            self.test_started = time.perf_counter()
+
+        def on_test_end(self, logs=None):
+            self.started += time.perf_counter() - self.test_started
+
+        def on_epoch_end(self, epoch, logs=None):
+            seconds = time.perf_counter() - self.started
+            rate = num_images / seconds if seconds else 0.0
+            self.epochs.append({"epoch": epoch + 1, "seconds": round(seconds, 2), "images_per_sec": round(rate, 1)})
+            if logs is not None:
+                logs["images_per_sec"] = rate
+            print(f"Epoch {epoch + 1}: {rate:.1f} images/sec ({num_images} images in {seconds:.1f}s)")
+
+    return Throughput()
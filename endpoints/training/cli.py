@@ -0,0 +1,144 @@
+import argparse
+import json
+import os
+import platform
+import time
+from datetime import datetime, timezone
+
+from .callbacks import throughput_callback
+from .data import build_dataset, list_images
+from .model import build_model, resolve_precision, set_precision, to_float32
+
+DEFAULT_OUTPUT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model", "versions")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m training", description="Train the skin disease classifier")
+    parser.add_argument("--train-dir", required=True, help="One folder of images per class")
+    parser.add_argument("--val-dir", required=True, help="Same class folders as --train-dir")
+    parser.add_argument("--test-dir", help="Optional held-out set evaluated with the best weights")
+    parser.add_argument("--output-dir", default=DEFAULT_OUTPUT_DIR, help="Versioned run directories go here")
+    parser.add_argument("--version", help="Run name (default: UTC timestamp)")
+    parser.add_argument("--model-name", default="Skin_Disease_Classification.keras")
+    parser.add_argument("--image-size", type=int, default=180)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--epochs", type=int, default=30, help="Upper bound; early stopping usually ends sooner")
+    parser.add_argument("--patience", type=int, default=5, help="Epochs without val_loss improvement before stopping")
+    parser.add_argument("--learning-rate", type=float, default=1e-3)
+    parser.add_argument("--cache", choices=["memory", "disk", "none"], default="memory",
+                        help="Keep decoded images after the first epoch; use disk when they do not fit in RAM")
+    parser.add_argument("--cache-dir", help="For --cache disk (default: <output-dir>/.cache)")
+    parser.add_argument("--shuffle-buffer", type=int, default=2048)
+    parser.add_argument("--no-augment", action="store_true")
+    parser.add_argument("--precision", choices=["auto", "float32", "mixed_bfloat16", "mixed_float16"], default="auto")
+    parser.add_argument("--seed", type=int, default=1337)
+    parser.add_argument("--manifest", help="Manifest from python -m training.dataset_check; unusable files are skipped")
+    return parser.parse_args(argv)
+
+
+def _without(paths, labels, skip):
+    kept = [(path, label) for path, label in zip(paths, labels) if os.path.abspath(path) not in skip]
+    return [path for path, _ in kept], [label for _, label in kept]
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.precision in ("auto", "mixed_bfloat16"):
+        # bf16 kernels come from oneDNN, which some TensorFlow builds leave off; TensorFlow reads
+        # this when it is first imported, so it has to be set before the import below
+        os.environ.setdefault("TF_ENABLE_ONEDNN_OPTS", "1")
+    import tensorflow as tf
+
+    tf.keras.utils.set_random_seed(args.seed)
+    version = args.version or datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    run_dir = os.path.join(args.output_dir, version)
+    if os.path.exists(os.path.join(run_dir, args.model_name)):
+        raise SystemExit(f"{run_dir} already holds a trained model; pick another --version")
+    os.makedirs(run_dir, exist_ok=True)
+    image_size = (args.image_size, args.image_size)
+
+    train_paths, train_labels, class_names = list_images(args.train_dir)
+    val_paths, val_labels, _ = list_images(args.val_dir, class_names)
+    if args.manifest:
+        from .dataset_check import unusable_paths
+
+        skip = unusable_paths(args.manifest)
+        train_paths, train_labels = _without(train_paths, train_labels, skip)
+        val_paths, val_labels = _without(val_paths, val_labels, skip)
+    print(f"{len(train_paths)} training and {len(val_paths)} validation images in {len(class_names)} classes")
+
+    cache_dir = args.cache_dir or os.path.join(args.output_dir, ".cache")
+    common = dict(image_size=image_size, batch_size=args.batch_size, cache=args.cache, cache_dir=cache_dir,
+                  seed=args.seed)
+    train = build_dataset(train_paths, train_labels, training=True, cache_name="train",
+                          shuffle_buffer=args.shuffle_buffer, augment=not args.no_augment, **common)
+    val = build_dataset(val_paths, val_labels, cache_name="validation", **common)
+
+    precision = resolve_precision(args.precision)
+    set_precision(precision)
+    print(f"Precision policy: {precision}")
+
+    model = build_model(len(class_names), image_size)
+    model.compile(
+        optimizer=tf.keras.optimizers.Adam(args.learning_rate),
+        loss=tf.keras.losses.SparseCategoricalCrossentropy(from_logits=True),
+        metrics=["accuracy"],
+    )
+    throughput = throughput_callback(len(train_paths))
+    callbacks = [
+        throughput,
+        tf.keras.callbacks.EarlyStopping(monitor="val_loss", patience=args.patience, restore_best_weights=True),
+        tf.keras.callbacks.ModelCheckpoint(os.path.join(run_dir, "checkpoints", "best.keras"),
+                                           monitor="val_loss", save_best_only=True),
+        # Resume an interrupted run by starting it again with the same --version
+        tf.keras.callbacks.BackupAndRestore(os.path.join(run_dir, "checkpoints", "backup")),
+    ]
+
+    started = time.perf_counter()
+    history = model.fit(train, validation_data=val, epochs=args.epochs, callbacks=callbacks, verbose=2)
+    training_seconds = time.perf_counter() - started
+
+    serving = to_float32(model, len(class_names), image_size)
+    serving.compile(
+        loss=tf.keras.losses.SparseCategoricalCrossentropy(from_logits=True),
+        metrics=["accuracy"],
+    )
+    model_path = os.path.join(run_dir, args.model_name)
+    serving.save(model_path)
+    with open(os.path.join(run_dir, "labels.json"), "w") as handle:
+        json.dump(class_names, handle, indent=2)
+
+    evaluation = {"validation": serving.evaluate(val, return_dict=True, verbose=0)}
+    if args.test_dir:
+        test_paths, test_labels, _ = list_images(args.test_dir, class_names)
+        if args.manifest:
+            test_paths, test_labels = _without(test_paths, test_labels, skip)
+        test = build_dataset(test_paths, test_labels, image_size=image_size, batch_size=args.batch_size, cache="none")
+        evaluation["test"] = serving.evaluate(test, return_dict=True, verbose=0)
+
+    metadata = {
+        "version": version,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "model_file": args.model_name,
+        "classes": class_names,
+        "image_size": list(image_size),
+        "images": {"train": len(train_paths), "validation": len(val_paths)},
+        "epochs_run": len(history.history.get("loss", [])),
+        "training_seconds": round(training_seconds, 1),
+        "throughput": throughput.epochs,
+        "evaluation": {split: {k: float(v) for k, v in values.items()} for split, values in evaluation.items()},
+        "history": {k: [float(v) for v in values] for k, values in history.history.items()},
+        "precision": precision,
+        "tensorflow": tf.__version__,
+        "python": platform.python_version(),
+        "parameters": vars(args),
+    }
+    with open(os.path.join(run_dir, "metadata.json"), "w") as handle:
+        json.dump(metadata, handle, indent=2)
+
+    rates = [epoch["images_per_sec"] for epoch in throughput.epochs]
+    print(f"Wrote {model_path} ({metadata['epochs_run']} epochs in {training_seconds:.0f}s, "
+          f"median {sorted(rates)[len(rates) // 2] if rates else 0:.1f} images/sec)")
+    for split, values in metadata["evaluation"].items():
+        print(f"  {split}: " + ", ".join(f"{k} {v:.4f}" for k, v in values.items()))
+    return run_dir
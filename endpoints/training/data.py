@@ -0,0 +1,112 @@
+"""
+tf.data input pipeline.
+
+    file paths -> parallel decode + resize (uint8) -> cache -> shuffle
+               -> parallel augment (train only) -> batch -> prefetch
+
+Images are cached after decoding, as uint8 to keep the cache a quarter of
+the float32 size, so from the second epoch on no JPEG is decoded again.
+Augmentation runs after the cache so every epoch sees new variations.
+Unreadable images are skipped with a warning instead of failing the run.
+"""
+import os
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".gif")
+
+
+def list_images(directory, class_names=None):
+    """(paths, labels, class_names) for an image_dataset_from_directory-style tree: one folder per class.
+    Class order is alphabetical, unless ``class_names`` (e.g. the training classes) is given."""
+    if class_names is None:
+        class_names = sorted(
+            entry for entry in os.listdir(directory) if os.path.isdir(os.path.join(directory, entry))
+        )
+    if not class_names:
+        raise ValueError(f"No class folders in {directory}")
+    paths, labels = [], []
+    for label, name in enumerate(class_names):
+        folder = os.path.join(directory, name)
+        if not os.path.isdir(folder):
+            continue
+        for root, _, files in sorted(os.walk(folder)):
+            for filename in sorted(files):
+                if filename.lower().endswith(IMAGE_EXTENSIONS):
+                    paths.append(os.path.join(root, filename))
+                    labels.append(label)
+    if not paths:
+        raise ValueError(f"No images found under {directory}")
+    return paths, labels, list(class_names)
+
+
+def _decode(image_size):
+    import tensorflow as tf
+
+    def decode(path, label):
+        image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+        image = tf.image.resize(image, image_size)  # bilinear, like image_dataset_from_directory
+        return tf.cast(tf.clip_by_value(tf.round(image), 0, 255), tf.uint8), label
+
+    return decode
+
+
+def _augment(seed):
+    import tensorflow as tf
+
+    def augment(image, label):
+        image = tf.cast(image, tf.float32)
+        image = tf.image.random_flip_left_right(image, seed=seed)
+        image = tf.image.random_flip_up_down(image, seed=seed)
+        image = tf.image.random_brightness(image, max_delta=0.1 * 255, seed=seed)
+        image = tf.image.random_contrast(image, 0.9, 1.1, seed=seed)
+        return tf.clip_by_value(image, 0.0, 255.0), label
+
+    return augment
+
+
+def _to_float(image, label):
+    import tensorflow as tf
+
+    return tf.cast(image, tf.float32), label
+
+
+def build_dataset(paths, labels, image_size=(180, 180), batch_size=32, training=False, cache="memory",
+                  cache_dir=None, cache_name="dataset", shuffle_buffer=2048, augment=True, seed=1337):
+    """Batched (float32 images in [0, 255], int labels) dataset; the model rescales to [0, 1] itself.
+
+    ``cache``: "memory", "disk" (files under ``cache_dir``, reused by later runs on the same
+    images and size, so clear them when the dataset changes) or "none".
+    """
+    import tensorflow as tf
+
+    autotune = tf.data.AUTOTUNE
+    dataset = tf.data.Dataset.from_tensor_slices((paths, labels))
+    if training and cache == "none":
+        # Without a cache, shuffling paths is free; with one, shuffle the cached images below
+        dataset = dataset.shuffle(len(paths), seed=seed, reshuffle_each_iteration=True)
+    dataset = dataset.map(_decode(tuple(image_size)), num_parallel_calls=autotune)
+    dataset = dataset.ignore_errors(log_warning=True)
+
+    if cache == "memory":
+        dataset = dataset.cache()
+    elif cache == "disk":
+        if not cache_dir:
+            raise ValueError("cache='disk' needs a cache_dir")
+        os.makedirs(cache_dir, exist_ok=True)
+        dataset = dataset.cache(os.path.join(cache_dir, f"{cache_name}-{image_size[0]}x{image_size[1]}"))
+    elif cache != "none":
+        raise ValueError(f"Unknown cache mode: {cache}")
+
+    if training:
+        if cache != "none":
+            dataset = dataset.shuffle(shuffle_buffer, seed=seed, reshuffle_each_iteration=True)
+        dataset = dataset.map(_augment(seed) if augment else _to_float, num_parallel_calls=autotune)
+    else:
+        dataset = dataset.map(_to_float, num_parallel_calls=autotune)
+
+    dataset = dataset.batch(batch_size).prefetch(autotune)
+    if training:
+        # Element order within a batch may vary between runs; the pipeline does not wait on stragglers
+        options = tf.data.Options()
+        options.deterministic = False
+        dataset = dataset.with_options(options)
+    return dataset
@@ -0,0 +1,284 @@
+"""
+Dataset validation and deduplication (replaces clean_dataset in skin_disease.ipynb).
+
+    python -m training.dataset_check "Skin Diseases Dataset" --workers 8
+    python -m training.dataset_check DATASET --quarantine DATASET-rejected
+
+Every file under the dataset root (``<split>/<class>/<image>``, e.g.
+train/acne/1.jpg, or ``<class>/<image>``) is opened, fully decoded, hashed
+(SHA-256 of the bytes and a 64-bit DCT perceptual hash) across a process pool.
+Results go to a columnar manifest (``<root>/.manifest.npz``: one NumPy array
+per column: path, split, label, size, mtime_ns, sha256, phash, width, height,
+format, status, error). Re-runs only inspect files whose size or mtime
+changed, and ``python -m training --manifest`` leaves out unusable files.
+
+The report (``<root>/.dataset_report.json``) lists unreadable or unsupported files, exact
+duplicates (same bytes), near duplicates (perceptual hashes within
+--max-distance bits) and which of those leak between splits or carry
+different labels. Nothing is deleted; --quarantine moves the unusable files
+out of the dataset, keeping their relative paths.
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .data import IMAGE_EXTENSIONS
+
+SPLITS = ("train", "training", "validation", "val", "valid", "test")
+# Formats tf.io.decode_image reads (MPO is a multi-picture JPEG)
+DECODABLE_FORMATS = {"JPEG", "MPO", "PNG", "GIF", "BMP"}
+COLUMNS = ("path", "split", "label", "size", "mtime_ns", "sha256", "phash", "width", "height", "format", "status", "error")
+
+_DCT = None
+
+
+def _dct_matrix(n=32):
+    k = np.arange(n)[:, None]
+    i = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * i + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix.astype(np.float32)
+
+
+def perceptual_hash(image):
+    """64-bit pHash: low-frequency 8x8 DCT coefficients of a 32x32 greyscale thumbnail against their median"""
+    from PIL import Image
+
+    global _DCT
+    if _DCT is None:
+        _DCT = _dct_matrix()
+    pixels = np.asarray(image.convert("L").resize((32, 32), Image.Resampling.LANCZOS), dtype=np.float32)
+    low = (_DCT @ pixels @ _DCT.T)[:8, :8].flatten()
+    bits = low > np.median(low[1:])
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def inspect_file(path):
+    """Row values for one file (runs in a worker process)"""
+    from PIL import Image
+
+    sha256 = hashlib.sha256()
+    try:
+        with open(path, "rb") as handle:
+            for chunk in iter(lambda: handle.read(1 << 20), b""):
+                sha256.update(chunk)
+        with Image.open(path) as image:
+            image_format = image.format or ""
+            # verify() checks structure only; load() decodes every pixel and catches truncation
+            image.verify()
+        with Image.open(path) as image:
+            image.load()
+            width, height = image.size
+            phash = perceptual_hash(image)
+    except Exception as e:
+        return sha256.hexdigest(), 0, 0, 0, "", "corrupt", f"{type(e).__name__}: {str(e)}"[:200]
+
+    if image_format not in DECODABLE_FORMATS:
+        status, error = "unsupported", f"{image_format} is not decodable by tf.io.decode_image"
+    elif not path.lower().endswith(IMAGE_EXTENSIONS):
+        status, error = "unsupported", "extension is skipped by the training pipeline"
+    else:
+        status, error = "ok", ""
+    return sha256.hexdigest(), phash, width, height, image_format, status, error
+
+
+def scan(root):
+    """(relative path, size, mtime_ns) for every regular file, hidden files excluded"""
+    files = []
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories[:] = sorted(d for d in subdirectories if not d.startswith("."))
+        for filename in sorted(filenames):
+            if filename.startswith("."):
+                continue
+            path = os.path.join(directory, filename)
+            stat = os.stat(path)
+            files.append((os.path.relpath(path, root), stat.st_size, stat.st_mtime_ns))
+    return files
+
+
+def split_and_label(relative_path):
+    parts = relative_path.split(os.sep)
+    if len(parts) >= 3 and parts[0].lower() in SPLITS:
+        return parts[0], parts[1]
+    return "", parts[0] if len(parts) >= 2 else ""
+
+
+def load_manifest(path):
+    """{relative path: row dict}, empty when there is no manifest yet"""
+    if not os.path.exists(path):
+        return {}
+    with np.load(path, allow_pickle=False) as data:
+        columns = {name: data[name].tolist() for name in COLUMNS}
+    return {row["path"]: row for row in (dict(zip(COLUMNS, values)) for values in zip(*columns.values()))}
+
+
+def unusable_paths(manifest_path):
+    """Absolute paths of the files a previous check found corrupt or unsupported"""
+    with np.load(manifest_path, allow_pickle=False) as data:
+        root = str(data["root"])
+        return {os.path.join(root, path) for path in data["path"][data["status"] != "ok"].tolist()}
+
+
+def save_manifest(path, rows, root):
+    arrays = {name: [row[name] for row in rows] for name in COLUMNS}
+    np.savez_compressed(
+        path,
+        root=np.array(root),
+        path=np.array(arrays["path"], dtype=str),
+        split=np.array(arrays["split"], dtype=str),
+        label=np.array(arrays["label"], dtype=str),
+        size=np.array(arrays["size"], dtype=np.int64),
+        mtime_ns=np.array(arrays["mtime_ns"], dtype=np.int64),
+        sha256=np.array(arrays["sha256"], dtype=str),
+        phash=np.array(arrays["phash"], dtype=np.uint64),
+        width=np.array(arrays["width"], dtype=np.int32),
+        height=np.array(arrays["height"], dtype=np.int32),
+        format=np.array(arrays["format"], dtype=str),
+        status=np.array(arrays["status"], dtype=str),
+        error=np.array(arrays["error"], dtype=str),
+    )
+
+
+def near_duplicate_pairs(hashes, max_distance):
+    """(i, j, distance) for hashes within ``max_distance`` bits. Pigeonhole on eight 8-bit bands:
+    hashes that differ in at most 7 bits agree exactly on at least one band, so only hashes
+    sharing a band value are compared, bucket by bucket with vectorised popcounts."""
+    if not 0 <= max_distance <= 7:
+        raise ValueError("max_distance must be between 0 and 7")
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    pairs = {}
+    for band in range(8):
+        values = (hashes >> np.uint64(band * 8)) & np.uint64(0xFF)
+        order = np.argsort(values, kind="stable")
+        boundaries = np.flatnonzero(np.diff(values[order])) + 1
+        for bucket in np.split(order, boundaries):
+            if len(bucket) < 2:
+                continue
+            distances = np.bitwise_count(hashes[bucket][:, None] ^ hashes[bucket][None, :])
+            for a, b in zip(*np.nonzero(np.triu(distances <= max_distance, k=1))):
+                i, j = sorted((int(bucket[a]), int(bucket[b])))
+                pairs[(i, j)] = int(distances[a, b])
+    return [(i, j, distance) for (i, j), distance in sorted(pairs.items())]
+
+
+def build_report(rows, max_distance):
+    unusable = [
+        {"path": row["path"], "status": row["status"], "error": row["error"]}
+        for row in rows if row["status"] != "ok"
+    ]
+    usable = [row for row in rows if row["status"] == "ok"]
+
+    by_sha = defaultdict(list)
+    for row in usable:
+        by_sha[row["sha256"]].append(row)
+    exact = [group for group in by_sha.values() if len(group) > 1]
+
+    # One representative per distinct content, so exact copies are not re-reported as near duplicates
+    representatives = [group[0] for group in by_sha.values()]
+    near = []
+    for i, j, distance in near_duplicate_pairs([row["phash"] for row in representatives], max_distance):
+        near.append((representatives[i], representatives[j], distance))
+
+    def describe(group):
+        return {
+            "paths": [row["path"] for row in group],
+            "splits": sorted({row["split"] for row in group}),
+            "labels": sorted({row["label"] for row in group}),
+        }
+
+    exact_groups = [describe(group) for group in exact]
+    near_pairs = [dict(describe([a, b]), distance=distance) for a, b, distance in near]
+    return {
+        "files": len(rows),
+        "usable": len(usable),
+        "unusable": unusable,
+        "exact_duplicates": exact_groups,
+        "near_duplicates": near_pairs,
+        "split_leakage": [entry for entry in exact_groups + near_pairs if len(entry["splits"]) > 1],
+        "label_conflicts": [entry for entry in exact_groups + near_pairs if len(entry["labels"]) > 1],
+    }
+
+
+def quarantine(root, destination, paths):
+    moved = []
+    for relative_path in paths:
+        target = os.path.join(destination, relative_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(os.path.join(root, relative_path), target)
+        moved.append(relative_path)
+    return moved
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m training.dataset_check",
+                                     description="Validate and deduplicate the training image corpus")
+    parser.add_argument("root", help="Dataset directory (<split>/<class>/<image> or <class>/<image>)")
+    parser.add_argument("--manifest", help="Columnar manifest to read and update (default: <root>/.manifest.npz)")
+    parser.add_argument("--report", help="JSON report (default: <root>/.dataset_report.json)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--max-distance", type=int, default=4,
+                        help="Perceptual-hash bits two images may differ in and still count as near duplicates (0-7)")
+    parser.add_argument("--full", action="store_true", help="Re-inspect every file, ignoring the manifest")
+    parser.add_argument("--quarantine", help="Move corrupt and unsupported files into this directory")
+    args = parser.parse_args(argv)
+
+    root = os.path.abspath(args.root)
+    manifest_path = args.manifest or os.path.join(root, ".manifest.npz")
+    report_path = args.report or os.path.join(root, ".dataset_report.json")
+
+    started = time.perf_counter()
+    files = scan(root)
+    previous = {} if args.full else load_manifest(manifest_path)
+    rows, pending = [], []
+    for relative_path, size, mtime_ns in files:
+        split, label = split_and_label(relative_path)
+        row = {"path": relative_path, "split": split, "label": label, "size": size, "mtime_ns": mtime_ns}
+        known = previous.get(relative_path)
+        if known and known["size"] == size and known["mtime_ns"] == mtime_ns:
+            row.update({name: known[name] for name in COLUMNS if name not in row})
+        else:
+            pending.append(len(rows))
+        rows.append(row)
+    print(f"{len(files)} files; {len(files) - len(pending)} unchanged since the last run, inspecting {len(pending)}")
+
+    if pending:
+        inspect_started = time.perf_counter()
+        paths = [os.path.join(root, rows[index]["path"]) for index in pending]
+        workers = max(1, args.workers)
+        # Chunks amortise the IPC cost while leaving a few per worker to balance slow files
+        chunksize = max(1, min(64, len(paths) // (4 * workers)))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(inspect_file, paths, chunksize=chunksize)
+            for index, values in zip(pending, results):
+                rows[index].update(zip(("sha256", "phash", "width", "height", "format", "status", "error"), values))
+        seconds = time.perf_counter() - inspect_started
+        print(f"Inspected {len(pending)} files in {seconds:.1f}s ({len(pending) / seconds:.0f} files/s)")
+
+    save_manifest(manifest_path, rows, root)
+    report = build_report(rows, args.max_distance)
+    report["manifest"] = manifest_path
+    if args.quarantine:
+        report["quarantined"] = quarantine(root, args.quarantine, [entry["path"] for entry in report["unusable"]])
+    with open(report_path, "w") as handle:
+        json.dump(report, handle, indent=2)
+
+    print(
+        f"{report['usable']} usable, {len(report['unusable'])} corrupt or unsupported, "
+        f"{len(report['exact_duplicates'])} exact duplicate groups, {len(report['near_duplicates'])} near-duplicate pairs, "
+        f"{len(report['split_leakage'])} leaking between splits, {len(report['label_conflicts'])} with conflicting labels"
+    )
+    if args.quarantine:
+        print(f"Moved {len(report['quarantined'])} files to {args.quarantine}")
+    print(f"Report: {report_path} ({time.perf_counter() - started:.1f}s total)")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Classifier architecture and numeric precision"""
+
+import numpy as np
+
+
+def build_model(num_classes, image_size=(180, 180)):
+    """The skin_disease.ipynb network; outputs logits. The last layer stays float32 under mixed precision."""
+    import tensorflow as tf
+    from tensorflow.keras import layers
+
+    return tf.keras.Sequential([
+        layers.Input((*image_size, 3)),
+        layers.Rescaling(1. / 255),
+        layers.Conv2D(16, 3, padding='same', activation='relu'),
+        layers.MaxPooling2D(),
+        layers.Conv2D(32, 3, padding='same', activation='relu'),
+        layers.MaxPooling2D(),
+        layers.Conv2D(64, 3, padding='same', activation='relu'),
+        layers.MaxPooling2D(),
+        layers.Flatten(),
+        layers.Dropout(0.2),
+        layers.Dense(128),
+        layers.Dense(num_classes, dtype='float32'),
+    ])
+
+
+def _cpu_flags():
+    try:
+        with open("/proc/cpuinfo") as cpuinfo:
+            for line in cpuinfo:
+                if line.startswith("flags"):
+                    return set(line.split(":", 1)[1].split())
+    except OSError:
+        pass
+    return set()
+
+
+def resolve_precision(precision="auto"):
+    """Keras dtype policy for training. "auto": mixed_float16 on a GPU, mixed_bfloat16 on CPUs with
+    native bf16 (AVX512-BF16 / AMX), otherwise float32, since emulated half precision is slower on CPU."""
+    import tensorflow as tf
+
+    if precision != "auto":
+        return precision
+    if tf.config.list_physical_devices("GPU"):
+        return "mixed_float16"
+    if _cpu_flags() & {"avx512_bf16", "amx_bf16"}:
+        return "mixed_bfloat16"
+    return "float32"
+
+
+def set_precision(policy):
+    import tensorflow as tf
+
+    tf.keras.mixed_precision.set_global_policy(policy)
+
+
+def to_float32(model, num_classes, image_size):
+    """Copy of a (mixed precision) model with a float32 policy, so serving does not depend on
+    the training machine's bf16/fp16 support. Variables are float32 under mixed precision already."""
+    import tensorflow as tf
+
+    previous = tf.keras.mixed_precision.global_policy().name
+    tf.keras.mixed_precision.set_global_policy("float32")
+    try:
+        serving = build_model(num_classes, image_size)
+    finally:
+        tf.keras.mixed_precision.set_global_policy(previous)
+    serving.set_weights([np.asarray(weight, dtype=np.float32) for weight in model.get_weights()])
+    return serving